@@ -1,12 +1,53 @@
-import sqlite3
+import asyncio
+import base64
+import hashlib
 import json
-from fastapi import FastAPI, HTTPException
+import os
+import secrets
+import sqlite3
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import Annotated, List, Literal, Optional
 from datetime import datetime
 
-app = FastAPI()
+from db import (
+    connection, transaction, run_db, prepare_db, ChangeWatcher,
+    order_item_row, ORDER_ITEM_COLUMNS, next_version, current_version,
+)
+from events import hub, record_events, relay
+from reports import apply_order_spend, load_spend_report, GROUP_COLUMNS
+from cache import TTLCache, env_flag
+import metrics
+import querylog
+from serialization import negotiate, encode, columnar_orders, columnar_products
+from search import ProductIndex
+from export import export_query, stream_export, MEDIA_TYPES as EXPORT_MEDIA_TYPES
+from archive import ARCHIVE_AFTER_DAYS, load_archived, restore as restore_archived, run_archiver
+
+# Worker processes for `python api.py` (0 = one per CPU)
+API_WORKERS = int(os.getenv("API_WORKERS", "1"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Runs in every worker; prepare_db lets only one of them create and seed
+    await run_db(prepare_db)
+    tasks = [asyncio.create_task(relay(hub))]
+    # Periodic archival of old completed orders when ARCHIVE_AFTER_DAYS is set
+    if ARCHIVE_AFTER_DAYS > 0:
+        tasks.append(asyncio.create_task(run_archiver(lambda moved: invalidate_caches())))
+    if metrics.METRICS_DIR:
+        tasks.append(asyncio.create_task(metrics.share()))
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+
+app = FastAPI(lifespan=lifespan)
 
 # Enable CORS for the frontend
 app.add_middleware(
@@ -15,157 +56,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Orders-Version", "ETag", "Content-Disposition"],
 )
-
-DB_PATH = "database.db"
-
-def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Users table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS users (
-        id TEXT PRIMARY KEY,
-        telegram_id INTEGER UNIQUE NOT NULL,
-        full_name TEXT NOT NULL,
-        role TEXT NOT NULL,
-        branch TEXT,
-        language TEXT DEFAULT 'ru',
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    ''')
-    
-    # Orders table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS orders (
-        id TEXT PRIMARY KEY,
-        status TEXT NOT NULL,
-        products TEXT NOT NULL,
-        createdAt TEXT NOT NULL,
-        deliveredAt TEXT,
-        estimatedDeliveryDate TEXT,
-        branch TEXT NOT NULL
-    )
-    ''')
-    
-    # Products table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS master_products (
-        id TEXT PRIMARY KEY,
-        name TEXT NOT NULL,
-        category TEXT NOT NULL,
-        unit TEXT NOT NULL,
-        last_price REAL
-    )
-    ''') 
-    
-    # Check if last_price column exists (migration)
-    try:
-        cursor.execute("SELECT last_price FROM master_products LIMIT 1")
-    except sqlite3.OperationalError:
-        cursor.execute("ALTER TABLE master_products ADD COLUMN last_price REAL")
-        conn.commit()
-    
-    conn.commit()
-    conn.close()
-
-def seed_db():
-    # Only seed if products table is empty
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) FROM master_products")
-    if cursor.fetchone()[0] == 0:
-        products = [
-            ('1', 'Молоко (Sut)', '🥛 Молочные продукты', 'л'),
-            ('2', 'Кефир (Kefir)', '🥛 Молочные продукты', 'л'),
-            ('3', 'Творог (Tvorog / Suzma)', '🥛 Молочные продукты', 'кг'),
-            ('4', 'Каймак (Qaymoq)', '🥛 Молочные продукты', 'кг'),
-            ('5', 'Сметана (Smetana / Qaymoqcha)', '🥛 Молочные продукты', 'кг'),
-            ('6', 'Сыр твёрдый (Qattiq pishloq)', '🥛 Молочные продукты', 'кг'),
-            ('7', 'Сыр плавленый (Eritilgan pishloq)', '🥛 Молочные продукты', 'кг'),
-            ('8', 'Сыр моцарелла (Motsarella pishlog‘i)', '🥛 Молочные продукты', 'кг'),
-            ('9', 'Сыр Ханский (Xon pishlog‘i)', '🥛 Молочные продукты', 'кг'),
-            ('10', 'Сырок (Shirin pishloqcha)', '🥛 Молочные продукты', 'шт'),
-            ('11', 'Сливочное масло (Sariyog‘)', '🥛 Молочные продукты', 'кг'),
-            ('12', 'Маргарин «Шедрое лето» (Margarin)', '🥛 Молочные продукты', 'кг'),
-            ('13', 'Яйца куриные (Tovuq tuxumi)', '🥚 Яйца и мясо', 'шт'),
-            ('14', 'Яйца перепелиные (Bedana tuxumi)', '🥚 Яйца и мясо', 'шт'),
-            ('15', 'Индейка (Kurka go‘shti)', '🥚 Яйца и мясо', 'кг'),
-            ('16', 'Колбаса варёная (Qaynatilgan kolbasa)', '🥚 Яйца и мясо', 'кг'),
-            ('17', 'Колбаса копчёная (Dudlangan kolbasa)', '🥚 Яйца и мясо', 'кг'),
-            ('18', 'Сосиски (Sosiska)', '🥚 Яйца и мясо', 'кг'),
-            ('19', 'Мука (Un)', '🍞 Хлеб и мучное', 'кг'),
-            ('20', 'Лаваш (Lavash non)', '🍞 Хлеб и мучное', 'шт'),
-            ('21', 'Хлеб (Non)', '🍞 Хлеб и мучное', 'шт'),
-            ('22', 'Тостовый хлеб (Tost noni)', '🍞 Хлеб и мучное', 'шт'),
-            ('23', 'Манпар (тесто) (Xamir)', '🍞 Хлеб и мучное', 'кг'),
-            ('24', 'Макароны (Makaron)', '🍞 Хлеб и мучное', 'кг'),
-            ('25', 'Спагетти (Spagetti)', '🍞 Хлеб и мучное', 'кг'),
-            ('26', 'Вермишель (Vermishel)', '🍞 Хлеб и мучное', 'кг'),
-            ('27', 'Фунчоза (Funchuza)', '🍞 Хлеб и мучное', 'кг'),
-            ('28', 'Манная крупа (Manka yormasi)', '🍞 Хлеб и мучное', 'кг'),
-            ('29', 'Овсянка (Suli yormasi)', '🍞 Хлеб и мучное', 'кг'),
-            ('30', 'Рис (Guruch)', '🍚 Крупы и бобовые', 'кг'),
-            ('31', 'Рис обычный (Oddiy guruch)', '🍚 Крупы и бобовые', 'кг'),
-            ('32', 'Рис Лазер (Lazer guruch)', '🍚 Крупы и бобовые', 'кг'),
-            ('33', 'Перловка (Arpa yormasi)', '🍚 Крупы и бобовые', 'кг'),
-            ('34', 'Нут / горох (No‘xat)', '🍚 Крупы и бобовые', 'кг'),
-            ('35', 'Горох (консерва) (Konserva no‘xat)', '🍚 Крупы и бобовые', 'шт'),
-            ('36', 'Соль (Tuz)', '🧂 Специи и приправы', 'кг'),
-            ('37', 'Корейская соль (Koreys tuzi)', '🧂 Специи и приправы', 'кг'),
-            ('38', 'Зира (Zira)', '🧂 Специи и приправы', 'г'),
-            ('39', 'Приправа для лагмана (Lag‘mon ziravori)', '🧂 Специи и приправы', 'г'),
-            ('40', 'Лавровый лист (Dafna bargi)', '🧂 Специи и приправы', 'шт'),
-            ('41', 'Роллтон (приправа) (Rollton ziravori)', '🧂 Специи и приправы', 'шт'),
-            ('42', 'Кунжут (Kunjut)', '🧂 Специи и приправы', 'г'),
-            ('43', 'Какао (Kakao)', '☕ Напитки и сладкое', 'кг'),
-            ('44', 'Чёрный чай (Qora choy)', '☕ Напитки и сладкое', 'кг'),
-            ('45', 'Сахар (Shakar)', '☕ Напитки и сладкое', 'кг'),
-            ('46', 'Варенье (Murabbo)', '☕ Напитки и сладкое', 'кг'),
-            ('47', 'Шоколадная паста (Shokolad pastasi)', '☕ Напитки и сладкое', 'шт'),
-            ('48', 'Миллер (вафли) (Vafli)', '☕ Напитки и сладкое', 'шт'),
-            ('49', 'Изюм (Mayiz)', '☕ Напитки и сладкое', 'кг'),
-            ('50', 'Грецкий орех (Yong‘oq)', '☕ Напитки и сладкое', 'кг'),
-            ('51', 'Майонез (Mayonez)', '🥫 Соусы и добавки', 'кг'),
-            ('52', 'Соевый соус (Soya sousi)', '🥫 Соусы и добавки', 'л'),
-            ('53', 'Уксус (Sirka)', '🥫 Соусы и добавки', 'л'),
-            ('54', 'Томатная паста (Tomat pastasi)', '🥫 Соусы и добавки', 'кг'),
-            ('55', 'Кетчуп (Ketchup)', '🥫 Соусы и добавки', 'шт'),
-            ('56', 'Масло растительное (O‘simlik yog‘i)', '🥫 Соусы и добавки', 'л'),
-            ('57', 'Сода (Soda)', '🥫 Соусы и добавки', 'шт'),
-            ('58', 'Дрожжи (Xamirturush)', '🥫 Соусы и добавки', 'шт'),
-            ('59', 'Разрыхлитель (Pishirish kukuni)', '🥫 Соусы и добавки', 'шт'),
-            ('60', 'Картофель (Kartoshka)', '🥕 Овощи и зелень', 'кг'),
-            ('61', 'Морковь красная (Qizil sabzi)', '🥕 Овощи и зелень', 'кг'),
-            ('62', 'Морковь жёлтая (Sariq sabzi)', '🥕 Овощи и зелень', 'кг'),
-            ('63', 'Капуста зелёная (Yashil karam)', '🥕 Овощи и зелень', 'кг'),
-            ('64', 'Капуста красная (Qizil karam)', '🥕 Овощи и зелень', 'кг'),
-            ('65', 'Капуста квашеная (Tuzlangan karam)', '🥕 Овощи и зелень', 'кг'),
-            ('66', 'Помидоры (Pomidor)', '🥕 Овощи и зелень', 'кг'),
-            ('67', 'Огурцы (Bodring)', '🥕 Овощи и зелень', 'кг'),
-            ('68', 'Солёные огурцы (Tuzlangan bodring)', '🥕 Овощи и зелень', 'кг'),
-            ('69', 'Болгарский перец (Bulgar qalampiri)', '🥕 Овощи и зелень', 'кг'),
-            ('70', 'Болгарский перец «Светофор» (Rangli qalampir)', '🥕 Овощи и зелень', 'кг'),
-            ('71', 'Лук (Piyoz)', '🥕 Овощи и зелень', 'кг'),
-            ('72', 'Сельдерей (Selderey)', '🥕 Овощи и зелень', 'кг'),
-            ('73', 'Корейская морковь (Koreyscha sabzi)', '🥕 Овощи и зелень', 'кг'),
-            ('74', 'Укроп (Shivit)', '🥕 Овощи и зелень', 'кг'),
-            ('75', 'Кинза (Kashnich)', '🥕 Овощи и зелень', 'кг'),
-            ('76', 'Свекла красная (Qizil lavlagi)', '🥕 Овощи и зелень', 'кг'),
-            ('77', 'Редька белая (Oq turup)', '🥕 Овощи и зелень', 'кг'),
-            ('78', 'Бананы (Banan)', '🍎 Фрукты', 'кг'),
-            ('79', 'Яблоки (Olma)', '🍎 Фрукты', 'кг'),
-            ('80', 'Груша (Nok)', '🍎 Фрукты', 'кг'),
-            ('81', 'Лимоны (Limon)', '🍎 Фрукты', 'кг')
-        ]
-        cursor.executemany("INSERT INTO master_products (id, name, category, unit) VALUES (?, ?, ?, ?)", products)
-        conn.commit()
-    conn.close()
-
-init_db()
-seed_db()
+# Outermost, so the timings include CORS handling
+app.add_middleware(metrics.MetricsMiddleware, streaming=['/orders/stream'])
 
 class Product(BaseModel):
     id: str
@@ -188,94 +82,917 @@ class Order(BaseModel):
     deliveredAt: Optional[str] = None
     estimatedDeliveryDate: Optional[str] = None
     branch: str
+    # Version the client last saw; the write is refused with 409 if the order
+    # changed since (0 = the order must not exist yet)
+    expectedVersion: Optional[int] = None
 
-@app.get("/products")
-async def get_products():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM master_products")
-    rows = cursor.fetchall()
-    conn.close()
+class ItemChanges(BaseModel):
+    """Fields PATCH may change on one order line; only the ones sent are written"""
+    quantity: Optional[float] = None
+    price: Optional[float] = None
+    comment: Optional[str] = None
+    checked: Optional[bool] = None
+    chefComment: Optional[str] = None
+    deliveryDate: Optional[str] = None
+
+class OrderOperation(BaseModel):
+    """One step of PATCH /orders/{id}:
+
+    set_status   {"status"}
+    set_delivery {"estimatedDeliveryDate"} and/or {"deliveredAt"}
+    set_item     {"productId", "changes": {...ItemChanges}}
+    add_item     {"product": {...Product}}
+    remove_item  {"productId"}
+    """
+    op: Literal['set_status', 'set_delivery', 'set_item', 'add_item', 'remove_item']
+    status: Optional[str] = None
+    estimatedDeliveryDate: Optional[str] = None
+    deliveredAt: Optional[str] = None
+    productId: Optional[str] = None
+    changes: Optional[ItemChanges] = None
+    product: Optional[Product] = None
+
+class OrderPatch(BaseModel):
+    operations: List[OrderOperation]
+    expectedVersion: Optional[int] = None
+
+class InvalidPatch(ValueError):
+    pass
+
+class VersionConflict(Exception):
+    def __init__(self, order_id: str, current_version: int):
+        super().__init__(f"Order {order_id} is at version {current_version}")
+        self.order_id = order_id
+        self.current_version = current_version
+
+# Blocking sqlite work lives in plain functions that the async endpoints hand
+# to the db executor (run_db), so a slow query never stalls the event loop.
+
+def load_products() -> list:
+    with connection() as conn:
+        rows = conn.execute("SELECT * FROM master_products").fetchall()
     
     products = []
     for row in rows:
-        # row: (id, name, category, unit, last_price)
-        # Note: newer rows might have 5 columns, older table definitions might need migration if not handled by init_db
-        last_price = row[4] if len(row) > 4 else None
-        
+        # row: (id, name, category, unit, last_price) - init_db guarantees last_price exists
         products.append({
-            "id": row[0],
-            "name": row[1],
-            "category": row[2],
-            "unit": row[3],
+            "id": row['id'],
+            "name": row['name'],
+            "category": row['category'],
+            "unit": row['unit'],
             "quantity": 0, # Default for selection
-            "lastPrice": last_price
+            "lastPrice": row['last_price']
         })
     return products
 
-@app.get("/orders")
-async def get_orders():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM orders")
-    rows = cursor.fetchall()
-    conn.close()
-    
-    # Fetch last prices map
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, last_price FROM master_products")
-    # Store as dict for O(1) access
-    last_prices = {row[0]: row[1] for row in cursor.fetchall()}
-    conn.close()
+# Largest page a client may request from GET /orders
+MAX_ORDERS_PAGE = 500
+
+def encode_cursor(created_at: str, order_id: str) -> str:
+    """Opaque keyset cursor pointing just past (createdAt, id), in the page's direction"""
+    return base64.urlsafe_b64encode(json.dumps([created_at, order_id]).encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        created_at, order_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(created_at), str(order_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def orders_query(
+    branch: Optional[List[str]] = None,
+    status: Optional[List[str]] = None,
+    created_after: Optional[str] = None,
+    created_before: Optional[str] = None,
+    limit: Optional[int] = None,
+    after: Optional[tuple] = None,
+    changed_since: Optional[int] = None,
+    ids: Optional[List[str]] = None,
+    descending: bool = False,
+) -> tuple:
+    """SQL and params for load_orders: the page of orders joined with their lines"""
+    clauses, params = [], []
+    if branch:
+        clauses.append(f"branch IN ({', '.join('?' * len(branch))})")
+        params.extend(branch)
+    if status:
+        clauses.append(f"status IN ({', '.join('?' * len(status))})")
+        params.extend(status)
+    if created_after:
+        clauses.append("createdAt >= ?")
+        params.append(created_after)
+    if created_before:
+        clauses.append("createdAt < ?")
+        params.append(created_before)
+    if after:
+        clauses.append(f"(createdAt, id) {'<' if descending else '>'} (?, ?)")
+        params.extend(after)
+    if changed_since is not None:
+        clauses.append("version > ?")
+        params.append(changed_since)
+    if ids:
+        clauses.append(f"id IN ({', '.join('?' * len(ids))})")
+        params.extend(ids)
+
+    # A delta (changed_since) is read in version order through
+    # idx_orders_version, which finds the few changed orders; the planner
+    # would otherwise walk a branch or createdAt index over the whole table
+    if changed_since is not None:
+        order_by, page_sql = "version", "SELECT * FROM orders INDEXED BY idx_orders_version"
+    elif descending:
+        order_by, page_sql = "createdAt DESC, id DESC", "SELECT * FROM orders"
+    else:
+        order_by, page_sql = "createdAt, id", "SELECT * FROM orders"
+    if clauses:
+        page_sql += " WHERE " + " AND ".join(clauses)
+    page_sql += f" ORDER BY {order_by}"
+    if limit:
+        # Fetch one extra order to know whether another page exists
+        page_sql += " LIMIT ?"
+        params.append(limit + 1)
+
+    # One joined query: the page of orders, their lines, and each line's last price
+    sql = f'''
+    WITH page AS ({page_sql})
+    SELECT page.id, page.status, page.createdAt, page.deliveredAt, page.estimatedDeliveryDate, page.branch,
+           page.version, i.product_id, i.name, i.category, i.quantity, i.unit, i.price, i.comment, i.checked,
+           i.chefComment, i.deliveryDate, mp.last_price
+    FROM page
+    LEFT JOIN order_items i ON i.order_id = page.id
+    LEFT JOIN master_products mp ON mp.id = i.product_id
+    ORDER BY {', '.join(f'page.{c.strip()}' for c in order_by.split(','))}, i.position
+    '''
+    return sql, params
+
+def load_orders(
+    branch: Optional[List[str]] = None,
+    status: Optional[List[str]] = None,
+    created_after: Optional[str] = None,
+    created_before: Optional[str] = None,
+    limit: Optional[int] = None,
+    after: Optional[tuple] = None,
+    changed_since: Optional[int] = None,
+    ids: Optional[List[str]] = None,
+    descending: bool = False,
+) -> tuple:
+    """Load orders ordered by (createdAt, id), optionally filtered and paged.
+
+    created_after is inclusive and created_before exclusive. descending
+    pages newest first (the cursor then moves to older orders). With
+    changed_since the orders come in version order instead. Returns
+    (orders, next_cursor, version); next_cursor is None on the last page and
+    version is the orders change counter the result is consistent with.
+    """
+    sql, params = orders_query(branch, status, created_after, created_before, limit, after, changed_since, ids, descending)
+    with connection() as conn:
+        # Read the counter and the rows in one snapshot
+        conn.execute("BEGIN")
+        rows = conn.execute(sql, params).fetchall()
+        version = current_version(conn)
+        conn.commit()
 
     orders = []
     for row in rows:
-        order_products = json.loads(row[2])
-        # Inject lastPrice into products if not present or just to be sure
-        for p in order_products:
-            if 'id' in p and p['id'] in last_prices:
-                p['lastPrice'] = last_prices[p['id']]
-                
-        orders.append({
-            "id": row[0],
-            "status": row[1],
-            "products": order_products,
-            "createdAt": row[3],
-            "deliveredAt": row[4],
-            "estimatedDeliveryDate": row[5],
-            "branch": row[6]
-        })
-    return orders
+        if not orders or orders[-1]["id"] != row['id']:
+            orders.append({
+                "id": row['id'],
+                "status": row['status'],
+                "products": [],
+                "createdAt": row['createdAt'],
+                "deliveredAt": row['deliveredAt'],
+                "estimatedDeliveryDate": row['estimatedDeliveryDate'],
+                "branch": row['branch'],
+                "version": row['version']
+            })
+        if row['product_id'] is not None:
+            orders[-1]["products"].append(item_to_product(row))
 
-@app.post("/orders/upsert")
-async def upsert_order(order: Order):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    products_json = json.dumps([p.dict() for p in order.products])
-    
-    cursor.execute('''
-    INSERT INTO orders (id, status, products, createdAt, deliveredAt, estimatedDeliveryDate, branch)
-    VALUES (?, ?, ?, ?, ?, ?, ?)
+    next_cursor = None
+    if limit and len(orders) > limit:
+        orders = orders[:limit]
+        next_cursor = encode_cursor(orders[-1]["createdAt"], orders[-1]["id"])
+    return orders, next_cursor, version
+
+def load_order_history(
+    branch: Optional[List[str]] = None,
+    status: Optional[List[str]] = None,
+    created_after: Optional[str] = None,
+    created_before: Optional[str] = None,
+    limit: Optional[int] = None,
+    after: Optional[tuple] = None,
+    descending: bool = False,
+) -> tuple:
+    """load_orders over the hot and the archived orders (archive.py), merged by (createdAt, id)"""
+    # Hot orders first: an order archived in between then shows up in both
+    # reads and is deduplicated, instead of in neither
+    hot, next_cursor, version = load_orders(branch, status, created_after, created_before, limit, after,
+                                            descending=descending)
+    archived = load_archived(branch, status, created_after, created_before, limit and limit + 1, after, descending)
+    if not archived:
+        return hot, next_cursor, version
+
+    # Archived lines get the current last price, like hot ones
+    product_ids = list({line['product_id'] for order in archived for line in order['lines']})
+    with connection() as conn:
+        last_prices = dict(conn.execute(
+            f"SELECT id, last_price FROM master_products WHERE id IN ({', '.join('?' * len(product_ids))})",
+            product_ids,
+        ).fetchall()) if product_ids else {}
+    hot_ids = {order["id"] for order in hot}
+    orders = hot + [
+        {
+            **{c: order[c] for c in ('id', 'status', 'createdAt', 'deliveredAt', 'estimatedDeliveryDate', 'branch', 'version')},
+            "products": [item_to_product({**line, 'last_price': last_prices.get(line['product_id'])})
+                         for line in order['lines']],
+        }
+        for order in archived if order['id'] not in hot_ids
+    ]
+    orders.sort(key=lambda order: (order["createdAt"], order["id"]), reverse=descending)
+
+    more = next_cursor is not None
+    if limit and len(orders) > limit:
+        orders, more = orders[:limit], True
+    next_cursor = encode_cursor(orders[-1]["createdAt"], orders[-1]["id"]) if more else None
+    return orders, next_cursor, version
+
+def load_order(order_id: str) -> Optional[dict]:
+    orders, _, _ = load_orders(ids=[order_id])
+    return orders[0] if orders else None
+
+def load_changes(since: int, branch: Optional[List[str]] = None) -> dict:
+    """Orders written and ids deleted after change version `since`"""
+    orders, _, version = load_orders(branch=branch, changed_since=since)
+    with connection() as conn:
+        deleted = [row['order_id'] for row in conn.execute(
+            "SELECT order_id FROM order_tombstones WHERE version > ? ORDER BY version", (since,)
+        )]
+    return {"version": version, "orders": orders, "deleted": deleted}
+
+def item_to_product(row) -> dict:
+    """Rebuild the API product dict from an order_items row (joined with last_price)"""
+    checked = row['checked']
+    return {
+        "id": row['product_id'],
+        "name": row['name'],
+        "category": row['category'],
+        "quantity": row['quantity'],
+        "unit": row['unit'],
+        "price": row['price'],
+        "comment": row['comment'],
+        "checked": None if checked is None else bool(checked),
+        "chefComment": row['chefComment'],
+        "deliveryDate": row['deliveryDate'],
+        "lastPrice": row['last_price']
+    }
+
+_ITEM_FIELDS = ORDER_ITEM_COLUMNS[1:]
+
+# Lines whose values did not change are skipped by the WHERE clause, so an
+# edit to one product touches one row
+ORDER_ITEM_UPSERT = f'''
+INSERT INTO order_items (order_id, {', '.join(ORDER_ITEM_COLUMNS)})
+VALUES ({', '.join('?' * (len(ORDER_ITEM_COLUMNS) + 1))})
+ON CONFLICT(order_id, product_id) DO UPDATE SET
+    {', '.join(f'{c}=excluded.{c}' for c in _ITEM_FIELDS)}
+WHERE ({', '.join(_ITEM_FIELDS)}) IS NOT ({', '.join(f'excluded.{c}' for c in _ITEM_FIELDS)})
+'''
+
+# The bot reads the same .env; without its notifier nothing drains the outbox
+BOT_NOTIFICATIONS = env_flag("BOT_NOTIFICATIONS")
+# Outbox rows older than this are dropped unsent (the bot was down too long
+# for the news to matter)
+NOTIFY_OUTBOX_MAX_AGE = float(os.getenv("NOTIFY_OUTBOX_MAX_AGE", "86400"))
+
+def queue_status_notification(conn, order_id: str, branch: str, status: str, previous_status: Optional[str]) -> None:
+    """Outbox row picked up by the bot's notifier (notifier.py)"""
+    if not BOT_NOTIFICATIONS:
+        return
+    now = time.time()
+    conn.execute("DELETE FROM order_notifications WHERE created_at < ?", (now - NOTIFY_OUTBOX_MAX_AGE,))
+    conn.execute(
+        "INSERT INTO order_notifications (order_id, branch, status, previous_status, created_at) VALUES (?, ?, ?, ?, ?)",
+        (order_id, branch, status, previous_status, now),
+    )
+
+def write_order(conn, order: Order) -> dict:
+    """Write an order header and its lines inside the caller's transaction.
+
+    Returns the change event for the write. Last-price propagation is left
+    to update_last_prices so a batch of orders can share one statement.
+    """
+    items = {}
+    for position, p in enumerate(order.products):
+        # A product id appears once per order; the last occurrence wins
+        items[p.id] = order_item_row(order.id, position, p.dict())
+
+    previous = conn.execute("SELECT status, version FROM orders WHERE id = ?", (order.id,)).fetchone()
+    if previous is None and restore_archived(conn, order.id):
+        previous = conn.execute("SELECT status, version FROM orders WHERE id = ?", (order.id,)).fetchone()
+    if order.expectedVersion is not None:
+        # Checked under the write lock, so no other writer can slip in between
+        current = previous['version'] if previous else 0
+        if current != order.expectedVersion:
+            raise VersionConflict(order.id, current)
+    if previous:
+        apply_order_spend(conn, order.id, -1)
+    version = next_version(conn)
+    conn.execute('''
+    INSERT INTO orders (id, status, products, createdAt, deliveredAt, estimatedDeliveryDate, branch, version, updated_at)
+    VALUES (?, ?, '[]', ?, ?, ?, ?, ?, strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
     ON CONFLICT(id) DO UPDATE SET
         status=excluded.status,
-        products=excluded.products,
         createdAt=excluded.createdAt,
         deliveredAt=excluded.deliveredAt,
         estimatedDeliveryDate=excluded.estimatedDeliveryDate,
-        branch=excluded.branch
-    ''', (order.id, order.status, products_json, order.createdAt, order.deliveredAt, order.estimatedDeliveryDate, order.branch))
-    
-    # Update last_price for products with valid price
-    for p in order.products:
-        if p.price and p.price > 0:
-            cursor.execute("UPDATE master_products SET last_price = ? WHERE id = ?", (p.price, p.id))
-    
-    conn.commit()
-    conn.close()
+        branch=excluded.branch,
+        version=excluded.version,
+        updated_at=excluded.updated_at
+    ''', (order.id, order.status, order.createdAt, order.deliveredAt, order.estimatedDeliveryDate, order.branch, version))
+    conn.execute("DELETE FROM order_tombstones WHERE order_id = ?", (order.id,))
+
+    conn.execute(
+        "DELETE FROM order_items WHERE order_id = ? AND product_id NOT IN (SELECT value FROM json_each(?))",
+        (order.id, json.dumps(list(items))),
+    )
+    conn.executemany(ORDER_ITEM_UPSERT, items.values())
+    apply_order_spend(conn, order.id, 1)
+
+    previous_status = previous['status'] if previous else None
+    if order.status != previous_status:
+        queue_status_notification(conn, order.id, order.branch, order.status, previous_status)
+
+    return {
+        "type": "order",
+        "id": order.id,
+        "version": version,
+        "branch": order.branch,
+        "status": order.status,
+        "previousStatus": previous_status,
+    }
+
+# A price is appended to price_history only when it differs from the last one
+# recorded for the same order line, so re-saving an order adds nothing
+PRICE_HISTORY_INSERT = '''
+INSERT INTO price_history (product_id, branch, price, order_id, recorded_at)
+SELECT ?1, ?2, ?3, ?4, strftime('%Y-%m-%dT%H:%M:%fZ', 'now')
+WHERE ?3 IS NOT (
+    SELECT price FROM price_history WHERE order_id = ?4 AND product_id = ?1 ORDER BY id DESC LIMIT 1
+)
+'''
+
+def update_last_prices(conn, orders: List[Order]) -> None:
+    """Propagate priced lines to master_products.last_price and price_history in batches"""
+    record_prices(conn, [(p.id, order.branch, p.price, order.id) for order in orders for p in order.products])
+
+def record_prices(conn, lines: list) -> None:
+    """Apply (product_id, branch, price, order_id) lines; unpriced ones are skipped"""
+    prices = {}
+    history = []
+    for product_id, branch, price, order_id in lines:
+        if price and price > 0:
+            # Later lines win, as if the orders were sent one by one
+            prices[product_id] = price
+            history.append((product_id, branch, price, order_id))
+    if not prices:
+        return
+    cursor = conn.executemany(
+        "UPDATE master_products SET last_price = ? WHERE id = ? AND last_price IS NOT ?",
+        [(price, product_id, price) for product_id, price in prices.items()],
+    )
+    # Rows that already had the price are skipped, and the catalogue ETag survives
+    if cursor.rowcount > 0:
+        next_version(conn, 'products')
+    if conn.executemany(PRICE_HISTORY_INSERT, history).rowcount > 0:
+        next_version(conn, 'prices')
+
+# Rolling windows reported by GET /products/{id}/prices, in days
+PRICE_WINDOWS = (7, 30, 90, 365)
+
+def load_price_stats(product_id: str, branch: Optional[str] = None) -> Optional[dict]:
+    """min/avg/max of recorded prices per rolling window ending today"""
+    with connection() as conn:
+        product = conn.execute(
+            "SELECT id, name, unit, last_price FROM master_products WHERE id = ?", (product_id,)
+        ).fetchone()
+        if product is None:
+            return None
+
+        # One range scan over (product_id, recorded_at) covers every window
+        columns, params = [], []
+        for days in PRICE_WINDOWS:
+            start = f"date('now', '-{days} days')"
+            columns.append(
+                f"MIN(CASE WHEN recorded_at >= {start} THEN price END), "
+                f"AVG(CASE WHEN recorded_at >= {start} THEN price END), "
+                f"MAX(CASE WHEN recorded_at >= {start} THEN price END), "
+                f"COUNT(CASE WHEN recorded_at >= {start} THEN 1 END)"
+            )
+        sql = (f"SELECT {', '.join(columns)} FROM price_history "
+               f"WHERE product_id = ? AND recorded_at >= date('now', '-{max(PRICE_WINDOWS)} days')")
+        params.append(product_id)
+        if branch:
+            sql += " AND branch = ?"
+            params.append(branch)
+        row = conn.execute(sql, params).fetchone()
+
+    windows = []
+    for index, days in enumerate(PRICE_WINDOWS):
+        low, avg, high, count = row[index * 4:index * 4 + 4]
+        windows.append({
+            "days": days,
+            "min": low,
+            "avg": round(avg, 2) if avg is not None else None,
+            "max": high,
+            "count": count,
+        })
+    return {
+        "productId": product['id'],
+        "name": product['name'],
+        "unit": product['unit'],
+        "branch": branch,
+        "lastPrice": product['last_price'],
+        "windows": windows,
+    }
+
+def save_orders(orders: List[Order]) -> List[dict]:
+    """Write orders and their price updates in one BEGIN IMMEDIATE transaction"""
+    with connection() as conn, transaction(conn):
+        changes = [write_order(conn, order) for order in orders]
+        update_last_prices(conn, orders)
+        if changes:
+            record_events(conn, changes)
+    return changes
+
+def save_order(order: Order) -> dict:
+    """Write a single order; returns the change event for the write"""
+    return save_orders([order])[0]
+
+def patch_order(order_id: str, patch: OrderPatch) -> Optional[dict]:
+    """Apply PATCH operations in one transaction; None if the order doesn't exist.
+
+    Only the touched columns and lines are written. Raises InvalidPatch for
+    operations that don't fit the order and VersionConflict on a stale
+    expectedVersion.
+    """
+    with connection() as conn, transaction(conn):
+        current = conn.execute("SELECT status, branch, version FROM orders WHERE id = ?", (order_id,)).fetchone()
+        if current is None and restore_archived(conn, order_id):
+            current = conn.execute("SELECT status, branch, version FROM orders WHERE id = ?", (order_id,)).fetchone()
+        if current is None:
+            return None
+        if patch.expectedVersion is not None and patch.expectedVersion != current['version']:
+            raise VersionConflict(order_id, current['version'])
+
+        apply_order_spend(conn, order_id, -1)
+        header = {}
+        priced = []
+        for n, op in enumerate(patch.operations):
+            if op.op == 'set_status':
+                if not op.status:
+                    raise InvalidPatch(f"operations[{n}]: status is required")
+                header['status'] = op.status
+            elif op.op == 'set_delivery':
+                header.update({k: v for k, v in op.dict(exclude_unset=True).items()
+                               if k in ('estimatedDeliveryDate', 'deliveredAt')})
+            elif op.op == 'set_item':
+                changes = op.changes.dict(exclude_unset=True) if op.changes else {}
+                if not op.productId or not changes:
+                    raise InvalidPatch(f"operations[{n}]: productId and changes are required")
+                if 'quantity' in changes and changes['quantity'] is None:
+                    raise InvalidPatch(f"operations[{n}]: quantity can't be null")
+                if 'checked' in changes and changes['checked'] is not None:
+                    changes['checked'] = int(changes['checked'])
+                cursor = conn.execute(
+                    f"UPDATE order_items SET {', '.join(f'{c} = ?' for c in changes)} WHERE order_id = ? AND product_id = ?",
+                    (*changes.values(), order_id, op.productId),
+                )
+                if cursor.rowcount == 0:
+                    raise InvalidPatch(f"operations[{n}]: product {op.productId} is not in the order")
+                if 'price' in changes:
+                    priced.append((op.productId, changes['price']))
+            elif op.op == 'add_item':
+                if op.product is None:
+                    raise InvalidPatch(f"operations[{n}]: product is required")
+                position = conn.execute(
+                    "SELECT COALESCE(MAX(position) + 1, 0) FROM order_items WHERE order_id = ?", (order_id,)
+                ).fetchone()[0]
+                try:
+                    conn.execute(
+                        f"INSERT INTO order_items (order_id, {', '.join(ORDER_ITEM_COLUMNS)}) "
+                        f"VALUES ({', '.join('?' * (len(ORDER_ITEM_COLUMNS) + 1))})",
+                        order_item_row(order_id, position, op.product.dict()),
+                    )
+                except sqlite3.IntegrityError:
+                    raise InvalidPatch(f"operations[{n}]: product {op.product.id} is already in the order")
+                priced.append((op.product.id, op.product.price))
+            elif op.op == 'remove_item':
+                cursor = conn.execute(
+                    "DELETE FROM order_items WHERE order_id = ? AND product_id = ?", (order_id, op.productId)
+                )
+                if cursor.rowcount == 0:
+                    raise InvalidPatch(f"operations[{n}]: product {op.productId} is not in the order")
+
+        version = next_version(conn)
+        header['version'] = version
+        conn.execute(
+            f"UPDATE orders SET {', '.join(f'{c} = ?' for c in header)}, "
+            "updated_at = strftime('%Y-%m-%dT%H:%M:%fZ', 'now') WHERE id = ?",
+            (*header.values(), order_id),
+        )
+        apply_order_spend(conn, order_id, 1)
+        status = header.get('status', current['status'])
+        if status != current['status']:
+            queue_status_notification(conn, order_id, current['branch'], status, current['status'])
+        record_prices(conn, [(product_id, current['branch'], price, order_id) for product_id, price in priced])
+        change = {
+            "type": "order",
+            "id": order_id,
+            "version": version,
+            "branch": current['branch'],
+            "status": status,
+            "previousStatus": current['status'],
+        }
+        record_events(conn, [change])
+    return change
+
+def delete_order(order_id: str) -> Optional[dict]:
+    """Delete an order (its lines cascade) and leave a tombstone; None if missing"""
+    with connection() as conn, transaction(conn):
+        existing = conn.execute("SELECT branch, status FROM orders WHERE id = ?", (order_id,)).fetchone()
+        if existing is None and restore_archived(conn, order_id):
+            existing = conn.execute("SELECT branch, status FROM orders WHERE id = ?", (order_id,)).fetchone()
+        if existing is None:
+            return None
+        apply_order_spend(conn, order_id, -1)
+        version = next_version(conn)
+        conn.execute("DELETE FROM orders WHERE id = ?", (order_id,))
+        conn.execute('''
+        INSERT INTO order_tombstones (order_id, version, deleted_at)
+        VALUES (?, ?, strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+        ON CONFLICT(order_id) DO UPDATE SET version=excluded.version, deleted_at=excluded.deleted_at
+        ''', (order_id, version))
+        change = {
+            "type": "deleted",
+            "id": order_id,
+            "version": version,
+            "branch": existing['branch'],
+            "previousStatus": existing['status'],
+        }
+        record_events(conn, [change])
+    return change
+
+# --- Conditional GET / response cache ---
+# GET /products and GET /orders carry a strong ETag derived from the table
+# change counters. The counters are kept in memory and only re-read after a
+# commit by this or another process (other API workers, the bot, archive.py),
+# which PRAGMA data_version reveals without reading any table, so a
+# revalidation (If-None-Match -> 304) or a cache hit costs one data_version
+# check on the db executor and no table reads.
+
+response_cache = TTLCache(
+    max_entries=int(os.getenv('RESPONSE_CACHE_SIZE', '256')),
+    enabled=env_flag('RESPONSE_CACHE_ENABLED'),
+)
+metrics.watch_cache('responses', response_cache)
+# Latest ChangeWatcher.read result: (sequence, data_version, counters)
+_table_versions = None
+_db_changes = ChangeWatcher()
+
+def read_counters(conn) -> dict:
+    return {name: current_version(conn, name) for name in ('orders', 'products', 'prices')}
+
+def load_table_versions(known: Optional[tuple] = None) -> tuple:
+    """Counters with the data_version they were read at; `known` while nothing changed"""
+    return _db_changes.read(read_counters, known)
+
+async def table_versions() -> dict:
+    global _table_versions
+    snapshot = await run_db(load_table_versions, _table_versions)
+    # Concurrent requests read in parallel; an older read finishing last
+    # must not replace a newer one
+    if _table_versions is None or snapshot[0] >= _table_versions[0]:
+        _table_versions = snapshot
+    return snapshot[2]
+
+def invalidate_caches() -> None:
+    """Forget cached responses and counters after a write"""
+    global _table_versions
+    _table_versions = None
+    response_cache.clear()
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {tag.strip() for tag in header.split(",")}
+    # Proxies that compress (nginx gzip) hand back weak versions of our tags
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+async def conditional_json(request: Request, tables: tuple, build, vary: str = "", columnar=None) -> Response:
+    """Serve JSON with an ETag over `tables` versions, 304 or cache when possible.
+
+    `build` is an async callable returning (payload, extra_headers); `vary`
+    adds anything else the payload depends on (e.g. the current date).
+    The body is MessagePack when the Accept header asks for it, and
+    `columnar(payload)` when the request has ?layout=columnar.
+    """
+    media_type = negotiate(request.headers.get("accept"))
+    if request.query_params.get("layout") == "columnar" and columnar is None:
+        raise HTTPException(status_code=400, detail="This endpoint has no columnar layout")
+
+    versions = await table_versions()
+    key = (request.url.path, tuple(sorted(request.query_params.multi_items())), vary, media_type)
+    digest = hashlib.sha1(repr((key, [versions[t] for t in tables])).encode()).hexdigest()
+    etag = f'"{digest[:24]}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept"}
+
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    cached = response_cache.get(key)
+    if cached is not None and cached[0] == etag:
+        _, body, extra = cached
+    else:
+        payload, extra = await build()
+        if columnar and request.query_params.get("layout") == "columnar":
+            payload = columnar(payload)
+        body = encode(payload, media_type)
+        response_cache.put(key, (etag, body, extra))
+    return Response(body, media_type=media_type, headers={**extra, **headers})
+
+@app.get("/products")
+async def get_products(request: Request):
+    async def build():
+        return await run_db(load_products), {}
+    return await conditional_json(request, ("products",), build, columnar=columnar_products)
+
+_product_index = None
+_product_index_lock = asyncio.Lock()
+
+def build_product_index(previous: Optional[ProductIndex], version: int) -> ProductIndex:
+    """Load the catalogue and (re)build its search index; runs on the db executor"""
+    products = load_products()
+    if previous is None:
+        return ProductIndex(products, version)
+    return previous.refreshed(products, version)
+
+async def product_index() -> ProductIndex:
+    """Search index for the current catalogue, rebuilt when the products counter moves"""
+    global _product_index
+    version = (await table_versions())["products"]
+    if _product_index is not None and _product_index.version == version:
+        return _product_index
+    # Building takes ~100 ms for a few thousand products: off the event loop,
+    # and once, however many searches arrive meanwhile
+    async with _product_index_lock:
+        if _product_index is None or _product_index.version != version:
+            _product_index = await run_db(build_product_index, _product_index, version)
+    return _product_index
+
+@app.get("/products/search")
+async def search_products(q: str = Query(..., min_length=1, max_length=100), limit: int = Query(20, ge=1, le=100)):
+    # Prefix, substring and typo-tolerant matches over names and categories,
+    # best first. Not put in the response cache: every keystroke is a new query.
+    index = await product_index()
+    return await run_db(index.search, q, limit)
+
+@app.get("/products/{product_id}/prices")
+async def get_product_prices(request: Request, product_id: str, branch: Optional[str] = None):
+    # Computed once per (price history version, day) and then served from the
+    # response cache or as a 304
+    async def build():
+        stats = await run_db(load_price_stats, product_id, branch)
+        if stats is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        return stats, {}
+    today = datetime.utcnow().date().isoformat()
+    return await conditional_json(request, ("products", "prices"), build, vary=today)
+
+@app.get("/orders")
+async def get_orders(
+    request: Request,
+    branch: Optional[List[str]] = Query(None),
+    status: Optional[List[str]] = Query(None),
+    created_after: Optional[str] = None,
+    created_before: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_ORDERS_PAGE),
+    cursor: Optional[str] = None,
+    history: bool = False,
+    order: Literal["asc", "desc"] = "asc",
+):
+    # branch and status may be repeated (?status=a&status=b).
+    # When more rows remain, the next page's cursor is sent in X-Next-Cursor.
+    # history=true also returns archived orders (see archive.py).
+    # order=desc pages newest first; its cursors continue with older orders.
+    after = decode_cursor(cursor) if cursor else None
+
+    async def build():
+        orders, next_cursor, version = await run_db(
+            load_order_history if history else load_orders, branch, status, created_after, created_before, limit, after,
+            descending=order == "desc",
+        )
+        # Starting point for GET /orders/changes
+        headers = {"X-Orders-Version": str(version)}
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+        return orders, headers
+
+    # lastPrice comes from master_products, so both counters feed the ETag
+    return await conditional_json(request, ("orders", "products"), build, columnar=columnar_orders)
+
+@app.get("/orders/changes")
+async def get_order_changes(
+    since: int = Query(..., ge=0),
+    branch: Optional[List[str]] = Query(None),
+):
+    # Clients poll with the last "version" they saw and merge the result:
+    # replace/add "orders", drop ids in "deleted"
+    return await run_db(load_changes, since, branch)
+
+@app.get("/orders/export")
+async def export_orders(
+    format: Literal["csv", "xlsx"] = "csv",
+    branch: Optional[List[str]] = Query(None),
+    status: Optional[List[str]] = Query(None),
+    created_after: Optional[str] = None,
+    created_before: Optional[str] = None,
+    history: bool = False,
+):
+    # One row per order line; same filters as GET /orders. With history=true
+    # the archived orders come first, then the hot ones.
+    queries = [export_query(branch, status, created_after, created_before)]
+    if history:
+        queries.insert(0, export_query(branch, status, created_after, created_before, archived=True))
+    filename = f"orders-{datetime.utcnow():%Y%m%d-%H%M}.{format}"
+    return StreamingResponse(
+        stream_export(format, queries),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/reports/spend")
+async def get_spend_report(
+    request: Request,
+    group_by: List[str] = Query(["branch", "category"]),
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    branch: Optional[List[str]] = Query(None),
+):
+    # Reads the pre-aggregated spend_daily rows; from/to are inclusive days
+    # (YYYY-MM-DD) and group_by is any of branch, category, day, month
+    unknown = [g for g in group_by if g not in GROUP_COLUMNS]
+    if unknown or ("day" in group_by and "month" in group_by):
+        raise HTTPException(status_code=400, detail=f"Invalid group_by: {', '.join(unknown or group_by)}")
+
+    async def build():
+        return await run_db(load_spend_report, list(dict.fromkeys(group_by)), date_from, date_to, branch), {}
+    return await conditional_json(request, ("orders",), build)
+
+# Seconds between keep-alive comments on idle streams
+STREAM_HEARTBEAT = 15
+
+@app.get("/orders/stream")
+async def stream_orders(request: Request, branch: Optional[str] = None, role: Optional[str] = None):
+    # Server-Sent Events: one small "order"/"deleted" event per change. Clients
+    # fetch the data itself via /orders/changes; "resync" means events were
+    # dropped because the client (or this worker's relay) fell behind.
+    subscriber = hub.subscribe(branch, role)
+
+    async def events():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), timeout=STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": ping\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            hub.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # X-Accel-Buffering stops the nginx /api/ proxy from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def parse_if_match(value: str) -> int:
+    """Order version from an If-Match header ("12", W/"12" or 12)"""
+    try:
+        return int(value.strip().removeprefix('W/').strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="If-Match must be an order version")
+
+async def version_conflict(conflict: VersionConflict) -> JSONResponse:
+    """409 carrying the order as it is now, so the client can reapply its edit"""
+    current = await run_db(load_order, conflict.order_id)
+    return JSONResponse(
+        status_code=409,
+        content={"detail": "Order was changed by someone else", "version": conflict.current_version, "order": current},
+        headers={"ETag": f'"{conflict.current_version}"'},
+    )
+
+@app.post("/orders/upsert")
+async def upsert_order(order: Order, if_match: Optional[str] = Header(None)):
+    if if_match is not None:
+        order.expectedVersion = parse_if_match(if_match)
+    try:
+        change = await run_db(save_order, order)
+    except VersionConflict as conflict:
+        return await version_conflict(conflict)
+    invalidate_caches()
+    hub.publish(change)
+    return JSONResponse({"status": "success", "version": change["version"]}, headers={"ETag": f'"{change["version"]}"'})
+
+# Largest batch accepted by POST /orders/bulk-upsert; validation stops at
+# the first order past it (422) instead of building the whole list
+MAX_BULK_ORDERS = 500
+
+@app.post("/orders/bulk-upsert")
+async def bulk_upsert_orders(orders: Annotated[List[Order], Field(max_length=MAX_BULK_ORDERS)]):
+    # All orders commit (or fail) together in one transaction
+    try:
+        changes = await run_db(save_orders, orders) if orders else []
+    except VersionConflict as conflict:
+        return await version_conflict(conflict)
+    invalidate_caches()
+    for change in changes:
+        hub.publish(change)
+    return {"status": "success", "versions": {change["id"]: change["version"] for change in changes}}
+
+@app.patch("/orders/{order_id}")
+async def patch_order_endpoint(order_id: str, patch: OrderPatch, if_match: Optional[str] = Header(None)):
+    if if_match is not None:
+        patch.expectedVersion = parse_if_match(if_match)
+    try:
+        change = await run_db(patch_order, order_id, patch)
+    except VersionConflict as conflict:
+        return await version_conflict(conflict)
+    except InvalidPatch as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if change is None:
+        raise HTTPException(status_code=404, detail="Order not found")
+    invalidate_caches()
+    hub.publish(change)
+    return JSONResponse({"status": "success", "version": change["version"]}, headers={"ETag": f'"{change["version"]}"'})
+
+@app.delete("/orders/{order_id}")
+async def remove_order(order_id: str):
+    change = await run_db(delete_order, order_id)
+    if change is None:
+        raise HTTPException(status_code=404, detail="Order not found")
+    invalidate_caches()
+    hub.publish(change)
+    return {"status": "success", "version": change["version"]}
+
+# --- Admin ---
+# Only reachable inside the docker network (nginx denies /api/admin/); set
+# ADMIN_TOKEN to also require it in an X-Admin-Token header.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+def check_admin(token: Optional[str]) -> None:
+    if ADMIN_TOKEN and not secrets.compare_digest(token or "", ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+def load_query_report(limit: int, order: str) -> dict:
+    with connection() as conn:
+        return querylog.report(conn, limit, order)
+
+@app.get("/admin/queries")
+async def get_query_report(
+    limit: int = Query(20, ge=1, le=200),
+    order: Literal["total", "mean", "max"] = "total",
+    x_admin_token: Optional[str] = Header(None),
+):
+    # Costliest statements since the previous trace window began, with their
+    # query plans; "full_scans" lists plan steps that read a whole table.
+    # Empty unless the API runs with QUERY_TRACE=1.
+    check_admin(x_admin_token)
+    return await run_db(load_query_report, limit, order)
+
+@app.delete("/admin/queries")
+async def reset_query_report(x_admin_token: Optional[str] = Header(None)):
+    check_admin(x_admin_token)
+    querylog.stats.reset()
     return {"status": "success"}
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    # Prometheus scrape target (request, SQL, pool and lock wait timings)
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    workers = API_WORKERS or os.cpu_count() or 1
+    if workers == 1:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
+    else:
+        # Create/migrate once before the workers start (they find it done),
+        # and let them pool their metrics
+        prepare_db()
+        metrics.setup_shared_dir()
+        uvicorn.run("api:app", host="0.0.0.0", port=8000, workers=workers)
@@ -0,0 +1,245 @@
+# Archival of completed orders
+# Completed orders whose last change is older than ARCHIVE_AFTER_DAYS move
+# out of orders/order_items into orders_archive: one row per order, its lines
+# stored as zlib-compressed JSON. The hot tables then only hold the working
+# set that every GET /orders reads. Archived orders are read only when a
+# request asks for history (GET /orders?history=true, the export), and they
+# still count in spend reports.
+#
+# ARCHIVE_DB_PATH keeps the archive in a separate database file (db.py
+# attaches it). SQLite does not commit across attached WAL databases
+# atomically, so archiving is idempotent: an order found in both places
+# after a crash is read from the hot table and archived again next run.
+# Writing to an archived order (upsert, PATCH, DELETE) first moves it back.
+#
+#   python archive.py run [--days 90]
+#   python archive.py restore ORDER_ID
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Optional
+
+from db import connection, transaction, run_db, next_version, ORDER_ITEM_COLUMNS, ARCHIVE_SCHEMA
+from events import record_events
+
+# Age (days since the last change) at which completed orders are archived;
+# 0 leaves archiving to `python archive.py run`
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', '0'))
+ARCHIVE_INTERVAL = float(os.getenv('ARCHIVE_INTERVAL', '3600'))
+# Orders moved per transaction, so writers are never blocked for long
+ARCHIVE_BATCH = int(os.getenv('ARCHIVE_BATCH', '200'))
+
+ARCHIVE_TABLE = f'{ARCHIVE_SCHEMA}.orders_archive'
+ORDER_COLUMNS = ('id', 'status', 'createdAt', 'deliveredAt', 'estimatedDeliveryDate', 'branch', 'version')
+
+logger = logging.getLogger(__name__)
+
+
+def compress_lines(rows: list) -> bytes:
+    return zlib.compress(json.dumps(rows, ensure_ascii=False, separators=(',', ':')).encode(), 6)
+
+
+def decompress_lines(blob: bytes) -> List[dict]:
+    """Order lines as order_items-style dicts (product_id, position, name, ...)"""
+    return [dict(zip(ORDER_ITEM_COLUMNS, values)) for values in json.loads(zlib.decompress(blob))]
+
+
+def archived_lines(alias: str = 'a') -> str:
+    """FROM clause with one row per archived line: orders_archive `alias`, lines j"""
+    return f"{ARCHIVE_TABLE} {alias}, json_each(inflate({alias}.lines)) j"
+
+
+def line_column(name: str) -> str:
+    """SQL for an order_items column of an archived line (see archived_lines)"""
+    return f"j.value ->> {ORDER_ITEM_COLUMNS.index(name)}"
+
+
+def archive_batch(cutoff: str, batch: int = ARCHIVE_BATCH) -> int:
+    """Move up to `batch` completed orders last changed before `cutoff`; returns how many moved"""
+    with connection() as conn, transaction(conn):
+        orders = conn.execute(
+            f"SELECT {', '.join(ORDER_COLUMNS)} FROM orders "
+            "WHERE status = 'completed' AND COALESCE(updated_at, createdAt) < ? ORDER BY createdAt, id LIMIT ?",
+            (cutoff, batch),
+        ).fetchall()
+        if not orders:
+            return 0
+        ids = [order['id'] for order in orders]
+        placeholders = ', '.join('?' * len(ids))
+        lines = {}
+        for row in conn.execute(
+            f"SELECT order_id, {', '.join(ORDER_ITEM_COLUMNS)} FROM order_items "
+            f"WHERE order_id IN ({placeholders}) ORDER BY order_id, position",
+            ids,
+        ):
+            lines.setdefault(row['order_id'], []).append(list(row)[1:])
+        archived_at = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+        conn.executemany(
+            f"INSERT OR REPLACE INTO {ARCHIVE_TABLE} ({', '.join(ORDER_COLUMNS)}, archived_at, lines) "
+            f"VALUES ({', '.join('?' * (len(ORDER_COLUMNS) + 2))})",
+            [(*order, archived_at, compress_lines(lines.get(order['id'], []))) for order in orders],
+        )
+        # order_items go with them (ON DELETE CASCADE); spend_daily and
+        # price_history keep their rows, archived spend still counts
+        conn.execute(f"DELETE FROM orders WHERE id IN ({placeholders})", ids)
+        # To delta readers (GET /orders?since=, the event stream) an archived
+        # order is gone: each gets a tombstone and a "deleted" event, as in
+        # api.delete_order
+        changes = []
+        for order in orders:
+            version = next_version(conn)
+            changes.append({
+                "type": "deleted",
+                "id": order['id'],
+                "version": version,
+                "branch": order['branch'],
+                "previousStatus": order['status'],
+            })
+        conn.executemany('''
+        INSERT INTO order_tombstones (order_id, version, deleted_at)
+        VALUES (?, ?, strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+        ON CONFLICT(order_id) DO UPDATE SET version=excluded.version, deleted_at=excluded.deleted_at
+        ''', [(change['id'], change['version']) for change in changes])
+        record_events(conn, changes)
+    return len(orders)
+
+
+def archive_orders(days: int, batch: int = ARCHIVE_BATCH, now: Optional[datetime] = None) -> int:
+    """Archive every completed order last changed more than `days` ago"""
+    cutoff = ((now or datetime.now(timezone.utc)) - timedelta(days=days)).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+    total = 0
+    while True:
+        moved = archive_batch(cutoff, batch)
+        total += moved
+        if moved < batch:
+            return total
+
+
+def restore(conn, order_id: str) -> bool:
+    """Move an archived order back into orders/order_items inside the caller's
+    write transaction; False if it isn't archived.
+
+    Its spend never left spend_daily, so nothing is re-added there.
+    """
+    row = conn.execute(
+        f"SELECT {', '.join(ORDER_COLUMNS)}, lines FROM {ARCHIVE_TABLE} WHERE id = ?", (order_id,)
+    ).fetchone()
+    if row is None:
+        return False
+    # The order keeps its version (its content is unchanged, so If-Match
+    # still works); the counter moves because listings change. A fresh
+    # updated_at keeps the next run from archiving it straight away. The
+    # write that follows gives it a new version, and its tombstone goes.
+    next_version(conn)
+    conn.execute(
+        "INSERT OR IGNORE INTO orders (id, status, products, createdAt, deliveredAt, estimatedDeliveryDate, branch, "
+        "version, updated_at) VALUES (?, ?, '[]', ?, ?, ?, ?, ?, strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))",
+        tuple(row[c] for c in ORDER_COLUMNS),
+    )
+    conn.executemany(
+        f"INSERT OR IGNORE INTO order_items (order_id, {', '.join(ORDER_ITEM_COLUMNS)}) "
+        f"VALUES ({', '.join('?' * (len(ORDER_ITEM_COLUMNS) + 1))})",
+        [(order_id, *[line[c] for c in ORDER_ITEM_COLUMNS]) for line in decompress_lines(row['lines'])],
+    )
+    conn.execute(f"DELETE FROM {ARCHIVE_TABLE} WHERE id = ?", (order_id,))
+    conn.execute("DELETE FROM order_tombstones WHERE order_id = ?", (order_id,))
+    return True
+
+
+def restore_order(order_id: str) -> bool:
+    """Restore an archived order on its own; it gets a new version so delta
+    readers that dropped it on archiving load it again"""
+    with connection() as conn, transaction(conn):
+        if not restore(conn, order_id):
+            return False
+        version = next_version(conn)
+        conn.execute("UPDATE orders SET version = ? WHERE id = ?", (version, order_id))
+        row = conn.execute("SELECT branch, status FROM orders WHERE id = ?", (order_id,)).fetchone()
+        record_events(conn, [{
+            "type": "order",
+            "id": order_id,
+            "version": version,
+            "branch": row['branch'],
+            "status": row['status'],
+            "previousStatus": row['status'],
+        }])
+    return True
+
+
+def load_archived(
+    branch: Optional[List[str]] = None,
+    status: Optional[List[str]] = None,
+    created_after: Optional[str] = None,
+    created_before: Optional[str] = None,
+    limit: Optional[int] = None,
+    after: Optional[tuple] = None,
+    descending: bool = False,
+) -> list:
+    """Archived orders by (createdAt, id), filtered and paged like api.load_orders.
+
+    Each is a dict of ORDER_COLUMNS plus its decompressed "lines". Orders
+    also still in the hot table are left out, the hot copy wins.
+    """
+    clauses, params = ["id NOT IN (SELECT id FROM orders)"], []
+    if branch:
+        clauses.append(f"branch IN ({', '.join('?' * len(branch))})")
+        params.extend(branch)
+    if status:
+        clauses.append(f"status IN ({', '.join('?' * len(status))})")
+        params.extend(status)
+    if created_after:
+        clauses.append("createdAt >= ?")
+        params.append(created_after)
+    if created_before:
+        clauses.append("createdAt < ?")
+        params.append(created_before)
+    if after:
+        clauses.append(f"(createdAt, id) {'<' if descending else '>'} (?, ?)")
+        params.extend(after)
+    order_by = "createdAt DESC, id DESC" if descending else "createdAt, id"
+    sql = f"SELECT {', '.join(ORDER_COLUMNS)}, lines FROM {ARCHIVE_TABLE} WHERE {' AND '.join(clauses)} ORDER BY {order_by}"
+    if limit:
+        sql += " LIMIT ?"
+        params.append(limit)
+    with connection() as conn:
+        rows = conn.execute(sql, params).fetchall()
+    return [{**{c: row[c] for c in ORDER_COLUMNS}, 'lines': decompress_lines(row['lines'])} for row in rows]
+
+
+async def run_archiver(on_archived: Callable[[int], None], days: int = ARCHIVE_AFTER_DAYS,
+                       interval: float = ARCHIVE_INTERVAL) -> None:
+    """Archive every `interval` seconds; `on_archived(count)` runs after orders moved"""
+    while True:
+        try:
+            moved = await run_db(archive_orders, days)
+            if moved:
+                logger.info(f"Archived {moved} completed orders")
+                on_archived(moved)
+        except Exception as e:
+            logger.error(f"Error archiving orders: {e}")
+        await asyncio.sleep(interval)
+
+
+if __name__ == '__main__':
+    from db import init_db
+
+    parser = argparse.ArgumentParser(description='Move completed orders to orders_archive')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='archive completed orders')
+    run_parser.add_argument('--days', type=int, default=ARCHIVE_AFTER_DAYS or 90,
+                            help='minimum days since the last change')
+    commands.add_parser('restore', help='move an archived order back').add_argument('order_id')
+    args = parser.parse_args()
+
+    init_db()
+    if args.command == 'run':
+        print(f"Archived {archive_orders(args.days)} orders")
+    elif restore_order(args.order_id):
+        print(f"Restored {args.order_id}")
+    else:
+        print(f"{args.order_id} is not archived")
@@ -0,0 +1 @@
+# Offline benchmarks for the API and bot (run with `python -m bench.<name>`)
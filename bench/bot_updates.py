@@ -0,0 +1,234 @@
+# Update throughput benchmark for the Telegram bot (main.py)
+#
+# Runs the bot against a local fake Bot API server, so no token or network is
+# needed. Each simulated user walks the first registration steps (/start,
+# language button, full name), which costs the bot five Bot API calls with
+# --latency-ms of simulated round trip each. The run ends once every user
+# has been answered at every step. Reports updates/second.
+#
+#   python -m bench.bot_updates --mode polling --concurrency 1    # old behaviour
+#   python -m bench.bot_updates --mode polling --concurrency 32
+#   python -m bench.bot_updates --mode webhook --concurrency 32
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from urllib.parse import parse_qs
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOKEN = '123456:BENCH'
+BOT_USER = {'id': 123456, 'is_bot': True, 'first_name': 'Bench', 'username': 'bench_bot'}
+# sendMessage calls per user for the three steps (/start, lang_ru, name)
+REPLIES_PER_USER = 3
+
+
+def synthetic_updates(users: int) -> list:
+    """Three registration updates per user, interleaved across users"""
+    updates = []
+    now = int(time.time())
+    for step in range(3):
+        for n in range(users):
+            uid = 10_000 + n
+            chat = {'id': uid, 'type': 'private'}
+            sender = {'id': uid, 'is_bot': False, 'first_name': f'User{n}'}
+            update_id = len(updates) + 1
+            if step == 0:
+                update = {'message': {
+                    'message_id': update_id, 'date': now, 'chat': chat, 'from': sender, 'text': '/start',
+                    'entities': [{'type': 'bot_command', 'offset': 0, 'length': 6}],
+                }}
+            elif step == 1:
+                update = {'callback_query': {
+                    'id': str(update_id), 'from': sender, 'chat_instance': str(uid), 'data': 'lang_ru',
+                    'message': {'message_id': update_id, 'date': now, 'chat': chat, 'from': BOT_USER, 'text': '...'},
+                }}
+            else:
+                update = {'message': {
+                    'message_id': update_id, 'date': now, 'chat': chat, 'from': sender, 'text': f'Bench User {n}',
+                }}
+            update['update_id'] = update_id
+            updates.append(update)
+    return updates
+
+
+class FakeBotApi:
+    """Minimal Bot API: answers the methods main.py uses after a fixed delay"""
+
+    def __init__(self, updates: list, latency: float, flood_every: int = 0):
+        self.pending = list(updates)
+        self.latency = latency
+        # Answer every n-th sendMessage with 429 Too Many Requests
+        self.flood_every = flood_every
+        self.sent_at = {}
+        self.calls = {}
+        self.replies = {}
+        self.done = asyncio.Event()
+        self.expected = 0
+
+    def build(self):
+        from fastapi import FastAPI, Request
+        from fastapi.responses import JSONResponse
+
+        app = FastAPI()
+
+        @app.post('/bot{token}/{method}')
+        async def method(token: str, method: str, request: Request):
+            params = {k: v[0] for k, v in parse_qs((await request.body()).decode()).items()}
+            self.calls[method] = self.calls.get(method, 0) + 1
+            if method == 'getUpdates':
+                return {'ok': True, 'result': await self.get_updates(params)}
+            await asyncio.sleep(self.latency)
+            if method == 'getMe':
+                return {'ok': True, 'result': BOT_USER}
+            if method in ('sendMessage', 'editMessageText'):
+                chat_id = int(params['chat_id'])
+                if self.flood_every and self.calls[method] % self.flood_every == 0:
+                    return JSONResponse({'ok': False, 'error_code': 429, 'description': 'Too Many Requests: retry after 1',
+                                         'parameters': {'retry_after': 1}}, status_code=429)
+                self.sent_at.setdefault(chat_id, []).append(time.monotonic())
+                self.replies[chat_id] = self.replies.get(chat_id, 0) + 1
+                if self.expected and sum(self.replies.values()) >= self.expected:
+                    self.done.set()
+                return {'ok': True, 'result': {
+                    'message_id': 1, 'date': int(time.time()), 'text': params.get('text', ''),
+                    'chat': {'id': chat_id, 'type': 'private'}, 'from': BOT_USER,
+                }}
+            return {'ok': True, 'result': True}
+
+        return app
+
+    async def get_updates(self, params: dict) -> list:
+        offset = int(params.get('offset', 0))
+        self.pending = [u for u in self.pending if u['update_id'] >= offset]
+        if not self.pending:
+            await asyncio.sleep(min(float(params.get('timeout', 0)), 0.5))
+            return []
+        return self.pending[:int(params.get('limit', 100))]
+
+
+async def serve(app, port: int):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning'))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    return server, task
+
+
+async def post_updates(url: str, updates: list, connections: int) -> None:
+    """Deliver updates like Telegram does: in order per chat, chats in parallel"""
+    import httpx
+
+    by_chat = {}
+    for update in updates:
+        body = update.get('message') or update['callback_query']
+        by_chat.setdefault(body['chat']['id'] if 'chat' in body else body['message']['chat']['id'], []).append(update)
+    chats = asyncio.Queue()
+    for chat_updates in by_chat.values():
+        chats.put_nowait(chat_updates)
+
+    async def worker(http):
+        while not chats.empty():
+            for update in chats.get_nowait():
+                response = await http.post(url, json=update)
+                response.raise_for_status()
+
+    limits = httpx.Limits(max_connections=connections)
+    async with httpx.AsyncClient(timeout=60, limits=limits) as http:
+        await asyncio.gather(*(worker(http) for _ in range(connections)))
+
+
+async def run(mode: str, users: int, concurrency: int, latency: float, timeout: float) -> dict:
+    from bench.concurrency import free_port
+    from main import build_application, ALLOWED_UPDATES
+
+    updates = synthetic_updates(users)
+    fake = FakeBotApi(updates if mode == 'polling' else [], latency)
+    fake.expected = users * REPLIES_PER_USER
+    api_port = free_port()
+    api_server, api_task = await serve(fake.build(), api_port)
+
+    application = build_application(TOKEN, base_url=f'http://127.0.0.1:{api_port}/bot', concurrency=concurrency,
+                                    notifications=False)
+    started = time.perf_counter()
+    if mode == 'polling':
+        await application.initialize()
+        await application.updater.start_polling(allowed_updates=ALLOWED_UPDATES, poll_interval=0, timeout=1)
+        await application.start()
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(fake.done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        elapsed = time.perf_counter() - started
+        await application.updater.stop()
+        await application.stop()
+        await application.shutdown()
+    else:
+        from bot_webhook import create_app, WEBHOOK_PATH
+
+        hook_port = free_port()
+        hook_server, hook_task = await serve(create_app(application), hook_port)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(post_updates(f'http://127.0.0.1:{hook_port}{WEBHOOK_PATH}', updates, max(concurrency, 1)),
+                               fake.done.wait()),
+                timeout,
+            )
+        except asyncio.TimeoutError:
+            pass
+        elapsed = time.perf_counter() - started
+        hook_server.should_exit = True
+        await hook_task
+
+    api_server.should_exit = True
+    await api_task
+
+    answered = sum(1 for count in fake.replies.values() if count >= REPLIES_PER_USER)
+    handled = sum(min(count, REPLIES_PER_USER) for count in fake.replies.values())
+    return {
+        'mode': mode,
+        'users': users,
+        'concurrency': concurrency,
+        'latency_ms': latency * 1000,
+        'updates': len(updates),
+        'updates_handled': handled,
+        'users_completed': answered,
+        'wall_seconds': round(elapsed, 3),
+        'updates_per_second': round(handled / elapsed, 1),
+        'api_calls': fake.calls,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Update throughput benchmark for main.py')
+    parser.add_argument('--mode', choices=['polling', 'webhook'], default='polling')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=32, help='1 = sequential processing')
+    parser.add_argument('--latency-ms', type=float, default=50, help='simulated Bot API round trip')
+    parser.add_argument('--timeout', type=float, default=300)
+    parser.add_argument('--json', help='write the report to this file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # main.py creates its tables on import, so point it at a scratch database first
+        os.environ['DB_PATH'] = os.path.join(workdir, 'database.db')
+        sys.path.insert(0, REPO_ROOT)
+        logging.getLogger('httpx').setLevel(logging.WARNING)
+        report = asyncio.run(run(args.mode, args.users, args.concurrency, args.latency_ms / 1000, args.timeout))
+
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
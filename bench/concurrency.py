@@ -0,0 +1,176 @@
+# Concurrency benchmark for api.py
+#
+# Seeds a scratch database with synthetic orders, starts uvicorn on it and
+# hits /products, /orders and /orders/upsert from many parallel clients,
+# reporting p50/p99 latency per endpoint.
+#
+#   python -m bench.concurrency --clients 200 --requests 20
+#   python -m bench.concurrency --repo ../baseline-checkout   # compare another tree
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BRANCHES = ['chilanzar', 'uchtepa', 'shayzantaur', 'olmazar']
+STATUSES = ['sent_to_financier', 'sent_to_supplier', 'supplier_delivering', 'chef_checking', 'completed']
+
+
+def seed_orders(db_path: str, orders: int, products_per_order: int) -> None:
+    """Create the baseline orders table and fill it with synthetic orders"""
+    conn = sqlite3.connect(db_path)
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS orders (
+        id TEXT PRIMARY KEY,
+        status TEXT NOT NULL,
+        products TEXT NOT NULL,
+        createdAt TEXT NOT NULL,
+        deliveredAt TEXT,
+        estimatedDeliveryDate TEXT,
+        branch TEXT NOT NULL
+    )
+    ''')
+    rows = []
+    for i in range(orders):
+        products = [
+            {'id': str(p + 1), 'name': f'Product {p + 1}', 'category': 'Bench', 'quantity': random.randint(1, 20),
+             'unit': 'кг', 'price': random.randint(1000, 90000), 'checked': True}
+            for p in range(products_per_order)
+        ]
+        rows.append((f'bench-{i}', random.choice(STATUSES), json.dumps(products),
+                     f'2026-{1 + i % 12:02d}-{1 + i % 28:02d}T10:00:00', None, None, random.choice(BRANCHES)))
+    conn.executemany("INSERT OR REPLACE INTO orders VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(repo: str, workdir: str, port: int, workers: int = 1) -> subprocess.Popen:
+    env = dict(os.environ, DB_PATH=os.path.join(workdir, 'database.db'))
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'api:app', '--app-dir', repo,
+         '--port', str(port), '--log-level', 'warning', '--workers', str(workers)],
+        cwd=workdir, env=env,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            httpx.get(f'http://127.0.0.1:{port}/products', timeout=1)
+            return proc
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError('API server did not start')
+
+
+def upsert_payload(client_id: int, n: int) -> dict:
+    return {
+        'id': f'bench-client-{client_id}-{n}',
+        'status': 'sent_to_financier',
+        'createdAt': '2026-06-01T10:00:00',
+        'branch': random.choice(BRANCHES),
+        'products': [
+            {'id': str(p + 1), 'name': f'Product {p + 1}', 'category': 'Bench', 'quantity': 2,
+             'unit': 'кг', 'price': random.randint(1000, 90000)}
+            for p in range(20)
+        ],
+    }
+
+
+async def client(base_url: str, client_id: int, requests: int, mix: dict, timings: dict) -> None:
+    endpoints = list(mix)
+    weights = [mix[e] for e in endpoints]
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as http:
+        for n in range(requests):
+            endpoint = random.choices(endpoints, weights)[0]
+            started = time.perf_counter()
+            try:
+                if endpoint == '/orders/upsert':
+                    response = await http.post(endpoint, json=upsert_payload(client_id, n))
+                else:
+                    response = await http.get(endpoint)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            elapsed = time.perf_counter() - started
+            timings.setdefault(endpoint, []).append(elapsed)
+            if failed:
+                timings.setdefault('errors', []).append(elapsed)
+
+
+def percentile(values: list, pct: float) -> float:
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, int(round(pct / 100 * len(values))) - 1))
+    return values[index]
+
+
+async def run(base_url: str, clients: int, requests: int, mix: dict) -> dict:
+    timings = {}
+    started = time.perf_counter()
+    await asyncio.gather(*(client(base_url, i, requests, mix, timings) for i in range(clients)))
+    wall = time.perf_counter() - started
+
+    report = {'clients': clients, 'wall_seconds': round(wall, 3), 'endpoints': {}}
+    total = 0
+    for endpoint, values in sorted(timings.items()):
+        total += len(values) if endpoint != 'errors' else 0
+        report['endpoints'][endpoint] = {
+            'count': len(values),
+            'p50_ms': round(percentile(values, 50) * 1000, 1),
+            'p99_ms': round(percentile(values, 99) * 1000, 1),
+        }
+    report['requests_per_second'] = round(total / wall, 1)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Concurrency benchmark for api.py')
+    parser.add_argument('--repo', default=REPO_ROOT, help='tree containing api.py to benchmark')
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=20, help='requests per client')
+    parser.add_argument('--orders', type=int, default=500, help='synthetic orders to seed')
+    parser.add_argument('--products-per-order', type=int, default=60)
+    parser.add_argument('--mix', default='/products=4,/orders=1,/orders/upsert=1',
+                        help='endpoint weights, e.g. "/products=4,/orders=1"')
+    parser.add_argument('--workers', type=int, default=1, help='uvicorn worker processes')
+    parser.add_argument('--json', help='write the report to this file')
+    args = parser.parse_args()
+
+    mix = {}
+    for item in args.mix.split(','):
+        endpoint, weight = item.split('=')
+        mix[endpoint] = float(weight)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        seed_orders(os.path.join(workdir, 'database.db'), args.orders, args.products_per_order)
+        port = free_port()
+        server = start_server(os.path.abspath(args.repo), workdir, port, args.workers)
+        try:
+            report = asyncio.run(run(f'http://127.0.0.1:{port}', args.clients, args.requests, mix))
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+# Synthetic database.db for benchmarks
+#
+# Builds a database at a chosen scale through the real write path:
+# prepare_db() creates the schema and the master_products catalogue, users
+# are registered per branch and role, and months of orders (built from the
+# seeded catalogue) go through api.save_orders, so order_items, change
+# counters, spend_daily and price_history look as they would in production.
+# Older orders are completed; the last few days are spread over the workflow.
+#
+#   python -m bench.generate --out /tmp/bench.db --months 6 --orders-per-day 3
+#   python -m bench.generate --out /tmp/big.db --branches 8 --months 24 --products-per-order 60
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from bench.concurrency import REPO_ROOT
+
+BRANCHES = ['chilanzar', 'uchtepa', 'shayzantaur', 'olmazar']
+# Statuses of orders still in flight, in workflow order
+OPEN_STATUSES = ['sent_to_financier', 'sent_to_supplier', 'supplier_collecting', 'supplier_delivering',
+                 'chef_checking', 'financier_checking']
+# Orders newer than this are still moving through the workflow
+OPEN_DAYS = 3
+BATCH = 200
+
+
+def poisson(mean: float) -> int:
+    count, total = 0, random.expovariate(1)
+    while total < mean:
+        count += 1
+        total += random.expovariate(1)
+    return count
+
+
+def branch_names(count: int) -> list:
+    """The real branches first, then made-up ones for larger scales"""
+    return BRANCHES[:count] + [f'branch-{n}' for n in range(len(BRANCHES) + 1, count + 1)]
+
+
+def make_order(order_id: str, branch: str, created: datetime, status: str, catalogue: list,
+               products_per_order: int) -> dict:
+    priced = status not in ('sent_to_chef', 'sent_to_financier')
+    products = []
+    for product_id, name, category, unit in random.sample(catalogue, min(products_per_order, len(catalogue))):
+        base = 5_000 + int(product_id) * 1_000 if product_id.isdigit() else 20_000
+        products.append({
+            'id': product_id, 'name': name, 'category': category, 'unit': unit,
+            'quantity': float(random.randint(1, 30)),
+            'price': float(round(base * random.uniform(0.8, 1.3), -2)) if priced else None,
+            'checked': True if status == 'completed' else None,
+        })
+    delivered = created + timedelta(days=1)
+    return {
+        'id': order_id,
+        'status': status,
+        'products': products,
+        'createdAt': created.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+        'deliveredAt': delivered.strftime('%Y-%m-%dT%H:%M:%S.000Z') if status == 'completed' else None,
+        'estimatedDeliveryDate': delivered.strftime('%Y-%m-%d'),
+        'branch': branch,
+    }
+
+
+def generate(path: str, users: int = 40, branches: int = 4, months: int = 6, orders_per_day: float = 2,
+             products_per_order: int = 40, seed: int = 1) -> dict:
+    """Create `path` (which must not exist yet) and return what was generated"""
+    if os.path.exists(path):
+        raise SystemExit(f'{path} already exists')
+    random.seed(seed)
+    os.environ['DB_PATH'] = os.path.abspath(path)
+    sys.path.insert(0, REPO_ROOT)
+    # db reads DB_PATH on import
+    import api
+    from db import SEED_PRODUCTS, connection, prepare_db, transaction
+
+    prepare_db()
+
+    started = time.perf_counter()
+    names = branch_names(branches)
+    roles = ['chef'] * 2 + ['financier', 'supplier']
+    with connection() as conn, transaction(conn):
+        conn.executemany(
+            "INSERT INTO users (id, telegram_id, full_name, role, branch, language) VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (str(uuid.uuid4()), 100_000 + n, f'Bench User {n}', roles[n % len(roles)],
+                 names[n % len(names)] if roles[n % len(roles)] == 'chef' else 'all', random.choice(['ru', 'uz']))
+                for n in range(users)
+            ],
+        )
+
+    now = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    first_day = now - timedelta(days=30 * months)
+    orders, batch = 0, []
+    day = first_day
+    while day <= now:
+        for branch in names:
+            for _ in range(poisson(orders_per_day)):
+                created = day + timedelta(hours=random.randint(7, 15), minutes=random.randint(0, 59))
+                open_order = (now - day).days < OPEN_DAYS
+                status = random.choice(OPEN_STATUSES) if open_order else 'completed'
+                batch.append(api.Order(**make_order(f'gen-{orders}', branch, created, status, SEED_PRODUCTS,
+                                                    products_per_order)))
+                orders += 1
+                if len(batch) >= BATCH:
+                    api.save_orders(batch)
+                    batch = []
+        day += timedelta(days=1)
+    if batch:
+        api.save_orders(batch)
+
+    with connection() as conn, transaction(conn):
+        # History is generated "now"; date it by its orders instead
+        conn.execute(
+            "UPDATE price_history SET recorded_at = (SELECT createdAt FROM orders WHERE orders.id = price_history.order_id)"
+        )
+        # Nobody is waiting for notifications or stream events about generated orders
+        conn.execute("DELETE FROM order_notifications")
+        conn.execute("DELETE FROM order_events")
+        lines = conn.execute("SELECT COUNT(*) FROM order_items").fetchone()[0]
+    with connection() as conn:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    return {
+        'path': os.path.abspath(path),
+        'users': users,
+        'branches': names,
+        'months': months,
+        'orders': orders,
+        'order_lines': lines,
+        'products': len(SEED_PRODUCTS),
+        'seconds': round(time.perf_counter() - started, 1),
+    }
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('--users', type=int, default=40)
+    parser.add_argument('--branches', type=int, default=4)
+    parser.add_argument('--months', type=int, default=6)
+    parser.add_argument('--orders-per-day', type=float, default=2, help='per branch, on average')
+    parser.add_argument('--products-per-order', type=int, default=40)
+    parser.add_argument('--seed', type=int, default=1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Generate a synthetic database.db')
+    parser.add_argument('--out', required=True, help='database file to create')
+    add_arguments(parser)
+    args = parser.parse_args()
+    print(json.dumps(generate(args.out, args.users, args.branches, args.months, args.orders_per_day,
+                              args.products_per_order, args.seed), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+# Order lifecycle load test for api.py
+#
+# Starts uvicorn on a copy of a synthetic database (bench/generate.py) and
+# lets many simulated clients walk orders through the real workflow:
+#
+#   chef       GET /products, POST /orders/upsert            -> sent_to_financier
+#   financier  GET /orders?status=..., PATCH /orders/{id}     -> sent_to_supplier
+#   supplier   GET /orders?status=..., PATCH prices           -> chef_checking
+#   chef       GET /orders?status=..., PATCH checked lines    -> completed
+#
+# with GET /orders/changes polls in between, as the mini app does. Reports
+# throughput and p50/p95/p99 per endpoint; --json saves the report and
+# --compare prints the difference to an earlier one. Everything runs
+# locally, no network access needed.
+#
+#   python -m bench.lifecycle --clients 50 --lifecycles 10 --json after.json --compare before.json
+#   python -m bench.lifecycle --db /tmp/big.db --clients 200
+#   python -m bench.lifecycle --db /tmp/big.db --clients 200 --workers 4
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import tempfile
+import time
+import uuid
+
+import httpx
+
+from bench.concurrency import REPO_ROOT, free_port, percentile, start_server
+from bench.generate import add_arguments, branch_names, generate
+
+
+class Recorder:
+    def __init__(self):
+        self.timings = {}
+        self.errors = {}
+
+    async def call(self, http: httpx.AsyncClient, label: str, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await http.request(method, url, **kwargs)
+            failed = response.status_code >= 400
+        except httpx.HTTPError:
+            response, failed = None, True
+        self.timings.setdefault(label, []).append(time.perf_counter() - started)
+        if failed:
+            self.errors[label] = self.errors.get(label, 0) + 1
+            return None
+        return response
+
+
+async def lifecycle(http: httpx.AsyncClient, rec: Recorder, branch: str, products_per_order: int,
+                    think: float) -> bool:
+    """One order from the chef's request to completion; False if a step failed"""
+
+    async def step(label, method, url, **kwargs):
+        if think:
+            await asyncio.sleep(random.uniform(0, 2 * think))
+        return await rec.call(http, label, method, url, **kwargs)
+
+    async def advance(order_id, version, operations):
+        response = await step('PATCH /orders/{id}', 'PATCH', f'/orders/{order_id}',
+                              json={'operations': operations}, headers={'If-Match': f'"{version}"'})
+        return response and response.json()['version']
+
+    # Chef picks products and sends the order
+    response = await step('GET /products', 'GET', '/products')
+    if not response:
+        return False
+    catalogue = response.json()
+    lines = random.sample(catalogue, min(products_per_order, len(catalogue)))
+    order_id = f'bench-{uuid.uuid4().hex[:12]}'
+    order = {
+        'id': order_id, 'status': 'sent_to_financier', 'branch': branch,
+        'createdAt': time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime()),
+        'products': [{**p, 'quantity': float(random.randint(1, 20))} for p in lines],
+    }
+    response = await step('POST /orders/upsert', 'POST', '/orders/upsert', json=order)
+    if not response:
+        return False
+    version = response.json()['version']
+
+    # Financier approves
+    if not await step('GET /orders', 'GET', '/orders', params={'status': 'sent_to_financier', 'branch': branch}):
+        return False
+    version = await advance(order_id, version, [{'op': 'set_status', 'status': 'sent_to_supplier'}])
+    if not version:
+        return False
+
+    # Supplier prices the lines and delivers
+    if not await step('GET /orders', 'GET', '/orders', params={'status': 'sent_to_supplier'}):
+        return False
+    operations = [
+        {'op': 'set_item', 'productId': p['id'], 'changes': {'price': float(random.randint(50, 900) * 100)}}
+        for p in lines
+    ]
+    version = await advance(order_id, version, operations + [{'op': 'set_status', 'status': 'chef_checking'}])
+    if not version:
+        return False
+
+    # Chef checks the delivery
+    await step('GET /orders/changes', 'GET', '/orders/changes', params={'since': max(version - 50, 0)})
+    if not await step('GET /orders', 'GET', '/orders', params={'status': 'chef_checking', 'branch': branch}):
+        return False
+    operations = [{'op': 'set_item', 'productId': p['id'], 'changes': {'checked': True}} for p in lines]
+    version = await advance(order_id, version, operations + [{'op': 'set_status', 'status': 'completed'}])
+    return bool(version)
+
+
+async def client(base_url: str, rec: Recorder, branches: list, lifecycles: int, products_per_order: int,
+                 think: float, done: list) -> None:
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as http:
+        for _ in range(lifecycles):
+            if await lifecycle(http, rec, random.choice(branches), products_per_order, think):
+                done[0] += 1
+
+
+async def run(base_url: str, args, branches: list) -> dict:
+    rec = Recorder()
+    done = [0]
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        client(base_url, rec, branches, args.lifecycles, args.order_size, args.think_ms / 1000, done)
+        for _ in range(args.clients)
+    ))
+    wall = time.perf_counter() - started
+
+    endpoints = {}
+    for label, values in sorted(rec.timings.items()):
+        endpoints[label] = {
+            'count': len(values),
+            'errors': rec.errors.get(label, 0),
+            'p50_ms': round(percentile(values, 50) * 1000, 1),
+            'p95_ms': round(percentile(values, 95) * 1000, 1),
+            'p99_ms': round(percentile(values, 99) * 1000, 1),
+            'max_ms': round(max(values) * 1000, 1),
+        }
+    requests = sum(len(values) for values in rec.timings.values())
+    return {
+        'wall_seconds': round(wall, 2),
+        'requests': requests,
+        'errors': sum(rec.errors.values()),
+        'requests_per_second': round(requests / wall, 1),
+        'lifecycles_completed': done[0],
+        'lifecycles_per_second': round(done[0] / wall, 2),
+        'endpoints': endpoints,
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(report: dict, baseline: dict) -> None:
+    """Print the change of each latency percentile and of throughput against `baseline`"""
+    def change(new, old):
+        return f'{(new - old) / old * 100:+.0f}%' if old else 'n/a'
+
+    print(f"\nvs {baseline.get('revision', '?')}: requests/s {baseline['requests_per_second']} -> "
+          f"{report['requests_per_second']} ({change(report['requests_per_second'], baseline['requests_per_second'])})")
+    print(f"{'endpoint':<24}{'p50 ms':>18}{'p95 ms':>18}{'p99 ms':>18}")
+    for label, now in report['endpoints'].items():
+        then = baseline['endpoints'].get(label)
+        if not then:
+            continue
+        cells = [f"{then[k]}->{now[k]} {change(now[k], then[k])}" for k in ('p50_ms', 'p95_ms', 'p99_ms')]
+        print(f"{label:<24}" + ''.join(f'{cell:>18}' for cell in cells))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Order lifecycle load test for api.py')
+    parser.add_argument('--repo', default=REPO_ROOT, help='tree containing api.py to benchmark')
+    parser.add_argument('--db', help='database from bench.generate (copied; generated when omitted)')
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--lifecycles', type=int, default=10, help='orders each client walks through')
+    parser.add_argument('--order-size', type=int, default=30, help='products per benchmarked order')
+    parser.add_argument('--think-ms', type=float, default=0, help='mean pause before each request')
+    parser.add_argument('--workers', type=int, default=1, help='uvicorn worker processes')
+    parser.add_argument('--json', help='write the report to this file')
+    parser.add_argument('--compare', help='earlier --json report to compare with')
+    add_arguments(parser)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'database.db')
+        if args.db:
+            with sqlite3.connect(args.db) as source, sqlite3.connect(path) as target:
+                source.backup(target)
+            dataset = {'path': os.path.abspath(args.db)}
+        else:
+            dataset = generate(path, args.users, args.branches, args.months, args.orders_per_day,
+                               args.products_per_order, args.seed)
+        with sqlite3.connect(path) as conn:
+            dataset['orders'] = conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+            branches = [row[0] for row in conn.execute("SELECT DISTINCT branch FROM orders")] or branch_names(4)
+
+        port = free_port()
+        server = start_server(os.path.abspath(args.repo), workdir, port, args.workers)
+        try:
+            report = asyncio.run(run(f'http://127.0.0.1:{port}', args, branches))
+        finally:
+            server.terminate()
+            server.wait()
+
+    report = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'config': {k: getattr(args, k) for k in ('clients', 'lifecycles', 'order_size', 'think_ms', 'workers')},
+        'dataset': dataset,
+        **report,
+    }
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+# Order notification harness for notifier.py
+#
+# Registers users in a scratch database, pushes orders through status
+# changes via api.save_order, and lets the Notifier deliver them to the fake
+# Bot API from bench/bot_updates.py (optionally answering some sends with
+# 429). Reports what was sent, how much was coalesced, and the send rates
+# actually observed per chat and overall.
+#
+#   python -m bench.notifications --orders 40 --flood-every 25
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from bench.bot_updates import REPO_ROOT, TOKEN, FakeBotApi, serve
+
+LIFECYCLE = ['sent_to_financier', 'sent_to_supplier', 'supplier_collecting', 'supplier_delivering', 'chef_checking']
+
+
+def setup(orders: int, users_per_role: int) -> None:
+    import api
+    import main
+
+    branches = ['chilanzar', 'uchtepa', 'shayzantaur', 'olmazar']
+    uid = 20_000
+    for branch in branches:
+        for _ in range(users_per_role):
+            uid += 1
+            main.save_user(uid, f'Chef {uid}', 'chef', branch, 'ru')
+    for role in ('financier', 'supplier'):
+        for _ in range(users_per_role):
+            uid += 1
+            main.save_user(uid, f'{role} {uid}', role, 'all', 'uz')
+
+    products = [{'id': '1', 'name': 'Bench', 'category': 'Bench', 'quantity': 1, 'unit': 'кг', 'price': 1000}]
+    for n in range(orders):
+        # Several quick changes per order; the notifier should merge them
+        for status in LIFECYCLE[:2 + n % 4]:
+            api.save_order(api.Order(id=f'notify-{n}', status=status, products=products,
+                                     createdAt='2026-06-01T10:00:00', branch=branches[n % 4]))
+
+
+async def run(args) -> dict:
+    from telegram import Bot
+    from bench.concurrency import free_port
+    from db import connection
+    from main import render_order_notification
+    from notifier import Notifier, RateLimiter
+
+    fake = FakeBotApi([], args.latency_ms / 1000, flood_every=args.flood_every)
+    port = free_port()
+    server, task = await serve(fake.build(), port)
+
+    bot = Bot(TOKEN, base_url=f'http://127.0.0.1:{port}/bot')
+    await bot.initialize()
+    notifier = Notifier(bot, render_order_notification, poll_interval=0.2, coalesce=args.coalesce,
+                        limiter=RateLimiter(args.rate, args.chat_interval))
+    started = time.perf_counter()
+    await notifier.start()
+    while True:
+        await asyncio.sleep(0.2)
+        with connection() as conn:
+            left = conn.execute("SELECT COUNT(*) FROM order_notifications").fetchone()[0]
+        if not left or time.perf_counter() - started > args.timeout:
+            break
+    elapsed = time.perf_counter() - started
+    await notifier.stop()
+    await bot.shutdown()
+    server.should_exit = True
+    await task
+
+    sends = sorted(t for times in fake.sent_at.values() for t in times)
+    busiest_second = max((sum(1 for t in sends[i:] if t - start < 1) for i, start in enumerate(sends)), default=0)
+    chat_gaps = [b - a for times in fake.sent_at.values() for a, b in zip(times, times[1:])]
+    return {
+        'seconds': round(elapsed, 2),
+        'outbox_left': left,
+        **notifier.stats,
+        'rate_limited_429': fake.calls.get('sendMessage', 0) - len(sends),
+        'max_sends_in_one_second': busiest_second,
+        'min_gap_per_chat_ms': round(min(chat_gaps) * 1000, 1) if chat_gaps else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Notification dispatcher harness')
+    parser.add_argument('--orders', type=int, default=40)
+    parser.add_argument('--users-per-role', type=int, default=3)
+    parser.add_argument('--coalesce', type=float, default=1, help='seconds to merge changes to one order')
+    parser.add_argument('--rate', type=float, default=25, help='messages per second overall')
+    parser.add_argument('--chat-interval', type=float, default=1, help='seconds between messages to one chat')
+    parser.add_argument('--flood-every', type=int, default=0, help='answer every n-th send with 429')
+    parser.add_argument('--latency-ms', type=float, default=30)
+    parser.add_argument('--timeout', type=float, default=300)
+    parser.add_argument('--json', help='write the report to this file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ['DB_PATH'] = os.path.join(workdir, 'database.db')
+        sys.path.insert(0, REPO_ROOT)
+        logging.getLogger('httpx').setLevel(logging.WARNING)
+        setup(args.orders, args.users_per_role)
+        report = asyncio.run(run(args))
+
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
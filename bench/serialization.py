@@ -0,0 +1,105 @@
+# Serialization benchmark for GET /orders payloads
+#
+# Builds a synthetic /orders payload from the seed catalogue and compares
+# the current encoder (FastAPI's JSONResponse) with the encodings
+# serialization.py offers: orjson, MessagePack and the columnar layout.
+# Reports body size (raw and gzipped, as nginx would send it) and the
+# median encode time.
+#
+#   python -m bench.serialization --orders 500 --products-per-order 60
+
+import argparse
+import gzip
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+BRANCHES = ['chilanzar', 'uchtepa', 'shayzantaur', 'olmazar']
+STATUSES = ['sent_to_financier', 'sent_to_supplier', 'supplier_delivering', 'chef_checking', 'completed']
+
+
+def synthetic_orders(orders: int, products_per_order: int) -> list:
+    """Orders shaped like load_orders() output, with real catalogue names"""
+    from db import SEED_PRODUCTS
+
+    payload = []
+    for n in range(orders):
+        lines = []
+        for product_id, name, category, unit in random.sample(SEED_PRODUCTS, min(products_per_order, len(SEED_PRODUCTS))):
+            lines.append({
+                'id': product_id, 'name': name, 'category': category, 'quantity': float(random.randint(1, 20)),
+                'unit': unit, 'price': float(random.randint(1000, 90000)), 'comment': None,
+                'checked': random.random() < 0.5, 'chefComment': None, 'deliveryDate': None,
+                'lastPrice': float(random.randint(1000, 90000)),
+            })
+        payload.append({
+            'id': f'order-{n}', 'status': random.choice(STATUSES), 'products': lines,
+            'createdAt': f'2026-{1 + n % 12:02d}-{1 + n % 28:02d}T10:00:00.000Z', 'deliveredAt': None,
+            'estimatedDeliveryDate': None, 'branch': random.choice(BRANCHES), 'version': n + 1,
+        })
+    return payload
+
+
+def measure(encode, payload, repeat: int) -> tuple:
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = encode(payload)
+        times.append(time.perf_counter() - started)
+    return body, statistics.median(times)
+
+
+def main() -> None:
+    from fastapi.responses import JSONResponse
+    import serialization
+    from serialization import columnar_orders, dumps_json, msgpack, orjson
+
+    parser = argparse.ArgumentParser(description='Serialization benchmark for /orders payloads')
+    parser.add_argument('--orders', type=int, default=500)
+    parser.add_argument('--products-per-order', type=int, default=60)
+    parser.add_argument('--repeat', type=int, default=15)
+    parser.add_argument('--json', help='write the report to this file')
+    args = parser.parse_args()
+
+    random.seed(1)
+    payload = synthetic_orders(args.orders, args.products_per_order)
+    candidates = {'json (current)': lambda p: JSONResponse(p).body}
+    if orjson:
+        candidates['orjson'] = dumps_json
+        candidates['orjson + columnar'] = lambda p: dumps_json(columnar_orders(p))
+    else:
+        candidates['json + columnar'] = lambda p: dumps_json(columnar_orders(p))
+    if msgpack:
+        candidates['msgpack'] = lambda p: serialization.encode(p, serialization.MSGPACK)
+        candidates['msgpack + columnar'] = lambda p: serialization.encode(columnar_orders(p), serialization.MSGPACK)
+
+    report = {'orders': args.orders, 'products_per_order': args.products_per_order, 'encodings': {}}
+    baseline = None
+    for name, encode in candidates.items():
+        body, seconds = measure(encode, payload, args.repeat)
+        baseline = baseline or (len(body), seconds)
+        report['encodings'][name] = {
+            'bytes': len(body),
+            'gzip_bytes': len(gzip.compress(body, 6)),
+            'encode_ms': round(seconds * 1000, 2),
+            'size_vs_current': round(len(body) / baseline[0], 3),
+            'speedup_vs_current': round(baseline[1] / seconds, 1),
+        }
+
+    print(f"{'encoding':<22}{'bytes':>12}{'gzip':>10}{'encode ms':>12}{'size':>8}{'speed':>8}")
+    for name, row in report['encodings'].items():
+        print(f"{name:<22}{row['bytes']:>12}{row['gzip_bytes']:>10}{row['encode_ms']:>12}"
+              f"{row['size_vs_current']:>8}{row['speedup_vs_current']:>7}x")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+# SQLite persistence for the Telegram bot
+# Stores ConversationHandler states and context.user_data in the shared
+# database so a restart doesn't drop users mid-registration. Updates are
+# buffered in memory and written in one transaction per flush, off the event
+# loop; the application hands changes over every update_interval seconds.
+
+import asyncio
+import json
+import logging
+import os
+from typing import Dict, Optional
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from db import connection, transaction, run_db
+
+# Seconds between persistence rounds (python-telegram-bot's default is 60)
+PERSISTENCE_INTERVAL = float(os.getenv('BOT_PERSISTENCE_INTERVAL', '5'))
+
+logger = logging.getLogger(__name__)
+
+_UPSERT_CONVERSATION = '''
+INSERT INTO bot_conversations (name, key, state) VALUES (?, ?, ?)
+ON CONFLICT(name, key) DO UPDATE SET state = excluded.state
+'''
+_UPSERT_USER_DATA = '''
+INSERT INTO bot_user_data (user_id, data) VALUES (?, ?)
+ON CONFLICT(user_id) DO UPDATE SET data = excluded.data
+'''
+
+
+class SQLitePersistence(BasePersistence):
+    """Persists conversations and user_data; chat_data, bot_data and callback_data are not used"""
+
+    def __init__(self, update_interval: float = PERSISTENCE_INTERVAL):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        # Pending writes; a value of None deletes the row
+        self._user_data: Dict[int, Optional[str]] = {}
+        self._conversations: Dict[tuple, Optional[str]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._write_lock = asyncio.Lock()
+
+    # Loading (once, on Application.initialize)
+
+    async def get_user_data(self) -> Dict[int, dict]:
+        def load():
+            with connection() as conn:
+                return {row['user_id']: json.loads(row['data'])
+                        for row in conn.execute("SELECT user_id, data FROM bot_user_data")}
+        return await run_db(load)
+
+    async def get_conversations(self, name: str) -> dict:
+        def load():
+            with connection() as conn:
+                rows = conn.execute("SELECT key, state FROM bot_conversations WHERE name = ?", (name,)).fetchall()
+            return {tuple(json.loads(row['key'])): json.loads(row['state']) for row in rows}
+        return await run_db(load)
+
+    async def get_chat_data(self) -> dict:
+        return {}
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    # Buffered updates
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        # Serialize now so later in-memory changes don't leak into this write
+        self._user_data[user_id] = json.dumps(data, ensure_ascii=False)
+        self._schedule_flush()
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._user_data[user_id] = None
+        self._schedule_flush()
+
+    async def update_conversation(self, name: str, key: tuple, new_state: Optional[object]) -> None:
+        state = None if new_state is None else json.dumps(new_state)
+        self._conversations[(name, json.dumps(list(key)))] = state
+        self._schedule_flush()
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def update_bot_data(self, data: dict) -> None:
+        pass
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
+
+    # Writing
+
+    def _schedule_flush(self) -> None:
+        # The application calls update_* for every changed user and
+        # conversation in one go without yielding, so a single task started
+        # here picks up the whole round
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self.flush())
+
+    async def flush(self) -> None:
+        async with self._write_lock:
+            user_data, self._user_data = self._user_data, {}
+            conversations, self._conversations = self._conversations, {}
+            if not (user_data or conversations):
+                return
+            try:
+                await run_db(self._write, user_data, conversations)
+            except Exception as e:
+                # Retry with the next round, unless newer values arrived meanwhile
+                for key, value in user_data.items():
+                    self._user_data.setdefault(key, value)
+                for key, value in conversations.items():
+                    self._conversations.setdefault(key, value)
+                logger.error(f"Error saving bot state: {e}")
+
+    @staticmethod
+    def _write(user_data: dict, conversations: dict) -> None:
+        with connection() as conn, transaction(conn):
+            conn.executemany(_UPSERT_USER_DATA, [(k, v) for k, v in user_data.items() if v is not None])
+            conn.executemany("DELETE FROM bot_user_data WHERE user_id = ?",
+                             [(k,) for k, v in user_data.items() if v is None])
+            conn.executemany(_UPSERT_CONVERSATION, [(*k, v) for k, v in conversations.items() if v is not None])
+            conn.executemany("DELETE FROM bot_conversations WHERE name = ? AND key = ?",
+                             [k for k, v in conversations.items() if v is None])
@@ -0,0 +1,78 @@
+# Webhook entry point for the Telegram bot
+# Telegram POSTs updates to WEBHOOK_PATH; they are queued into the same
+# Application main.py uses for polling and processed concurrently (one at a
+# time per chat, see main.PerChatUpdateProcessor).
+#
+#   BOT_MODE=webhook WEBHOOK_URL=https://example.com/telegram/webhook python main.py
+#   uvicorn bot_webhook:create_app --factory --port 8081
+
+import os
+import secrets
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Request, Response
+from telegram import Update
+from telegram.ext import Application
+
+import metrics
+from main import build_application, ALLOWED_UPDATES, BOT_CONCURRENCY, logger
+
+# Public URL registered with setWebhook; left unset when a proxy or a test
+# harness delivers the updates itself
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram/webhook')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8081'))
+# Checked against the X-Telegram-Bot-Api-Secret-Token header when set
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+
+
+def create_app(application: Application = None) -> FastAPI:
+    application = application or build_application()
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        await application.initialize()
+        if WEBHOOK_URL:
+            await application.bot.set_webhook(
+                WEBHOOK_URL,
+                allowed_updates=ALLOWED_UPDATES,
+                secret_token=WEBHOOK_SECRET or None,
+                max_connections=min(max(BOT_CONCURRENCY, 1), 100),
+            )
+            logger.info(f"Webhook registered at {WEBHOOK_URL}")
+        # Same hook order as Application.run_polling
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+        try:
+            yield
+        finally:
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+            await application.shutdown()
+            if application.post_shutdown:
+                await application.post_shutdown(application)
+
+    app = FastAPI(lifespan=lifespan)
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get('/metrics', include_in_schema=False)
+    async def get_metrics():
+        return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+    @app.post(WEBHOOK_PATH)
+    async def telegram_webhook(request: Request):
+        token = request.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+        if WEBHOOK_SECRET and not secrets.compare_digest(token, WEBHOOK_SECRET):
+            raise HTTPException(status_code=403, detail="Invalid secret token")
+        try:
+            update = Update.de_json(await request.json(), application.bot)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid update")
+        # Acknowledge right away; the application's update processor does the work
+        await application.update_queue.put(update)
+        return Response(status_code=200)
+
+    app.state.application = application
+    return app
@@ -0,0 +1,707 @@
+# Shared SQLite access layer for api.py and main.py
+# Both containers write the same database.db, so every connection runs in WAL
+# mode with a busy timeout and is handed out from a bounded pool.
+
+import asyncio
+import contextvars
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: init_db's own transaction is the only guard
+    fcntl = None
+
+import metrics
+import querylog
+
+DB_PATH = os.getenv('DB_PATH', 'database.db')
+# Optional separate file for orders_archive (see archive.py); attached to
+# every connection as schema "archive"
+ARCHIVE_DB_PATH = os.getenv('ARCHIVE_DB_PATH', '')
+ARCHIVE_SCHEMA = 'archive' if ARCHIVE_DB_PATH else 'main'
+
+# Pool / pragma tuning (override via environment)
+POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '8'))
+POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+BUSY_TIMEOUT_MS = int(os.getenv('DB_BUSY_TIMEOUT_MS', '5000'))
+MMAP_SIZE = int(os.getenv('DB_MMAP_SIZE', str(64 * 1024 * 1024)))
+CACHE_SIZE_KB = int(os.getenv('DB_CACHE_SIZE_KB', '8192'))
+STATEMENT_CACHE_SIZE = int(os.getenv('DB_STATEMENT_CACHE_SIZE', '256'))
+# Threads for run_db(); more threads than pooled connections would only queue on the pool
+EXECUTOR_WORKERS = int(os.getenv('DB_EXECUTOR_WORKERS', str(POOL_SIZE)))
+
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}",
+    f"PRAGMA mmap_size = {MMAP_SIZE}",
+    f"PRAGMA cache_size = -{CACHE_SIZE_KB}",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA foreign_keys = ON",
+)
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that times a statement until its rows are read.
+
+    The time is reported to metrics.py (and querylog.py when QUERY_TRACE is
+    on) once the result is used up: after fetchall(), fetchone(), a short
+    fetchmany() or the end of iteration. A SELECT does most of its work while
+    rows are fetched, so timing execute() alone would undercount it.
+    """
+
+    _sql = None
+
+    def _report(self) -> None:
+        if self._sql is not None:
+            sql, self._sql = self._sql, None
+            metrics.observe_statement(sql, self._elapsed)
+            if querylog.QUERY_TRACE:
+                querylog.record(self.connection, sql, self._parameters, self._elapsed)
+
+    def _run(self, method, sql, parameters, example):
+        self._report()
+        started = time.perf_counter()
+        try:
+            method(sql, parameters)
+        finally:
+            self._sql, self._parameters, self._elapsed = sql, example, time.perf_counter() - started
+            if self.description is None:
+                self._report()
+        return self
+
+    def execute(self, sql, parameters=()):
+        return self._run(super().execute, sql, parameters, parameters)
+
+    def executemany(self, sql, parameters):
+        # Generators are used up afterwards; lists can be explained with their first row
+        first = parameters[0] if isinstance(parameters, (list, tuple)) and parameters else None
+        return self._run(super().executemany, sql, parameters, first)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._elapsed += time.perf_counter() - started
+        self._report()
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        started = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._elapsed += time.perf_counter() - started
+        if len(rows) < size:
+            self._report()
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._elapsed += time.perf_counter() - started
+        self._report()
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._elapsed += time.perf_counter() - started
+            self._report()
+            raise
+        self._elapsed += time.perf_counter() - started
+        return row
+
+    def close(self):
+        self._report()
+        super().close()
+
+
+class TimedConnection(sqlite3.Connection):
+    """Connection whose statements run on TimedCursors"""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, parameters):
+        return self.cursor().executemany(sql, parameters)
+
+
+def inflate(blob):
+    """SQL inflate(blob): zlib-compressed text, e.g. orders_archive.lines"""
+    return None if blob is None else zlib.decompress(blob).decode()
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection became free in time"""
+
+
+def connect(path: str = None) -> sqlite3.Connection:
+    """Open a tuned connection.
+
+    Connections run in autocommit mode (isolation_level=None): writes go
+    through transaction(), which takes the write lock up front with
+    BEGIN IMMEDIATE instead of upgrading a read lock mid-transaction (the
+    upgrade is what fails with "database is locked" regardless of timeout).
+    """
+    conn = sqlite3.connect(
+        path or DB_PATH,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        isolation_level=None,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        factory=TimedConnection if metrics.METRICS_ENABLED or querylog.QUERY_TRACE else sqlite3.Connection,
+    )
+    conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    conn.create_function('inflate', 1, inflate, deterministic=True)
+    if ARCHIVE_DB_PATH:
+        conn.execute("ATTACH DATABASE ? AS archive", (ARCHIVE_DB_PATH,))
+        conn.execute("PRAGMA archive.journal_mode = WAL")
+        conn.execute("PRAGMA archive.synchronous = NORMAL")
+    return conn
+
+
+class ConnectionPool:
+    """Bounded pool of long-lived connections.
+
+    Connections are opened lazily up to `size`; callers beyond that wait up
+    to `timeout` seconds for one to be returned. Keeping connections open
+    also keeps their prepared statement caches warm.
+    """
+
+    def __init__(self, path: str = None, size: int = POOL_SIZE, timeout: float = POOL_TIMEOUT):
+        self.path = path or DB_PATH
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> sqlite3.Connection:
+        started = time.perf_counter()
+        conn = self._checkout()
+        metrics.db_pool_wait_seconds.observe(time.perf_counter() - started)
+        return conn
+
+    def _checkout(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._opened < self.size:
+                self._opened += 1
+                try:
+                    return connect(self.path)
+                except Exception:
+                    self._opened -= 1
+                    raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise PoolTimeout(f"No database connection available after {self.timeout}s")
+
+    def _release(self, conn: sqlite3.Connection) -> None:
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put_nowait(conn)
+
+    def _discard(self, conn: sqlite3.Connection) -> None:
+        with self._lock:
+            self._opened -= 1
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        except (sqlite3.OperationalError, sqlite3.IntegrityError):
+            self._release(conn)
+            raise
+        except sqlite3.DatabaseError:
+            # A broken connection must not go back into the pool
+            self._discard(conn)
+            raise
+        except BaseException:
+            self._release(conn)
+            raise
+        else:
+            self._release(conn)
+
+    def close(self) -> None:
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+
+pool = ConnectionPool()
+
+metrics.Gauge(
+    'db_pool_connections', 'Pooled connections open / idle',
+    lambda: {('open',): pool._opened, ('idle',): pool._idle.qsize()}, ['state'],
+)
+
+
+def connection():
+    """Borrow a connection from the shared pool (use as a context manager)"""
+    return pool.connection()
+
+
+executor = ThreadPoolExecutor(max_workers=EXECUTOR_WORKERS, thread_name_prefix='db')
+
+
+async def run_db(fn, *args, **kwargs):
+    """Run blocking database work on the dedicated executor, off the event loop"""
+    loop = asyncio.get_running_loop()
+    queued = time.perf_counter()
+
+    def call():
+        metrics.db_executor_wait_seconds.observe(time.perf_counter() - queued)
+        return fn(*args, **kwargs)
+    # The caller's context goes along, so per-request counters (see
+    # metrics.instrument_handler) see the statements run on its behalf
+    return await loop.run_in_executor(executor, contextvars.copy_context().run, call)
+
+
+class ChangeWatcher:
+    """Tells whether anything was committed to the database since it last looked.
+
+    PRAGMA data_version on a connection of its own moves whenever another
+    connection (in this process or any other) commits. Reading it only looks
+    at the shared WAL index, so it is cheap enough to check on every request
+    and lets each worker process drop caches filled before someone else's write.
+    Both methods run sqlite; call them through run_db.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self._conn = None
+        self._version = None
+        self._reads = 0
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = connect(self.path)
+        return self._conn
+
+    def changed(self) -> bool:
+        with self._lock:
+            version = self._connection().execute("PRAGMA data_version").fetchone()[0]
+            changed, self._version = version != self._version, version
+            return changed
+
+    def read(self, fn, known: tuple = None) -> tuple:
+        """(sequence, data_version, fn(conn)), or `known` (an earlier result)
+        when nothing was committed since it was read.
+
+        data_version is read before fn's rows, so a result never pairs older
+        rows with a newer data_version. Sequence numbers grow with every
+        read, so callers can tell which of two results is the newer one.
+        """
+        with self._lock:
+            conn = self._connection()
+            version = conn.execute("PRAGMA data_version").fetchone()[0]
+            if known is not None and known[1] == version:
+                return known
+            conn.execute("BEGIN")
+            try:
+                value = fn(conn)
+            finally:
+                conn.commit()
+            self._reads += 1
+            return self._reads, version, value
+
+
+@contextmanager
+def transaction(conn: sqlite3.Connection):
+    """Run a block as one write transaction (BEGIN IMMEDIATE ... COMMIT)"""
+    with metrics.db_lock_wait_seconds.time():
+        conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
+
+
+def init_db():
+    with connection() as conn, transaction(conn):
+        # Users table
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id TEXT PRIMARY KEY,
+            telegram_id INTEGER UNIQUE NOT NULL,
+            full_name TEXT NOT NULL,
+            role TEXT NOT NULL,
+            branch TEXT,
+            language TEXT DEFAULT 'ru',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+
+        # Orders table
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS orders (
+            id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            products TEXT NOT NULL,
+            createdAt TEXT NOT NULL,
+            deliveredAt TEXT,
+            estimatedDeliveryDate TEXT,
+            branch TEXT NOT NULL
+        )
+        ''')
+
+        # Products table
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS master_products (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            category TEXT NOT NULL,
+            unit TEXT NOT NULL,
+            last_price REAL
+        )
+        ''')
+
+        # Order listing filters by branch/status and pages by (createdAt, id)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_branch_status_created ON orders(branch, status, createdAt, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_created ON orders(createdAt, id)")
+
+        # Order lines, one row per product in an order.
+        # Replaces the orders.products JSON blob, which is kept (as '[]') only
+        # so older processes reading the same file keep working.
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS order_items (
+            order_id TEXT NOT NULL REFERENCES orders(id) ON DELETE CASCADE,
+            product_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            category TEXT NOT NULL,
+            quantity REAL NOT NULL,
+            unit TEXT NOT NULL,
+            price REAL,
+            comment TEXT,
+            checked INTEGER,
+            chefComment TEXT,
+            deliveryDate TEXT,
+            PRIMARY KEY (order_id, product_id)
+        ) WITHOUT ROWID
+        ''')
+
+        # Check if last_price column exists (migration)
+        columns = {row['name'] for row in conn.execute("PRAGMA table_info(master_products)")}
+        if 'last_price' not in columns:
+            conn.execute("ALTER TABLE master_products ADD COLUMN last_price REAL")
+
+        # Change tracking: every order write takes the next value of the
+        # 'orders' counter as its version; deletions leave a tombstone
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+        ''')
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS order_tombstones (
+            order_id TEXT PRIMARY KEY,
+            version INTEGER NOT NULL,
+            deleted_at TEXT NOT NULL
+        )
+        ''')
+        columns = {row['name'] for row in conn.execute("PRAGMA table_info(orders)")}
+        if 'version' not in columns:
+            conn.execute("ALTER TABLE orders ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+            conn.execute("ALTER TABLE orders ADD COLUMN updated_at TEXT")
+            # Existing orders get distinct versions in insertion order
+            conn.execute("UPDATE orders SET version = rowid")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_version ON orders(version)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_order_tombstones_version ON order_tombstones(version)")
+        # master_products gets its own counter (bumped when last prices change)
+        conn.execute("INSERT OR IGNORE INTO counters (name, value) VALUES ('products', 0)")
+        conn.execute('''
+        INSERT OR IGNORE INTO counters (name, value)
+        SELECT 'orders', MAX(COALESCE((SELECT MAX(version) FROM orders), 0),
+                             COALESCE((SELECT MAX(version) FROM order_tombstones), 0))
+        ''')
+
+        migrate_order_products(conn)
+
+        # Append-only price history, one row each time an order line gets a new price
+        has_history = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'price_history'"
+        ).fetchone()
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS price_history (
+            id INTEGER PRIMARY KEY,
+            product_id TEXT NOT NULL,
+            branch TEXT NOT NULL,
+            price REAL NOT NULL,
+            order_id TEXT NOT NULL,
+            recorded_at TEXT NOT NULL
+        )
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_price_history_product ON price_history(product_id, recorded_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_price_history_order ON price_history(order_id, product_id)")
+        conn.execute("INSERT OR IGNORE INTO counters (name, value) VALUES ('prices', 0)")
+        if not has_history:
+            # Backfill from prices already stored on order lines
+            conn.execute('''
+            INSERT INTO price_history (product_id, branch, price, order_id, recorded_at)
+            SELECT i.product_id, o.branch, i.price, o.id, COALESCE(o.updated_at, o.createdAt)
+            FROM order_items i JOIN orders o ON o.id = i.order_id
+            WHERE i.price > 0
+            ''')
+
+        # Completed orders moved out of orders/order_items by archive.py; lines
+        # are zlib-compressed JSON rows in ORDER_ITEM_COLUMNS order
+        conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {ARCHIVE_SCHEMA}.orders_archive (
+            id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            createdAt TEXT NOT NULL,
+            deliveredAt TEXT,
+            estimatedDeliveryDate TEXT,
+            branch TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            archived_at TEXT NOT NULL,
+            lines BLOB NOT NULL
+        )
+        ''')
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}.idx_orders_archive_created ON orders_archive(createdAt, id)")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}.idx_orders_archive_branch ON orders_archive(branch, createdAt, id)")
+
+        # Pre-aggregated spend per branch/category/day, see reports.py
+        has_spend = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'spend_daily'"
+        ).fetchone()
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS spend_daily (
+            branch TEXT NOT NULL,
+            category TEXT NOT NULL,
+            day TEXT NOT NULL,
+            total REAL NOT NULL,
+            items INTEGER NOT NULL,
+            PRIMARY KEY (branch, category, day)
+        ) WITHOUT ROWID
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_spend_daily_day ON spend_daily(day)")
+        if not has_spend:
+            from reports import rebuild_spend_daily
+            rebuild_spend_daily(conn)
+
+        # Bot conversation state and context.user_data, see bot_persistence.py
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS bot_conversations (
+            name TEXT NOT NULL,
+            key TEXT NOT NULL,
+            state TEXT NOT NULL,
+            PRIMARY KEY (name, key)
+        ) WITHOUT ROWID
+        ''')
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS bot_user_data (
+            user_id INTEGER PRIMARY KEY,
+            data TEXT NOT NULL
+        )
+        ''')
+
+        # Outbox of order status changes for the bot's notifier (notifier.py);
+        # rows are deleted once their messages are sent
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS order_notifications (
+            id INTEGER PRIMARY KEY,
+            order_id TEXT NOT NULL,
+            branch TEXT NOT NULL,
+            status TEXT NOT NULL,
+            previous_status TEXT,
+            created_at REAL NOT NULL
+        )
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_order_notifications_created ON order_notifications(created_at)")
+
+        # Recent order change events, read by every API worker to feed its
+        # own GET /orders/stream subscribers (see events.py)
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS order_events (
+            version INTEGER PRIMARY KEY,
+            event TEXT NOT NULL
+        )
+        ''')
+
+
+def next_version(conn: sqlite3.Connection, name: str = 'orders') -> int:
+    """Bump and return a change counter (call inside a write transaction)"""
+    conn.execute("UPDATE counters SET value = value + 1 WHERE name = ?", (name,))
+    return conn.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()[0]
+
+
+def current_version(conn: sqlite3.Connection, name: str = 'orders') -> int:
+    row = conn.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else 0
+
+
+ORDER_ITEM_COLUMNS = (
+    'product_id', 'position', 'name', 'category', 'quantity', 'unit',
+    'price', 'comment', 'checked', 'chefComment', 'deliveryDate',
+)
+
+
+def order_item_row(order_id: str, position: int, product: dict) -> tuple:
+    """Map a product dict (API shape) to an order_items row"""
+    checked = product.get('checked')
+    return (
+        order_id, str(product['id']), position, product.get('name') or '', product.get('category') or '',
+        product.get('quantity') or 0, product.get('unit') or '', product.get('price'), product.get('comment'),
+        None if checked is None else int(bool(checked)), product.get('chefComment'), product.get('deliveryDate'),
+    )
+
+
+def migrate_order_products(conn: sqlite3.Connection) -> None:
+    """Move products out of the legacy orders.products JSON blob into order_items"""
+    rows = conn.execute("SELECT id, products FROM orders WHERE products NOT IN ('', '[]')").fetchall()
+    for row in rows:
+        items = [order_item_row(row['id'], position, product)
+                 for position, product in enumerate(json.loads(row['products'])) if 'id' in product]
+        conn.executemany(
+            f"INSERT OR REPLACE INTO order_items (order_id, {', '.join(ORDER_ITEM_COLUMNS)}) "
+            f"VALUES ({', '.join('?' * (len(ORDER_ITEM_COLUMNS) + 1))})",
+            items,
+        )
+        conn.execute("UPDATE orders SET products = '[]' WHERE id = ?", (row['id'],))
+
+
+def seed_db():
+    # Only seed if products table is empty
+    with connection() as conn, transaction(conn):
+        if conn.execute("SELECT COUNT(*) FROM master_products").fetchone()[0] == 0:
+            conn.executemany(
+                "INSERT INTO master_products (id, name, category, unit) VALUES (?, ?, ?, ?)",
+                SEED_PRODUCTS,
+            )
+
+
+def prepare_db() -> None:
+    """init_db() and seed_db(), one process at a time.
+
+    Every API worker and the bot run this on startup; an exclusive lock on
+    DB_PATH + '.lock' makes the first one create, migrate and seed the
+    database while the others wait, then find nothing left to do.
+    """
+    with open(f"{DB_PATH}.lock", 'a') as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            init_db()
+            seed_db()
+        finally:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+SEED_PRODUCTS = [
+    ('1', 'Молоко (Sut)', '🥛 Молочные продукты', 'л'),
+    ('2', 'Кефир (Kefir)', '🥛 Молочные продукты', 'л'),
+    ('3', 'Творог (Tvorog / Suzma)', '🥛 Молочные продукты', 'кг'),
+    ('4', 'Каймак (Qaymoq)', '🥛 Молочные продукты', 'кг'),
+    ('5', 'Сметана (Smetana / Qaymoqcha)', '🥛 Молочные продукты', 'кг'),
+    ('6', 'Сыр твёрдый (Qattiq pishloq)', '🥛 Молочные продукты', 'кг'),
+    ('7', 'Сыр плавленый (Eritilgan pishloq)', '🥛 Молочные продукты', 'кг'),
+    ('8', 'Сыр моцарелла (Motsarella pishlog‘i)', '🥛 Молочные продукты', 'кг'),
+    ('9', 'Сыр Ханский (Xon pishlog‘i)', '🥛 Молочные продукты', 'кг'),
+    ('10', 'Сырок (Shirin pishloqcha)', '🥛 Молочные продукты', 'шт'),
+    ('11', 'Сливочное масло (Sariyog‘)', '🥛 Молочные продукты', 'кг'),
+    ('12', 'Маргарин «Шедрое лето» (Margarin)', '🥛 Молочные продукты', 'кг'),
+    ('13', 'Яйца куриные (Tovuq tuxumi)', '🥚 Яйца и мясо', 'шт'),
+    ('14', 'Яйца перепелиные (Bedana tuxumi)', '🥚 Яйца и мясо', 'шт'),
+    ('15', 'Индейка (Kurka go‘shti)', '🥚 Яйца и мясо', 'кг'),
+    ('16', 'Колбаса варёная (Qaynatilgan kolbasa)', '🥚 Яйца и мясо', 'кг'),
+    ('17', 'Колбаса копчёная (Dudlangan kolbasa)', '🥚 Яйца и мясо', 'кг'),
+    ('18', 'Сосиски (Sosiska)', '🥚 Яйца и мясо', 'кг'),
+    ('19', 'Мука (Un)', '🍞 Хлеб и мучное', 'кг'),
+    ('20', 'Лаваш (Lavash non)', '🍞 Хлеб и мучное', 'шт'),
+    ('21', 'Хлеб (Non)', '🍞 Хлеб и мучное', 'шт'),
+    ('22', 'Тостовый хлеб (Tost noni)', '🍞 Хлеб и мучное', 'шт'),
+    ('23', 'Манпар (тесто) (Xamir)', '🍞 Хлеб и мучное', 'кг'),
+    ('24', 'Макароны (Makaron)', '🍞 Хлеб и мучное', 'кг'),
+    ('25', 'Спагетти (Spagetti)', '🍞 Хлеб и мучное', 'кг'),
+    ('26', 'Вермишель (Vermishel)', '🍞 Хлеб и мучное', 'кг'),
+    ('27', 'Фунчоза (Funchuza)', '🍞 Хлеб и мучное', 'кг'),
+    ('28', 'Манная крупа (Manka yormasi)', '🍞 Хлеб и мучное', 'кг'),
+    ('29', 'Овсянка (Suli yormasi)', '🍞 Хлеб и мучное', 'кг'),
+    ('30', 'Рис (Guruch)', '🍚 Крупы и бобовые', 'кг'),
+    ('31', 'Рис обычный (Oddiy guruch)', '🍚 Крупы и бобовые', 'кг'),
+    ('32', 'Рис Лазер (Lazer guruch)', '🍚 Крупы и бобовые', 'кг'),
+    ('33', 'Перловка (Arpa yormasi)', '🍚 Крупы и бобовые', 'кг'),
+    ('34', 'Нут / горох (No‘xat)', '🍚 Крупы и бобовые', 'кг'),
+    ('35', 'Горох (консерва) (Konserva no‘xat)', '🍚 Крупы и бобовые', 'шт'),
+    ('36', 'Соль (Tuz)', '🧂 Специи и приправы', 'кг'),
+    ('37', 'Корейская соль (Koreys tuzi)', '🧂 Специи и приправы', 'кг'),
+    ('38', 'Зира (Zira)', '🧂 Специи и приправы', 'г'),
+    ('39', 'Приправа для лагмана (Lag‘mon ziravori)', '🧂 Специи и приправы', 'г'),
+    ('40', 'Лавровый лист (Dafna bargi)', '🧂 Специи и приправы', 'шт'),
+    ('41', 'Роллтон (приправа) (Rollton ziravori)', '🧂 Специи и приправы', 'шт'),
+    ('42', 'Кунжут (Kunjut)', '🧂 Специи и приправы', 'г'),
+    ('43', 'Какао (Kakao)', '☕ Напитки и сладкое', 'кг'),
+    ('44', 'Чёрный чай (Qora choy)', '☕ Напитки и сладкое', 'кг'),
+    ('45', 'Сахар (Shakar)', '☕ Напитки и сладкое', 'кг'),
+    ('46', 'Варенье (Murabbo)', '☕ Напитки и сладкое', 'кг'),
+    ('47', 'Шоколадная паста (Shokolad pastasi)', '☕ Напитки и сладкое', 'шт'),
+    ('48', 'Миллер (вафли) (Vafli)', '☕ Напитки и сладкое', 'шт'),
+    ('49', 'Изюм (Mayiz)', '☕ Напитки и сладкое', 'кг'),
+    ('50', 'Грецкий орех (Yong‘oq)', '☕ Напитки и сладкое', 'кг'),
+    ('51', 'Майонез (Mayonez)', '🥫 Соусы и добавки', 'кг'),
+    ('52', 'Соевый соус (Soya sousi)', '🥫 Соусы и добавки', 'л'),
+    ('53', 'Уксус (Sirka)', '🥫 Соусы и добавки', 'л'),
+    ('54', 'Томатная паста (Tomat pastasi)', '🥫 Соусы и добавки', 'кг'),
+    ('55', 'Кетчуп (Ketchup)', '🥫 Соусы и добавки', 'шт'),
+    ('56', 'Масло растительное (O‘simlik yog‘i)', '🥫 Соусы и добавки', 'л'),
+    ('57', 'Сода (Soda)', '🥫 Соусы и добавки', 'шт'),
+    ('58', 'Дрожжи (Xamirturush)', '🥫 Соусы и добавки', 'шт'),
+    ('59', 'Разрыхлитель (Pishirish kukuni)', '🥫 Соусы и добавки', 'шт'),
+    ('60', 'Картофель (Kartoshka)', '🥕 Овощи и зелень', 'кг'),
+    ('61', 'Морковь красная (Qizil sabzi)', '🥕 Овощи и зелень', 'кг'),
+    ('62', 'Морковь жёлтая (Sariq sabzi)', '🥕 Овощи и зелень', 'кг'),
+    ('63', 'Капуста зелёная (Yashil karam)', '🥕 Овощи и зелень', 'кг'),
+    ('64', 'Капуста красная (Qizil karam)', '🥕 Овощи и зелень', 'кг'),
+    ('65', 'Капуста квашеная (Tuzlangan karam)', '🥕 Овощи и зелень', 'кг'),
+    ('66', 'Помидоры (Pomidor)', '🥕 Овощи и зелень', 'кг'),
+    ('67', 'Огурцы (Bodring)', '🥕 Овощи и зелень', 'кг'),
+    ('68', 'Солёные огурцы (Tuzlangan bodring)', '🥕 Овощи и зелень', 'кг'),
+    ('69', 'Болгарский перец (Bulgar qalampiri)', '🥕 Овощи и зелень', 'кг'),
+    ('70', 'Болгарский перец «Светофор» (Rangli qalampir)', '🥕 Овощи и зелень', 'кг'),
+    ('71', 'Лук (Piyoz)', '🥕 Овощи и зелень', 'кг'),
+    ('72', 'Сельдерей (Selderey)', '🥕 Овощи и зелень', 'кг'),
+    ('73', 'Корейская морковь (Koreyscha sabzi)', '🥕 Овощи и зелень', 'кг'),
+    ('74', 'Укроп (Shivit)', '🥕 Овощи и зелень', 'кг'),
+    ('75', 'Кинза (Kashnich)', '🥕 Овощи и зелень', 'кг'),
+    ('76', 'Свекла красная (Qizil lavlagi)', '🥕 Овощи и зелень', 'кг'),
+    ('77', 'Редька белая (Oq turup)', '🥕 Овощи и зелень', 'кг'),
+    ('78', 'Бананы (Banan)', '🍎 Фрукты', 'кг'),
+    ('79', 'Яблоки (Olma)', '🍎 Фрукты', 'кг'),
+    ('80', 'Груша (Nok)', '🍎 Фрукты', 'кг'),
+    ('81', 'Лимоны (Limon)', '🍎 Фрукты', 'кг'),
+]
@@ -0,0 +1,141 @@
+# In-process pub/sub hub for order change events (used by GET /orders/stream)
+# Publishing never waits on subscribers: each one has a bounded queue, and a
+# subscriber that falls behind has its backlog replaced by a single "resync"
+# event telling it to catch up through GET /orders/changes.
+#
+# With several API worker processes a write lands in one of them, so every
+# write also stores its event in order_events (record_events); each worker
+# relays the events written by the others to its own subscribers (relay).
+
+import asyncio
+import collections
+import json
+import os
+from typing import List, Optional
+
+from db import ChangeWatcher, connection, run_db
+
+QUEUE_SIZE = int(os.getenv('ORDER_STREAM_QUEUE_SIZE', '100'))
+# Events kept in order_events, and how often workers look for new ones
+EVENT_BACKLOG = int(os.getenv('ORDER_EVENT_BACKLOG', '1000'))
+EVENT_POLL_INTERVAL = float(os.getenv('ORDER_EVENT_POLL_INTERVAL', '0.25'))
+
+# Statuses each role's screens show; a role gets events for orders entering
+# or leaving these statuses
+ROLE_STATUSES = {
+    'chef': {'sent_to_chef', 'chef_checking'},
+    'financier': {'sent_to_financier', 'financier_checking', 'completed'},
+    'supplier': {'sent_to_supplier', 'supplier_collecting', 'supplier_delivering'},
+}
+
+
+class Subscriber:
+    def __init__(self, branch: Optional[str] = None, role: Optional[str] = None, queue_size: int = QUEUE_SIZE):
+        self.branch = branch if branch != 'all' else None
+        self.role = role
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.overflows = 0
+
+    def wants(self, event: dict) -> bool:
+        if event.get('type') == 'resync':
+            return True
+        if self.branch and event.get('branch') != self.branch:
+            return False
+        statuses = ROLE_STATUSES.get(self.role)
+        if statuses is None:
+            return True
+        return event.get('status') in statuses or event.get('previousStatus') in statuses
+
+    def offer(self, event: dict) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too slow to keep up: drop the backlog, ask the client to resync
+            self.overflows += 1
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({'type': 'resync', 'version': event.get('version')})
+
+
+class OrderEventHub:
+    def __init__(self):
+        self._subscribers = set()
+        # Versions published by this process, which relay() must not repeat
+        self._published = collections.deque(maxlen=EVENT_BACKLOG)
+
+    def subscribe(self, branch: Optional[str] = None, role: Optional[str] = None) -> Subscriber:
+        subscriber = Subscriber(branch, role)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self._subscribers.discard(subscriber)
+
+    def seen(self, version: int) -> bool:
+        """Whether this process published the event with `version` itself"""
+        return version in self._published
+
+    def publish(self, event: dict, relayed: bool = False) -> None:
+        """Fan an event out to matching subscribers (call from the event loop)"""
+        if not relayed:
+            self._published.append(event.get('version'))
+        for subscriber in list(self._subscribers):
+            if subscriber.wants(event):
+                subscriber.offer(event)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+
+hub = OrderEventHub()
+
+
+def record_events(conn, events: List[dict]) -> None:
+    """Store change events for the other workers (inside the write transaction)"""
+    conn.executemany(
+        "INSERT OR REPLACE INTO order_events (version, event) VALUES (?, ?)",
+        [(event['version'], json.dumps(event)) for event in events],
+    )
+    conn.execute("DELETE FROM order_events WHERE version <= ?", (events[-1]['version'] - EVENT_BACKLOG,))
+
+
+def load_events(after: Optional[int]) -> tuple:
+    """(latest version, events newer than `after` as (version, event) pairs, complete).
+
+    complete is False when events newer than `after` were already pruned
+    (record_events keeps the last EVENT_BACKLOG versions).
+    """
+    with connection() as conn:
+        conn.execute("BEGIN")
+        latest = conn.execute("SELECT COALESCE(MAX(version), 0) FROM order_events").fetchone()[0]
+        if after is None:
+            conn.commit()
+            return latest, [], True
+        rows = conn.execute(
+            "SELECT version, event FROM order_events WHERE version > ? ORDER BY version", (after,)
+        ).fetchall()
+        conn.commit()
+    complete = after >= latest - EVENT_BACKLOG
+    return (rows[-1]['version'] if rows else after), [(row['version'], json.loads(row['event'])) for row in rows], complete
+
+
+async def relay(hub: OrderEventHub, interval: float = EVENT_POLL_INTERVAL) -> None:
+    """Publish events other processes stored in order_events, while anyone is subscribed"""
+    watcher = ChangeWatcher()
+    after = None
+    while True:
+        await asyncio.sleep(interval)
+        if not hub.subscriber_count:
+            # Nobody to tell; start from the newest event once someone subscribes
+            after = None
+            continue
+        if not await run_db(watcher.changed) and after is not None:
+            continue
+        after, events, complete = await run_db(load_events, after)
+        if not complete:
+            # Fell so far behind that some events are gone: clients refetch
+            hub.publish({'type': 'resync', 'version': after}, relayed=True)
+        for version, event in events:
+            if not hub.seen(version):
+                hub.publish(event, relayed=True)
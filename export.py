@@ -0,0 +1,228 @@
+# Order export for accounting (GET /orders/export)
+# One row per order line, as CSV or XLSX. Rows are read from a dedicated
+# connection in chunks of EXPORT_CHUNK_ROWS and encoded chunk by chunk on the
+# db executor, so memory stays flat however many orders are exported and the
+# pooled connections stay free for other requests.
+# With history, archived orders (archive.py) are exported first, then the
+# orders still in the hot tables.
+
+import csv
+import io
+import os
+import re
+import zipfile
+from typing import AsyncIterator, List, Optional
+from xml.sax.saxutils import escape
+
+from db import connect, run_db
+from archive import archived_lines, line_column
+
+EXPORT_CHUNK_ROWS = int(os.getenv('EXPORT_CHUNK_ROWS', '2000'))
+
+# (header, SQL expression); total is left empty for unpriced lines
+EXPORT_COLUMNS = (
+    ('order_id', 'o.id'),
+    ('created_at', 'o.createdAt'),
+    ('branch', 'o.branch'),
+    ('status', 'o.status'),
+    ('delivered_at', 'o.deliveredAt'),
+    ('product_id', 'i.product_id'),
+    ('product', 'i.name'),
+    ('category', 'i.category'),
+    ('unit', 'i.unit'),
+    ('quantity', 'i.quantity'),
+    ('price', 'i.price'),
+    ('total', 'i.price * i.quantity'),
+    ('checked', 'i.checked'),
+    ('comment', 'i.comment'),
+    ('chef_comment', 'i.chefComment'),
+    ('delivery_date', 'i.deliveryDate'),
+)
+
+MEDIA_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+_LINE_FIELD = re.compile(r'\bi\.(\w+)')
+
+
+def export_query(
+    branch: Optional[List[str]] = None,
+    status: Optional[List[str]] = None,
+    created_after: Optional[str] = None,
+    created_before: Optional[str] = None,
+    archived: bool = False,
+) -> tuple:
+    """SQL and params for the export; filters work like GET /orders.
+
+    archived=True reads orders_archive instead of orders/order_items.
+    """
+    clauses, params = [], []
+    if branch:
+        clauses.append(f"o.branch IN ({', '.join('?' * len(branch))})")
+        params.extend(branch)
+    if status:
+        clauses.append(f"o.status IN ({', '.join('?' * len(status))})")
+        params.extend(status)
+    if created_after:
+        clauses.append("o.createdAt >= ?")
+        params.append(created_after)
+    if created_before:
+        clauses.append("o.createdAt < ?")
+        params.append(created_before)
+
+    columns = [expr for _, expr in EXPORT_COLUMNS]
+    if not archived:
+        sql = f"SELECT {', '.join(columns)} FROM orders o JOIN order_items i ON i.order_id = o.id"
+        order_by = "o.createdAt, o.id, i.position"
+    else:
+        # Same columns over the archived lines (a JSON array per order, in position order)
+        columns = [_LINE_FIELD.sub(lambda m: f"({line_column(m[1])})", expr) for expr in columns]
+        sql = f"SELECT {', '.join(columns)} FROM {archived_lines('o')}"
+        clauses.insert(0, "o.id NOT IN (SELECT id FROM orders)")
+        order_by = "o.createdAt, o.id, j.key"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    return sql + f" ORDER BY {order_by}", params
+
+
+class _Sink:
+    """Write-only buffer that zipfile streams into (it cannot seek)"""
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data: bytes) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data, self._parts = b''.join(self._parts), []
+        return data
+
+
+class CsvWriter:
+    def begin(self) -> bytes:
+        # The BOM makes Excel read the Cyrillic names as UTF-8
+        return '﻿'.encode() + self.rows([[header for header, _ in EXPORT_COLUMNS]])
+
+    def rows(self, rows: list) -> bytes:
+        out = io.StringIO()
+        csv.writer(out).writerows(rows)
+        return out.getvalue().encode()
+
+    def end(self) -> bytes:
+        return b''
+
+
+_XML_INVALID = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Orders" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+class XlsxWriter:
+    """Minimal single-sheet XLSX written as a streamed zip (inline strings, no styles)"""
+
+    def __init__(self):
+        self._sink = _Sink()
+        self._zip = zipfile.ZipFile(self._sink, 'w', zipfile.ZIP_DEFLATED)
+        self._sheet = None
+
+    def begin(self) -> bytes:
+        for name, xml in _XLSX_PARTS.items():
+            self._zip.writestr(name, xml)
+        # force_zip64: the sheet size is unknown when its zip header is written
+        self._sheet = self._zip.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True)
+        self._sheet.write(
+            b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+        )
+        return self.rows([[header for header, _ in EXPORT_COLUMNS]])
+
+    def rows(self, rows: list) -> bytes:
+        xml = []
+        for row in rows:
+            xml.append('<row>')
+            for value in row:
+                if value is None:
+                    xml.append('<c/>')
+                elif isinstance(value, (int, float)):
+                    xml.append(f'<c><v>{value}</v></c>')
+                else:
+                    text = escape(_XML_INVALID.sub('', str(value)))
+                    xml.append(f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+            xml.append('</row>')
+        self._sheet.write(''.join(xml).encode())
+        return self._sink.drain()
+
+    def end(self) -> bytes:
+        self._sheet.write(b'</sheetData></worksheet>')
+        self._sheet.close()
+        self._zip.close()
+        return self._sink.drain()
+
+
+WRITERS = {'csv': CsvWriter, 'xlsx': XlsxWriter}
+
+
+async def stream_export(fmt: str, queries: List[tuple]) -> AsyncIterator[bytes]:
+    """Yield the encoded export chunk by chunk.
+
+    `queries` are (sql, params) pairs from export_query, read one after the
+    other. The rows come from one read transaction on a connection of their
+    own, so the export is a consistent snapshot and a slow download holds no
+    pooled connection.
+    """
+    writer = WRITERS[fmt]()
+    conn = await run_db(connect)
+    try:
+        def next_chunk(cursor):
+            rows = cursor.fetchmany(EXPORT_CHUNK_ROWS)
+            if not rows:
+                return None
+            return writer.rows([tuple(row) for row in rows])
+
+        await run_db(conn.execute, "BEGIN")
+        yield await run_db(writer.begin)
+        for sql, params in queries:
+            cursor = await run_db(conn.execute, sql, params)
+            while (chunk := await run_db(next_chunk, cursor)) is not None:
+                if chunk:
+                    yield chunk
+        yield await run_db(writer.end)
+    finally:
+        # Also runs when the client disconnects mid-download
+        await run_db(conn.close)
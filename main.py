@@ -2,12 +2,14 @@
 # Registration flow with language, FIO, role, password, and branch selection
 
 import os
+import sys
 import logging
 from typing import Optional
 from dotenv import load_dotenv
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, ReplyKeyboardRemove
 from telegram.ext import (
     Application,
+    BaseUpdateProcessor,
     CommandHandler,
     CallbackQueryHandler,
     MessageHandler,
@@ -15,10 +17,16 @@ from telegram.ext import (
     ContextTypes,
     filters,
 )
-import sqlite3
+import asyncio
 import json
 import uuid
 
+from db import connection, transaction, prepare_db, run_db
+from cache import TTLCache, env_flag
+from bot_persistence import SQLitePersistence
+from notifier import Notifier
+import metrics
+
 # Load environment variables
 load_dotenv()
 
@@ -32,54 +40,34 @@ logger = logging.getLogger(__name__)
 # Environment variables
 BOT_TOKEN = os.getenv('BOT_TOKEN')
 WEBAPP_URL = os.getenv('WEBAPP_URL', 'https://your-webapp-url.com')
-
-# Database path
-DB_PATH = os.getenv('DB_PATH', 'database.db')
-
-def get_db_connection():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-# Ensure tables exist (shared with api.py logic)
-def init_db():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS users (
-        id TEXT PRIMARY KEY,
-        telegram_id INTEGER UNIQUE NOT NULL,
-        full_name TEXT NOT NULL,
-        role TEXT NOT NULL,
-        branch TEXT,
-        language TEXT DEFAULT 'ru',
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    ''')
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS orders (
-        id TEXT PRIMARY KEY,
-        status TEXT NOT NULL,
-        products TEXT NOT NULL,
-        createdAt TEXT NOT NULL,
-        deliveredAt TEXT,
-        estimatedDeliveryDate TEXT,
-        branch TEXT NOT NULL
-    )
-    ''')
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS master_products (
-        id TEXT PRIMARY KEY,
-        name TEXT NOT NULL,
-        category TEXT NOT NULL,
-        unit TEXT NOT NULL
-    )
-    ''')
-    conn.commit()
-    conn.close()
-
-init_db()
+# polling (default) or webhook, see bot_webhook.py
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+# Updates processed at once (updates from the same chat still run one at a time)
+BOT_CONCURRENCY = int(os.getenv('BOT_CONCURRENCY', '32'))
+# Keep conversation state and user_data in the database across restarts
+BOT_PERSISTENCE = env_flag('BOT_PERSISTENCE')
+# Message users when orders change status (see notifier.py)
+BOT_NOTIFICATIONS = env_flag('BOT_NOTIFICATIONS')
+
+# Serve /metrics (handler latency, database calls per update) on this port when set
+BOT_METRICS_PORT = int(os.getenv('BOT_METRICS_PORT', '0'))
+
+# The conversation only reacts to messages and button presses
+ALLOWED_UPDATES = [Update.MESSAGE, Update.CALLBACK_QUERY]
+
+# Ensure tables exist (schema shared with api.py via db.py); safe to race the API's startup
+prepare_db()
+
+# User rows by telegram_id; save_user writes through, so the TTL only bounds
+# staleness from writes made by other processes.
+# USER_CACHE_ENABLED=0 disables it (tests)
+user_cache = TTLCache(
+    max_entries=int(os.getenv('USER_CACHE_SIZE', '4096')),
+    ttl=float(os.getenv('USER_CACHE_TTL', '300')),
+    enabled=env_flag('USER_CACHE_ENABLED'),
+)
+metrics.watch_cache('users', user_cache)
+_NOT_CACHED = object()
 
 # Conversation states
 LANGUAGE, FIO, ROLE, PASSWORD, BRANCH, SETTINGS = range(6)
@@ -124,6 +112,16 @@ TEXTS = {
         'branch_shayzantaur': 'Шайзантаур',
         'branch_olmazar': 'Олмазар',
         'branch_all': 'Все филиалы',
+        # Order notifications
+        'order_status_changed': '📦 Заказ филиала {branch}: {status}',
+        'status_sent_to_chef': 'Отправлено шефу',
+        'status_sent_to_financier': 'У финансиста',
+        'status_sent_to_supplier': 'У поставщика',
+        'status_supplier_collecting': 'Сборка заказа',
+        'status_supplier_delivering': 'Доставка',
+        'status_chef_checking': 'Проверка шефа',
+        'status_financier_checking': 'Финальная проверка',
+        'status_completed': 'Завершено',
     },
     'uz': {
         'welcome': "👋 Optimizer'ga xush kelibsiz!\n\nTilni tanlang:",
@@ -156,67 +154,129 @@ TEXTS = {
         'branch_shayzantaur': 'Shayxontohur',
         'branch_olmazar': 'Olmazor',
         'branch_all': 'Barcha filiallar',
+        # Order notifications
+        'order_status_changed': '📦 {branch} filiali buyurtmasi: {status}',
+        'status_sent_to_chef': 'Oshpazga yuborildi',
+        'status_sent_to_financier': 'Moliyachida',
+        'status_sent_to_supplier': 'Yetkazuvchida',
+        'status_supplier_collecting': "Buyurtma yig'ilmoqda",
+        'status_supplier_delivering': 'Yetkazilmoqda',
+        'status_chef_checking': 'Oshpaz tekshiruvi',
+        'status_financier_checking': 'Yakuniy tekshiruv',
+        'status_completed': 'Yakunlandi',
     }
 }
 
+# Per-language text tables with the Russian fallback merged in, and the
+# bound str.format of every template that takes arguments
+_TEXT_TABLES = {lang: {**TEXTS['ru'], **texts} for lang, texts in TEXTS.items()}
+_TEMPLATES = {
+    lang: {key: text.format for key, text in table.items() if '{' in text}
+    for lang, table in _TEXT_TABLES.items()
+}
+
 def get_text(lang: str, key: str, **kwargs) -> str:
     """Get translated text"""
-    text = TEXTS.get(lang, TEXTS['ru']).get(key, TEXTS['ru'].get(key, key))
     if kwargs:
-        text = text.format(**kwargs)
-    return text
+        template = _TEMPLATES.get(lang, _TEMPLATES['ru']).get(key)
+        if template:
+            return template(**kwargs)
+    return _TEXT_TABLES.get(lang, _TEXT_TABLES['ru']).get(key, key)
+
+# Keyboards are built once per language at import time and shared between
+# updates (python-telegram-bot markup objects are immutable)
+def _inline_rows(lang: str, buttons: list) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(get_text(lang, key), callback_data=data)] for key, data in buttons
+    ])
+
+def _build_keyboards(lang: str) -> dict:
+    roles = [('role_chef', 'role_chef'), ('role_financier', 'role_financier'), ('role_supplier', 'role_supplier')]
+    branches = [(f'branch_{b}', f'branch_{b}') for b in ('chilanzar', 'uchtepa', 'shayzantaur', 'olmazar')]
+    return {
+        # Role picker during registration / from settings
+        'roles': _inline_rows(lang, roles + [('back', 'back_to_fio')]),
+        'roles_settings': _inline_rows(lang, roles + [('back', 'back_to_settings')]),
+        'branches': _inline_rows(lang, branches + [('back', 'back_to_role')]),
+        'branches_settings': _inline_rows(lang, branches + [('back', 'back_to_settings')]),
+        'settings': _inline_rows(lang, [
+            ('change_language', 'setting_language'),
+            ('change_fio', 'setting_fio'),
+            ('change_role', 'setting_role'),
+            ('change_branch', 'setting_branch'),
+            ('back', 'back_to_main'),
+        ]),
+        'back': ReplyKeyboardMarkup(
+            [[get_text(lang, 'back')]],
+            resize_keyboard=True,
+            one_time_keyboard=False
+        ),
+    }
+
+KEYBOARDS = {lang: _build_keyboards(lang) for lang in TEXTS}
+
+LANGUAGE_KEYBOARD = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton('🇷🇺 Русский', callback_data='lang_ru'),
+        InlineKeyboardButton("🇺🇿 O'zbekcha", callback_data='lang_uz'),
+    ]
+])
+
+def get_keyboard(lang: str, name: str):
+    """Get a prebuilt keyboard by name (see _build_keyboards)"""
+    return KEYBOARDS.get(lang, KEYBOARDS['ru'])[name]
 
 def get_back_keyboard(lang: str) -> ReplyKeyboardMarkup:
     """Get keyboard with back button"""
-    return ReplyKeyboardMarkup(
-        [[get_text(lang, 'back')]],
-        resize_keyboard=True,
-        one_time_keyboard=False
-    )
+    return get_keyboard(lang, 'back')
 
 def get_user_by_telegram_id(telegram_id: int) -> Optional[dict]:
-    """Get user from database by telegram ID"""
-    conn = get_db_connection()
+    """Get user from database by telegram ID (served from user_cache when possible)"""
+    cached = user_cache.get(telegram_id, _NOT_CACHED)
+    if cached is not _NOT_CACHED:
+        # Unknown users are cached as None until they register
+        return dict(cached) if cached else None
     try:
-        user = conn.execute('SELECT * FROM users WHERE telegram_id = ?', (telegram_id,)).fetchone()
-        if user:
-            return dict(user)
+        with connection() as conn:
+            user = conn.execute('SELECT * FROM users WHERE telegram_id = ?', (telegram_id,)).fetchone()
     except Exception as e:
         logger.error(f"Error fetching user: {e}")
-    finally:
-        conn.close()
-    return None
+        return None
+    user = dict(user) if user else None
+    user_cache.put(telegram_id, user)
+    return dict(user) if user else None
 
 def save_user(telegram_id: int, full_name: str, role: str, branch: str, language: str) -> bool:
     """Save or update user in database"""
-    conn = get_db_connection()
     try:
-        # Check if user exists
-        existing = get_user_by_telegram_id(telegram_id)
-        if existing:
-            # Update
-            conn.execute('''
-                UPDATE users SET
-                    full_name = ?,
-                    role = ?,
-                    branch = ?,
-                    language = ?,
-                    updated_at = CURRENT_TIMESTAMP
-                WHERE telegram_id = ?
-            ''', (full_name, role, branch, language, telegram_id))
-        else:
-            # Insert
-            conn.execute('''
-                INSERT INTO users (id, telegram_id, full_name, role, branch, language)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (str(uuid.uuid4()), telegram_id, full_name, role, branch, language))
-        conn.commit()
+        with connection() as conn, transaction(conn):
+            # Check if user exists (inside the write transaction, so no second connection)
+            existing = conn.execute('SELECT 1 FROM users WHERE telegram_id = ?', (telegram_id,)).fetchone()
+            if existing:
+                # Update
+                conn.execute('''
+                    UPDATE users SET
+                        full_name = ?,
+                        role = ?,
+                        branch = ?,
+                        language = ?,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE telegram_id = ?
+                ''', (full_name, role, branch, language, telegram_id))
+            else:
+                # Insert
+                conn.execute('''
+                    INSERT INTO users (id, telegram_id, full_name, role, branch, language)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (str(uuid.uuid4()), telegram_id, full_name, role, branch, language))
+            user = conn.execute('SELECT * FROM users WHERE telegram_id = ?', (telegram_id,)).fetchone()
+        user_cache.put(telegram_id, dict(user))
         return True
     except Exception as e:
+        # The write may or may not have landed, so let the next read go to the database
+        user_cache.pop(telegram_id)
         logger.error(f"Error saving user: {e}")
         return False
-    finally:
-        conn.close()
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Start command - check if user exists or start registration"""
@@ -224,7 +284,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     message = update.effective_message
     
     # Check if user already registered
-    user = get_user_by_telegram_id(telegram_id)
+    user = await run_db(get_user_by_telegram_id, telegram_id)
     if user:
         lang = user.get('language', 'ru')
         role_key = f"role_{user['role']}"
@@ -260,16 +320,9 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         return ConversationHandler.END
     
     # Start registration - show language selection
-    keyboard = InlineKeyboardMarkup([
-        [
-            InlineKeyboardButton('🇷🇺 Русский', callback_data='lang_ru'),
-            InlineKeyboardButton("🇺🇿 O'zbekcha", callback_data='lang_uz'),
-        ]
-    ])
-    
     await message.reply_text(
         TEXTS['ru']['welcome'],
-        reply_markup=keyboard
+        reply_markup=LANGUAGE_KEYBOARD
     )
     return LANGUAGE
 
@@ -310,9 +363,9 @@ async def fio_entered(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
     
     # If changing FIO from settings, save and return to settings
     if context.user_data.get('changing_setting') == 'fio':
-        user = get_user_by_telegram_id(update.effective_user.id)
+        user = await run_db(get_user_by_telegram_id, update.effective_user.id)
         # Update user with new name, keep other fields
-        save_user(update.effective_user.id, text, user['role'], user['branch'], lang)
+        await run_db(save_user, update.effective_user.id, text, user['role'], user['branch'], lang)
         
         await update.message.reply_text(
             get_text(lang, 'fio_changed', name=text),
@@ -321,22 +374,11 @@ async def fio_entered(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
         # We need to send the settings menu again. 
         # Since we are in a message handler, we can't edit the previous inline message easily.
         # So we send a new message.
-        keyboard = InlineKeyboardMarkup([
-            [InlineKeyboardButton(get_text(lang, 'change_language'), callback_data='setting_language')],
-            [InlineKeyboardButton(get_text(lang, 'change_fio'), callback_data='setting_fio')],
-            [InlineKeyboardButton(get_text(lang, 'change_role'), callback_data='setting_role')],
-            [InlineKeyboardButton(get_text(lang, 'change_branch'), callback_data='setting_branch')],
-            [InlineKeyboardButton(get_text(lang, 'back'), callback_data='back_to_main')],
-        ])
+        keyboard = get_keyboard(lang, 'settings')
         await update.message.reply_text(get_text(lang, 'settings_menu'), reply_markup=keyboard)
         return SETTINGS
 
-    keyboard = InlineKeyboardMarkup([
-        [InlineKeyboardButton(get_text(lang, 'role_chef'), callback_data='role_chef')],
-        [InlineKeyboardButton(get_text(lang, 'role_financier'), callback_data='role_financier')],
-        [InlineKeyboardButton(get_text(lang, 'role_supplier'), callback_data='role_supplier')],
-        [InlineKeyboardButton(get_text(lang, 'back'), callback_data='back_to_fio')],
-    ])
+    keyboard = get_keyboard(lang, 'roles')
     
     await update.message.reply_text(
         get_text(lang, 'select_role'),
@@ -392,14 +434,7 @@ async def password_entered(update: Update, context: ContextTypes.DEFAULT_TYPE) -
     # Handle Back button
     if text == get_text(lang, 'back'):
         # Go back to Role selection
-        back_callback = 'back_to_settings' if context.user_data.get('changing_setting') == 'role' else 'back_to_fio'
-        
-        keyboard = InlineKeyboardMarkup([
-            [InlineKeyboardButton(get_text(lang, 'role_chef'), callback_data='role_chef')],
-            [InlineKeyboardButton(get_text(lang, 'role_financier'), callback_data='role_financier')],
-            [InlineKeyboardButton(get_text(lang, 'role_supplier'), callback_data='role_supplier')],
-            [InlineKeyboardButton(get_text(lang, 'back'), callback_data=back_callback)],
-        ])
+        keyboard = get_keyboard(lang, 'roles_settings' if context.user_data.get('changing_setting') == 'role' else 'roles')
         await update.message.reply_text(
             get_text(lang, 'select_role'),
             reply_markup=keyboard
@@ -416,13 +451,7 @@ async def password_entered(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         return await finalize_registration(update, context)
     
     # Show branch selection
-    keyboard = InlineKeyboardMarkup([
-        [InlineKeyboardButton(get_text(lang, 'branch_chilanzar'), callback_data='branch_chilanzar')],
-        [InlineKeyboardButton(get_text(lang, 'branch_uchtepa'), callback_data='branch_uchtepa')],
-        [InlineKeyboardButton(get_text(lang, 'branch_shayzantaur'), callback_data='branch_shayzantaur')],
-        [InlineKeyboardButton(get_text(lang, 'branch_olmazar'), callback_data='branch_olmazar')],
-        [InlineKeyboardButton(get_text(lang, 'back'), callback_data='back_to_role')],
-    ])
+    keyboard = get_keyboard(lang, 'branches')
     
     await update.message.reply_text(
         get_text(lang, 'select_branch'),
@@ -442,12 +471,7 @@ async def branch_selected(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     if data == 'back_to_role':
         await query.delete_message()
         # Go back to Role selection (skipping FIO entry)
-        keyboard = InlineKeyboardMarkup([
-            [InlineKeyboardButton(get_text(lang, 'role_chef'), callback_data='role_chef')],
-            [InlineKeyboardButton(get_text(lang, 'role_financier'), callback_data='role_financier')],
-            [InlineKeyboardButton(get_text(lang, 'role_supplier'), callback_data='role_supplier')],
-            [InlineKeyboardButton(get_text(lang, 'back'), callback_data='back_to_fio')],
-        ])
+        keyboard = get_keyboard(lang, 'roles')
         await context.bot.send_message(
             chat_id=update.effective_chat.id,
             text=get_text(lang, 'select_role'),
@@ -469,7 +493,7 @@ async def finalize_registration(update: Update, context: ContextTypes.DEFAULT_TY
     branch = context.user_data.get('branch', 'all')
     
     # Save to database
-    save_user(telegram_id, full_name, role, branch, lang)
+    await run_db(save_user, telegram_id, full_name, role, branch, lang)
     
     # Build confirmation message
     role_key = f"role_{role}"
@@ -516,7 +540,7 @@ async def settings_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
         telegram_id = update.effective_user.id
         message_func = update.message.reply_text
     
-    user = get_user_by_telegram_id(telegram_id)
+    user = await run_db(get_user_by_telegram_id, telegram_id)
     
     if not user:
         # If user not found, try to register
@@ -524,13 +548,7 @@ async def settings_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
     
     lang = user.get('language', 'ru')
     
-    keyboard = InlineKeyboardMarkup([
-        [InlineKeyboardButton(get_text(lang, 'change_language'), callback_data='setting_language')],
-        [InlineKeyboardButton(get_text(lang, 'change_fio'), callback_data='setting_fio')],
-        [InlineKeyboardButton(get_text(lang, 'change_role'), callback_data='setting_role')],
-        [InlineKeyboardButton(get_text(lang, 'change_branch'), callback_data='setting_branch')],
-        [InlineKeyboardButton(get_text(lang, 'back'), callback_data='back_to_main')],
-    ])
+    keyboard = get_keyboard(lang, 'settings')
     
     await message_func(
         get_text(lang, 'settings_menu'),
@@ -544,11 +562,11 @@ async def setting_language_handle(update: Update, context: ContextTypes.DEFAULT_
     await query.answer()
     
     telegram_id = update.effective_user.id
-    user = get_user_by_telegram_id(telegram_id)
+    user = await run_db(get_user_by_telegram_id, telegram_id)
     current_lang = user.get('language', 'ru')
     new_lang = 'uz' if current_lang == 'ru' else 'ru'
     
-    save_user(telegram_id, user['full_name'], user['role'], user['branch'], new_lang)
+    await run_db(save_user, telegram_id, user['full_name'], user['role'], user['branch'], new_lang)
     
     await query.edit_message_text(get_text(new_lang, 'language_changed'))
     await start(update, context)
@@ -560,7 +578,7 @@ async def setting_fio_handle(update: Update, context: ContextTypes.DEFAULT_TYPE)
     await query.answer()
     
     telegram_id = update.effective_user.id
-    user = get_user_by_telegram_id(telegram_id)
+    user = await run_db(get_user_by_telegram_id, telegram_id)
     lang = user.get('language', 'ru')
     
     context.user_data['language'] = lang
@@ -588,19 +606,14 @@ async def setting_role_handle(update: Update, context: ContextTypes.DEFAULT_TYPE
     await query.answer()
     
     telegram_id = update.effective_user.id
-    user = get_user_by_telegram_id(telegram_id)
+    user = await run_db(get_user_by_telegram_id, telegram_id)
     lang = user.get('language', 'ru')
     
     context.user_data['language'] = lang
     context.user_data['full_name'] = user['full_name']
     context.user_data['changing_setting'] = 'role'
     
-    keyboard = InlineKeyboardMarkup([
-        [InlineKeyboardButton(get_text(lang, 'role_chef'), callback_data='role_chef')],
-        [InlineKeyboardButton(get_text(lang, 'role_financier'), callback_data='role_financier')],
-        [InlineKeyboardButton(get_text(lang, 'role_supplier'), callback_data='role_supplier')],
-        [InlineKeyboardButton(get_text(lang, 'back'), callback_data='back_to_settings')],
-    ])
+    keyboard = get_keyboard(lang, 'roles_settings')
     
     await query.edit_message_text(get_text(lang, 'select_role'), reply_markup=keyboard)
     return ROLE
@@ -611,7 +624,7 @@ async def setting_branch_handle(update: Update, context: ContextTypes.DEFAULT_TY
     await query.answer()
     
     telegram_id = update.effective_user.id
-    user = get_user_by_telegram_id(telegram_id)
+    user = await run_db(get_user_by_telegram_id, telegram_id)
     lang = user.get('language', 'ru')
     
     context.user_data['language'] = lang
@@ -619,13 +632,7 @@ async def setting_branch_handle(update: Update, context: ContextTypes.DEFAULT_TY
     context.user_data['role'] = user['role']
     context.user_data['changing_setting'] = 'branch'
     
-    keyboard = InlineKeyboardMarkup([
-        [InlineKeyboardButton(get_text(lang, 'branch_chilanzar'), callback_data='branch_chilanzar')],
-        [InlineKeyboardButton(get_text(lang, 'branch_uchtepa'), callback_data='branch_uchtepa')],
-        [InlineKeyboardButton(get_text(lang, 'branch_shayzantaur'), callback_data='branch_shayzantaur')],
-        [InlineKeyboardButton(get_text(lang, 'branch_olmazar'), callback_data='branch_olmazar')],
-        [InlineKeyboardButton(get_text(lang, 'back'), callback_data='back_to_settings')],
-    ])
+    keyboard = get_keyboard(lang, 'branches_settings')
     
     await query.edit_message_text(get_text(lang, 'select_branch'), reply_markup=keyboard)
     return BRANCH
@@ -647,14 +654,100 @@ async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     )
     return ConversationHandler.END
 
-def main() -> None:
-    """Start the bot"""
-    if not BOT_TOKEN:
-        logger.error("BOT_TOKEN not set in environment variables!")
-        return
-    
-    # Create application
-    application = Application.builder().token(BOT_TOKEN).build()
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """Processes updates concurrently, but one at a time per chat.
+
+    Updates of one chat run in arrival order, so ConversationHandler state
+    transitions stay consistent while different users are served in parallel.
+    """
+
+    def __init__(self, max_concurrent_updates: int):
+        # The base class takes its semaphore before do_process_update, i.e.
+        # before the chat lock, so a burst from one chat would fill every
+        # slot while waiting for itself. Its semaphore is sized never to
+        # block; the real limit (_slots) is taken once the chat's turn came.
+        self._limit = None
+        super().__init__(sys.maxsize)
+        self._limit = max_concurrent_updates
+        self._slots = asyncio.Semaphore(max_concurrent_updates)
+        self._running = 0
+        # chat_id -> [lock, number of updates holding or waiting for it]
+        self._chats = {}
+
+    @property
+    def max_concurrent_updates(self) -> int:
+        return self._limit or super().max_concurrent_updates
+
+    @property
+    def current_concurrent_updates(self) -> int:
+        return self._running
+
+    async def _run(self, coroutine) -> None:
+        async with self._slots:
+            self._running += 1
+            try:
+                await coroutine
+            finally:
+                self._running -= 1
+
+    async def do_process_update(self, update, coroutine) -> None:
+        chat = update.effective_chat if isinstance(update, Update) else None
+        if chat is None:
+            await self._run(coroutine)
+            return
+        entry = self._chats.setdefault(chat.id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                await self._run(coroutine)
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._chats[chat.id]
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+def render_order_notification(lang: str, job: dict) -> str:
+    """Text of an order status notification (job as built by notifier.Notifier)"""
+    return get_text(lang, 'order_status_changed',
+        branch=get_text(lang, f"branch_{job['branch']}"),
+        status=get_text(lang, f"status_{job['status']}")
+    )
+
+async def start_notifier(application: Application) -> None:
+    notifier = Notifier(application.bot, render_order_notification)
+    application.bot_data['notifier'] = notifier
+    await notifier.start()
+
+async def stop_notifier(application: Application) -> None:
+    notifier = application.bot_data.pop('notifier', None)
+    if notifier:
+        await notifier.stop()
+
+def build_application(token: str = None, base_url: str = None, concurrency: int = None,
+                      persistence: bool = None, notifications: bool = None) -> Application:
+    """Create the bot application with all handlers registered.
+
+    base_url points the bot at another Bot API server (used by bench/bot_updates.py);
+    concurrency <= 1 processes updates strictly one after another.
+    """
+    concurrency = BOT_CONCURRENCY if concurrency is None else concurrency
+    persistence = BOT_PERSISTENCE if persistence is None else persistence
+    notifications = BOT_NOTIFICATIONS if notifications is None else notifications
+    builder = Application.builder().token(token or BOT_TOKEN)
+    if base_url:
+        builder = builder.base_url(base_url)
+    if concurrency > 1:
+        builder = builder.concurrent_updates(PerChatUpdateProcessor(concurrency))
+    if persistence:
+        builder = builder.persistence(SQLitePersistence())
+    if notifications:
+        builder = builder.post_init(start_notifier).post_stop(stop_notifier)
+    application = builder.build()
     
     # Registration conversation handler
     conv_handler = ConversationHandler(
@@ -685,13 +778,37 @@ def main() -> None:
         },
         fallbacks=[CommandHandler('cancel', cancel)],
         allow_reentry=True,
+        name='registration',
+        persistent=persistence,
     )
     
+    states = [handler for handlers in conv_handler.states.values() for handler in handlers]
+    for handler in [*conv_handler.entry_points, *states, *conv_handler.fallbacks]:
+        handler.callback = metrics.instrument_handler(handler.callback)
+    
     application.add_handler(conv_handler)
+    return application
+
+def main() -> None:
+    """Start the bot"""
+    if not BOT_TOKEN:
+        logger.error("BOT_TOKEN not set in environment variables!")
+        return
+    
+    if BOT_METRICS_PORT:
+        metrics.serve(BOT_METRICS_PORT)
+        logger.info(f"Metrics on :{BOT_METRICS_PORT}/metrics")
+    
+    if BOT_MODE == 'webhook':
+        import uvicorn
+        from bot_webhook import WEBHOOK_PORT
+        logger.info("Bot starting (webhook)...")
+        uvicorn.run('bot_webhook:create_app', factory=True, host='0.0.0.0', port=WEBHOOK_PORT)
+        return
     
     # Start polling
     logger.info("Bot starting...")
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    build_application().run_polling(allowed_updates=ALLOWED_UPDATES)
 
 if __name__ == '__main__':
     main()
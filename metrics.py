@@ -0,0 +1,385 @@
+# In-process metrics in the Prometheus text format
+# Counters and histograms are plain dicts guarded by a lock, cheap enough
+# for the hot paths (every HTTP request, every SQL statement). api.py serves
+# them at GET /metrics; the bot serves its own on BOT_METRICS_PORT and, in
+# webhook mode, at /metrics of bot_webhook.py.
+#
+# METRICS_ENABLED=0 turns recording off.
+#
+# With several API worker processes a scrape reaches only one of them, so
+# each worker also writes its values to METRICS_DIR every few seconds and
+# render() adds up the other workers' files (see share()).
+
+import abc
+import asyncio
+import bisect
+import contextvars
+import functools
+import glob
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Sequence, Tuple
+
+from cache import env_flag
+
+METRICS_ENABLED = env_flag('METRICS_ENABLED')
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Shared by the worker processes of one server; set up by setup_shared_dir()
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+SHARE_INTERVAL = 5
+
+# Seconds; from a cached statement to a lunch-hour lock wait
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+class Metric(abc.ABC):
+    kind = 'untyped'
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def values(self) -> dict:
+        with self._lock:
+            return dict(self._values)
+
+    def merge(self, values: dict, other: list) -> None:
+        """Add another process's values ([labels, value] pairs, see snapshot())"""
+        for labels, value in other:
+            values[tuple(labels)] = values.get(tuple(labels), 0) + value
+
+    @abc.abstractmethod
+    def samples(self, values: dict):
+        """(name, labels, value) lines for `values`"""
+
+    def render(self, others: list = ()) -> str:
+        values = self.values()
+        for other in others:
+            self.merge(values, other.get(self.name, []))
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        lines += [f'{name}{labels} {value}' for name, labels, value in self.samples(values)]
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self, values: dict):
+        for labels, value in values.items():
+            yield f'{self.name}_total', _labels(self.labelnames, labels), value
+
+
+class Gauge(Metric):
+    """Gauge read at scrape time from `function()` (returning {labels: value} when labelled)"""
+    kind = 'gauge'
+
+    def __init__(self, name: str, help: str, function: Callable, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self.function = function
+
+    def values(self) -> dict:
+        values = self.function()
+        return dict(values) if self.labelnames else {(): values}
+
+    def samples(self, values: dict):
+        for labels, value in values.items():
+            yield self.name, _labels(self.labelnames, labels), value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels: str) -> None:
+        if not METRICS_ENABLED:
+            return
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                # per-bucket counts (last one is +Inf), sum
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][slot] += 1
+            entry[1] += value
+
+    @contextmanager
+    def time(self, *labels: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def values(self) -> dict:
+        with self._lock:
+            return {labels: [list(counts), total] for labels, (counts, total) in self._values.items()}
+
+    def merge(self, values: dict, other: list) -> None:
+        for labels, (counts, total) in other:
+            entry = values.setdefault(tuple(labels), [[0] * len(counts), 0.0])
+            entry[0] = [a + b for a, b in zip(entry[0], counts)]
+            entry[1] += total
+
+    def samples(self, values: dict):
+        for labels, (counts, total) in values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                yield f'{self.name}_bucket', _labels(self.labelnames, labels, f'le="{bound}"'), cumulative
+            yield f'{self.name}_sum', _labels(self.labelnames, labels), total
+            yield f'{self.name}_count', _labels(self.labelnames, labels), cumulative
+
+
+REGISTRY: list = []
+
+
+def render() -> str:
+    others = []
+    if METRICS_DIR:
+        own = os.path.join(METRICS_DIR, f'{os.getpid()}.json')
+        for path in glob.glob(os.path.join(METRICS_DIR, '*.json')):
+            if path != own:
+                try:
+                    with open(path) as f:
+                        others.append(json.load(f))
+                except (OSError, ValueError):
+                    # Being replaced right now; its values come with the next scrape
+                    pass
+    return '\n'.join(metric.render(others) for metric in REGISTRY) + '\n'
+
+
+def snapshot() -> dict:
+    """This process's counters and histograms by name, as [labels, value] pairs.
+
+    Gauges are left out: they describe the process that serves the scrape.
+    """
+    return {
+        metric.name: [[list(labels), value] for labels, value in metric.values().items()]
+        for metric in REGISTRY if not isinstance(metric, Gauge)
+    }
+
+
+def setup_shared_dir() -> str:
+    """Create METRICS_DIR (inherited by worker processes through the environment)"""
+    global METRICS_DIR
+    if not METRICS_DIR:
+        METRICS_DIR = os.environ['METRICS_DIR'] = tempfile.mkdtemp(prefix='metrics-')
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    # Files left by an earlier server would count its requests again
+    for path in glob.glob(os.path.join(METRICS_DIR, '*.json')):
+        os.remove(path)
+    return METRICS_DIR
+
+
+async def share(interval: float = SHARE_INTERVAL) -> None:
+    """Write snapshot() to METRICS_DIR/<pid>.json every `interval` seconds.
+
+    The file stays after the process exits, so counters of a restarted worker
+    don't go backwards.
+    """
+    path = os.path.join(METRICS_DIR, f'{os.getpid()}.json')
+    while True:
+        await asyncio.sleep(interval)
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump(snapshot(), f)
+        os.replace(f'{path}.tmp', path)
+
+
+# --- HTTP ---
+
+http_requests = Counter('http_requests', 'HTTP requests, per route and status', ['method', 'route', 'status'])
+http_request_seconds = Histogram('http_request_seconds', 'Time to serve a request', ['method', 'route'])
+http_request_bytes = Histogram('http_request_bytes', 'Request body size (Content-Length)', ['method', 'route'],
+                               buckets=SIZE_BUCKETS)
+http_response_bytes = Histogram('http_response_bytes', 'Response body size', ['method', 'route'],
+                                buckets=SIZE_BUCKETS)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording http_* metrics.
+
+    Routes are labelled by their template (/orders/{order_id}), so the label
+    set stays small; requests no route matched share one label. Requests to
+    `streaming` routes stay open for as long as the client listens, so they
+    are only counted, not timed or sized.
+    """
+
+    def __init__(self, app, streaming: Sequence[str] = ()):
+        self.app = app
+        self.streaming = frozenset(streaming)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        response = {'status': 500, 'bytes': 0}
+
+        async def send_and_count(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+            elif message['type'] == 'http.response.body':
+                response['bytes'] += len(message.get('body', b''))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_count)
+        finally:
+            route = scope.get('route')
+            labels = (scope['method'], getattr(route, 'path', 'unmatched'))
+            http_requests.inc(*labels, str(response['status']))
+            if labels[1] not in self.streaming:
+                self.observe(scope, labels, time.perf_counter() - started, response['bytes'])
+
+    @staticmethod
+    def observe(scope, labels: tuple, seconds: float, response_bytes: int) -> None:
+        http_request_seconds.observe(seconds, *labels)
+        http_response_bytes.observe(response_bytes, *labels)
+        for name, value in scope['headers']:
+            if name == b'content-length':
+                http_request_bytes.observe(int(value), *labels)
+                break
+
+
+# --- SQLite ---
+# db.py reports every statement here; labels are the statement with
+# whitespace collapsed and IN (?, ?, ...) lists folded, so they stay bounded.
+
+db_statement_seconds = Histogram(
+    'db_statement_seconds', 'Time to run an SQL statement and read its rows', ['statement'])
+db_pool_wait_seconds = Histogram('db_pool_wait_seconds', 'Time spent waiting for a pooled connection')
+db_lock_wait_seconds = Histogram('db_lock_wait_seconds', 'Time BEGIN IMMEDIATE waited for the write lock')
+db_executor_wait_seconds = Histogram(
+    'db_executor_wait_seconds', 'Time run_db work queued before a db executor thread picked it up')
+
+_SPACE = re.compile(r'\s+')
+_PLACEHOLDERS = re.compile(r'\(\?(?:,\s*\?)+\)')
+STATEMENT_LABEL_LENGTH = 160
+
+
+@functools.lru_cache(maxsize=1024)
+def normalize_statement(sql: str) -> str:
+    return _PLACEHOLDERS.sub('(?, ...)', _SPACE.sub(' ', sql).strip())
+
+
+def statement_label(sql: str) -> str:
+    label = normalize_statement(sql)
+    return label if len(label) <= STATEMENT_LABEL_LENGTH else label[:STATEMENT_LABEL_LENGTH - 3] + '...'
+
+
+# Statements executed while handling the current bot update (see instrument_handler)
+_db_calls: contextvars.ContextVar = contextvars.ContextVar('db_calls', default=None)
+
+
+def observe_statement(sql: str, seconds: float) -> None:
+    db_statement_seconds.observe(seconds, statement_label(sql))
+    calls = _db_calls.get()
+    if calls is not None:
+        calls[0] += 1
+
+
+# --- Caches ---
+# In-process caches (cache.TTLCache) registered with watch_cache; the
+# hit ratio is cache_hits / (cache_hits + cache_misses).
+
+_caches: Dict[str, object] = {}
+
+
+def watch_cache(name: str, cache) -> None:
+    """Report a TTLCache's size and lookups under the label cache=`name`"""
+    _caches[name] = cache
+
+
+def _cache_stat(key: str) -> Callable:
+    return lambda: {(name,): cache.stats()[key] for name, cache in list(_caches.items())}
+
+
+Gauge('cache_entries', 'Entries held by an in-process cache', _cache_stat('entries'), ['cache'])
+Gauge('cache_hits', 'Cache lookups answered from the cache since start', _cache_stat('hits'), ['cache'])
+Gauge('cache_misses', 'Cache lookups that missed since start', _cache_stat('misses'), ['cache'])
+
+
+# --- Bot ---
+
+bot_updates = Counter('bot_updates', 'Updates handled, per handler and outcome', ['handler', 'outcome'])
+bot_handler_seconds = Histogram('bot_handler_seconds', 'Handler latency', ['handler'])
+bot_db_calls = Histogram('bot_db_calls_per_update', 'SQL statements run per handled update', ['handler'],
+                         buckets=COUNT_BUCKETS)
+
+
+def instrument_handler(callback: Callable) -> Callable:
+    """Wrap a bot handler callback to record its latency, outcome and database calls"""
+    name = callback.__name__
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        calls = [0]
+        token = _db_calls.set(calls)
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            result = await callback(update, context)
+            outcome = 'ok'
+            return result
+        finally:
+            _db_calls.reset(token)
+            bot_handler_seconds.observe(time.perf_counter() - started, name)
+            bot_updates.inc(name, outcome)
+            bot_db_calls.observe(calls[0], name)
+
+    return wrapper
+
+
+def serve(port: int, host: str = '0.0.0.0') -> ThreadingHTTPServer:
+    """Serve GET /metrics from a daemon thread (for processes without a web app)"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    return server
@@ -0,0 +1,225 @@
+# Telegram notifications for order status changes
+# api.py queues a row in order_notifications for every status change, in the
+# same transaction as the order write. The Notifier runs inside the bot
+# process: it polls that outbox, merges the changes one order got within
+# NOTIFY_COALESCE_SECONDS into a single message about its latest status, and
+# sends through a rate-limited queue that retries with backoff. Outbox rows
+# are deleted only after their messages went out, so a restart resends
+# rather than loses notifications. api.py queues nothing unless
+# BOT_NOTIFICATIONS is on, and drops rows older than NOTIFY_OUTBOX_MAX_AGE.
+
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Callable, Dict, Optional
+
+from telegram import Bot
+from telegram.error import BadRequest, NetworkError, RetryAfter, TelegramError
+
+from db import connection, transaction, run_db
+
+NOTIFY_POLL_INTERVAL = float(os.getenv('NOTIFY_POLL_INTERVAL', '1'))
+NOTIFY_COALESCE_SECONDS = float(os.getenv('NOTIFY_COALESCE_SECONDS', '10'))
+# Telegram allows about 30 messages/s per bot and 1 message/s per chat
+NOTIFY_GLOBAL_RATE = float(os.getenv('NOTIFY_GLOBAL_RATE', '25'))
+NOTIFY_CHAT_INTERVAL = float(os.getenv('NOTIFY_CHAT_INTERVAL', '1'))
+NOTIFY_MAX_ATTEMPTS = int(os.getenv('NOTIFY_MAX_ATTEMPTS', '5'))
+NOTIFY_WORKERS = int(os.getenv('NOTIFY_WORKERS', '8'))
+
+# Who hears about an order entering a status: whoever has to act on it next
+# or is waiting for it. Chefs only hear about their own branch.
+NOTIFY_ROLES = {
+    'sent_to_chef': ('chef',),
+    'sent_to_financier': ('financier',),
+    'sent_to_supplier': ('supplier',),
+    'supplier_delivering': ('chef',),
+    'chef_checking': ('chef',),
+    'financier_checking': ('financier',),
+    'completed': ('chef',),
+}
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """Spaces sends to at most `rate` per second overall and one per `chat_interval` per chat"""
+
+    def __init__(self, rate: float = NOTIFY_GLOBAL_RATE, chat_interval: float = NOTIFY_CHAT_INTERVAL):
+        self.interval = 1 / rate
+        self.chat_interval = chat_interval
+        self._next_any = 0.0
+        self._next_chat: Dict[int, float] = {}
+
+    async def wait(self, chat_id: int) -> None:
+        now = time.monotonic()
+        slot = max(now, self._next_any, self._next_chat.get(chat_id, 0.0))
+        self._next_any = slot + self.interval
+        self._next_chat[chat_id] = slot + self.chat_interval
+        if len(self._next_chat) > 10_000:
+            self._next_chat = {k: v for k, v in self._next_chat.items() if v > now}
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def pause(self, seconds: float) -> None:
+        """Hold every send back, e.g. after Telegram answered 429"""
+        self._next_any = max(self._next_any, time.monotonic() + seconds)
+
+
+def _load_pending(exclude: set, coalesce: float) -> list:
+    """Outbox entries ready to send, one per order, with their recipients"""
+    with connection() as conn:
+        # Orders still being sent are left out before the LIMIT, so a backlog
+        # for them cannot hide every other order's changes
+        rows = conn.execute(
+            "SELECT id, order_id, branch, status, previous_status, created_at FROM order_notifications "
+            "WHERE order_id NOT IN (SELECT value FROM json_each(?)) ORDER BY id LIMIT 1000",
+            (json.dumps(sorted(exclude)),),
+        ).fetchall()
+        by_order = {}
+        for row in rows:
+            by_order.setdefault(row['order_id'], []).append(row)
+
+        ready_before = time.time() - coalesce
+        jobs = []
+        for order_id, changes in by_order.items():
+            first, last = changes[0], changes[-1]
+            if first['created_at'] > ready_before:
+                continue
+            job = {
+                'ids': [c['id'] for c in changes],
+                'order_id': order_id,
+                'branch': last['branch'],
+                'status': last['status'],
+                'previousStatus': first['previous_status'],
+                'recipients': [],
+            }
+            roles = NOTIFY_ROLES.get(last['status'], ())
+            # Changes that cancel out (e.g. sent back and forth) notify no one
+            if roles and last['status'] != first['previous_status']:
+                placeholders = ', '.join('?' * len(roles))
+                job['recipients'] = [
+                    (user['telegram_id'], user['language'] or 'ru')
+                    for user in conn.execute(
+                        f"SELECT telegram_id, language FROM users WHERE role IN ({placeholders}) AND (role != 'chef' OR branch = ?)",
+                        (*roles, last['branch']),
+                    )
+                ]
+            jobs.append(job)
+    return jobs
+
+
+def _delete_sent(ids: list) -> None:
+    with connection() as conn, transaction(conn):
+        conn.executemany("DELETE FROM order_notifications WHERE id = ?", [(i,) for i in ids])
+
+
+class Notifier:
+    """Sends order status notifications from the outbox.
+
+    `render(lang, job)` returns the message text; job has order_id, branch,
+    status and previousStatus. Works with any Bot, including one pointed at a
+    local stub Bot API through base_url.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        render: Callable[[str, dict], str],
+        poll_interval: float = NOTIFY_POLL_INTERVAL,
+        coalesce: float = NOTIFY_COALESCE_SECONDS,
+        limiter: Optional[RateLimiter] = None,
+        max_attempts: int = NOTIFY_MAX_ATTEMPTS,
+        workers: int = NOTIFY_WORKERS,
+    ):
+        self.bot = bot
+        self.render = render
+        self.poll_interval = poll_interval
+        self.coalesce = coalesce
+        self.limiter = limiter or RateLimiter()
+        self.max_attempts = max_attempts
+        self.workers = workers
+        self.stats = {'orders': 0, 'changes': 0, 'sent': 0, 'retries': 0, 'failed': 0}
+        self._queue = asyncio.Queue(maxsize=1000)
+        self._in_flight = set()
+        self._tasks = []
+
+    async def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._poll())]
+        self._tasks += [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        # Unsent outbox rows stay in the database for the next start
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def run_once(self) -> int:
+        """Queue every ready outbox entry; returns the number of orders picked up"""
+        jobs = await run_db(_load_pending, set(self._in_flight), self.coalesce)
+        for job in jobs:
+            self._in_flight.add(job['order_id'])
+            self.stats['orders'] += 1
+            self.stats['changes'] += len(job['ids'])
+            job['pending'] = len(job['recipients'])
+            if not job['pending']:
+                await self._finish(job)
+            for chat_id, lang in job['recipients']:
+                await self._queue.put((chat_id, self.render(lang, job), job))
+        return len(jobs)
+
+    async def _poll(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Error reading notification outbox: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def _worker(self) -> None:
+        while True:
+            chat_id, text, job = await self._queue.get()
+            # A cancelled send leaves the job unfinished, so its rows stay queued
+            await self._send(chat_id, text)
+            job['pending'] -= 1
+            if not job['pending']:
+                await self._finish(job)
+
+    async def _send(self, chat_id: int, text: str) -> bool:
+        for attempt in range(1, self.max_attempts + 1):
+            await self.limiter.wait(chat_id)
+            try:
+                await self.bot.send_message(chat_id=chat_id, text=text)
+                self.stats['sent'] += 1
+                return True
+            except RetryAfter as e:
+                delay = e.retry_after.total_seconds() if hasattr(e.retry_after, 'total_seconds') else float(e.retry_after)
+                self.limiter.pause(delay)
+            except BadRequest as e:
+                # Chat not found and the like; retrying won't help
+                logger.warning(f"Notification to {chat_id} rejected: {e}")
+                break
+            except NetworkError as e:
+                delay = min(2 ** (attempt - 1), 30)
+                logger.warning(f"Notification to {chat_id} failed ({e}), retrying in {delay}s")
+            except TelegramError as e:
+                # Forbidden: the user blocked the bot
+                logger.warning(f"Notification to {chat_id} rejected: {e}")
+                break
+            except Exception as e:
+                logger.error(f"Error sending notification to {chat_id}: {e}")
+                break
+            if attempt < self.max_attempts:
+                self.stats['retries'] += 1
+                await asyncio.sleep(delay)
+        self.stats['failed'] += 1
+        return False
+
+    async def _finish(self, job: dict) -> None:
+        try:
+            await run_db(_delete_sent, job['ids'])
+        except Exception as e:
+            logger.error(f"Error clearing notification outbox: {e}")
+        self._in_flight.discard(job['order_id'])
@@ -0,0 +1,168 @@
+# Opt-in SQL tracing: slow-query log, query plans and the costliest statements
+# With QUERY_TRACE=1 every statement run through db.py connections is timed
+# and aggregated per normalized statement. Statements slower than
+# QUERY_SLOW_MS are logged together with their EXPLAIN QUERY PLAN, and the
+# aggregates (over the current and previous QUERY_TRACE_WINDOW seconds) are
+# served by api.py at GET /admin/queries, flagging plans that scan a whole
+# table.
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from cache import env_flag
+from metrics import normalize_statement
+
+QUERY_TRACE = env_flag('QUERY_TRACE', default=False)
+QUERY_SLOW_MS = float(os.getenv('QUERY_SLOW_MS', '50'))
+QUERY_TRACE_WINDOW = float(os.getenv('QUERY_TRACE_WINDOW', '3600'))
+# Distinct statements tracked per window; the cheapest are dropped beyond it
+QUERY_TRACE_MAX_STATEMENTS = int(os.getenv('QUERY_TRACE_MAX_STATEMENTS', '500'))
+
+_EXPLAINABLE = ('select', 'insert', 'update', 'delete', 'replace', 'with')
+
+logger = logging.getLogger('db.slow')
+
+
+def explain(conn: sqlite3.Connection, sql: str, parameters=()) -> Optional[List[str]]:
+    """EXPLAIN QUERY PLAN lines for `sql`, or None for statements without a plan.
+
+    `parameters` only have to bind; the plan lists no values, so none end up
+    in the log.
+    """
+    if parameters is None or not sql.lstrip().lower().startswith(_EXPLAINABLE):
+        return None
+    try:
+        # The base class method, so the EXPLAIN itself is not traced
+        rows = sqlite3.Connection.execute(conn, f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()
+    except sqlite3.Error:
+        return None
+    return [row[3] for row in rows]
+
+
+def full_scans(plan: Optional[List[str]]) -> List[str]:
+    """Plan steps reading a whole table, directly or through one of its indexes.
+
+    Scans of CTEs and subqueries (CO-ROUTINE/MATERIALIZE steps) read rows
+    produced earlier in the plan and are not reported.
+    """
+    derived = {step.split(' ', 1)[1] for step in plan or () if step.startswith(('CO-ROUTINE ', 'MATERIALIZE '))}
+    scans = []
+    for step in plan or ():
+        if not step.startswith('SCAN '):
+            continue
+        source = step[5:].split(' ', 1)[0]
+        if source not in derived and not source.startswith('(') and source != 'CONSTANT':
+            scans.append(step)
+    return scans
+
+
+class QueryStats:
+    """Per-statement count / total / max time over two rolling windows"""
+
+    def __init__(self, window: float = QUERY_TRACE_WINDOW, max_statements: int = QUERY_TRACE_MAX_STATEMENTS):
+        self.window = window
+        self.max_statements = max_statements
+        self._lock = threading.Lock()
+        self._current: Dict[str, list] = {}
+        self._previous: Dict[str, list] = {}
+        self._started = time.time()
+        # Normalized statement -> plan; kept across windows
+        self.plans: Dict[str, tuple] = {}
+
+    def _rotate(self, now: float) -> None:
+        if now - self._started >= self.window:
+            # A window with no traffic in between leaves nothing to carry over
+            self._previous = self._current if now - self._started < 2 * self.window else {}
+            self._current = {}
+            self._started = now
+
+    def add(self, key: str, sql: str, parameters, seconds: float) -> None:
+        with self._lock:
+            self._rotate(time.time())
+            entry = self._current.get(key)
+            if entry is None:
+                if len(self._current) >= self.max_statements:
+                    cheapest = min(self._current, key=lambda k: self._current[k][1])
+                    del self._current[cheapest]
+                # count, total seconds, max seconds, example statement to explain
+                entry = self._current[key] = [0, 0.0, 0.0, (sql, parameters)]
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    def top(self, limit: int = 20, order: str = 'total') -> tuple:
+        """(start of the covered period, statements ordered by total/mean/max time)"""
+        with self._lock:
+            self._rotate(time.time())
+            merged = {}
+            for stats in (self._previous, self._current):
+                for key, (count, total, longest, example) in stats.items():
+                    entry = merged.setdefault(key, [0, 0.0, 0.0, example])
+                    entry[0] += count
+                    entry[1] += total
+                    entry[2] = max(entry[2], longest)
+            since = self._started - (self.window if self._previous else 0)
+        rows = [
+            {
+                'statement': key,
+                'example': example,
+                'count': count,
+                'total_ms': round(total * 1000, 2),
+                'mean_ms': round(total / count * 1000, 3),
+                'max_ms': round(longest * 1000, 2),
+            }
+            for key, (count, total, longest, example) in merged.items()
+        ]
+        rows.sort(key=lambda row: row[f'{order}_ms'], reverse=True)
+        return since, rows[:limit]
+
+    def reset(self) -> None:
+        """Start over, also re-explaining plans (e.g. after adding an index)"""
+        with self._lock:
+            self._current, self._previous = {}, {}
+            self._started = time.time()
+            self.plans = {}
+
+
+stats = QueryStats()
+
+
+def record(conn: sqlite3.Connection, sql: str, parameters, seconds: float) -> None:
+    """Called by db.TimedConnection after every statement when QUERY_TRACE is on.
+
+    `parameters` are the statement's (first) parameter set, or None when they
+    can't be reused.
+    """
+    key = normalize_statement(sql)
+    stats.add(key, sql, parameters, seconds)
+    if seconds * 1000 < QUERY_SLOW_MS:
+        return
+    if key not in stats.plans:
+        stats.plans[key] = explain(conn, sql, parameters)
+    plan = stats.plans[key]
+    logger.warning(
+        "Slow query %.1f ms: %s%s", seconds * 1000, key,
+        ''.join(f"\n    {step}" for step in plan or ()),
+    )
+
+
+def report(conn: sqlite3.Connection, limit: int = 20, order: str = 'total') -> dict:
+    """Top statements with their plans (explained on `conn` when not captured yet)"""
+    since, rows = stats.top(limit, order)
+    for row in rows:
+        key = row['statement']
+        if key not in stats.plans:
+            stats.plans[key] = explain(conn, *row.pop('example'))
+        row.pop('example', None)
+        row['plan'] = stats.plans[key]
+        row['full_scans'] = full_scans(row['plan'])
+    return {
+        'enabled': QUERY_TRACE,
+        'slow_ms': QUERY_SLOW_MS,
+        'since': since,
+        'statements': rows,
+    }
@@ -0,0 +1,122 @@
+# Spend aggregates per branch / category / day
+# spend_daily is maintained incrementally by order writes (apply_order_spend)
+# and can be rebuilt from order_items (and archived orders) at any time:
+#
+#   python reports.py rebuild
+
+import sqlite3
+import sys
+from typing import List, Optional
+
+from db import connection, transaction, next_version
+from archive import archived_lines, line_column
+
+# Contribution of one order's priced lines, grouped like spend_daily
+_ORDER_SPEND = '''
+INSERT INTO spend_daily (branch, category, day, total, items)
+SELECT o.branch, i.category, substr(o.createdAt, 1, 10), ? * SUM(i.price * i.quantity), ? * COUNT(*)
+FROM order_items i JOIN orders o ON o.id = i.order_id
+WHERE o.id = ? AND i.price > 0 AND i.quantity > 0
+GROUP BY o.branch, i.category, substr(o.createdAt, 1, 10)
+ON CONFLICT(branch, category, day) DO UPDATE SET
+    total = total + excluded.total,
+    items = items + excluded.items
+'''
+
+
+def apply_order_spend(conn: sqlite3.Connection, order_id: str, sign: int) -> None:
+    """Add (sign=1) or remove (sign=-1) an order's current lines from spend_daily.
+
+    Writers call it with -1 before changing an order and +1 afterwards, inside
+    the same transaction.
+    """
+    conn.execute(_ORDER_SPEND, (sign, sign, order_id))
+    if sign < 0:
+        conn.execute(
+            "DELETE FROM spend_daily WHERE branch = (SELECT branch FROM orders WHERE id = ?) AND items <= 0",
+            (order_id,),
+        )
+
+
+def rebuild_spend_daily(conn: sqlite3.Connection) -> int:
+    """Recompute spend_daily from scratch (call inside a write transaction)"""
+    conn.execute("DELETE FROM spend_daily")
+    conn.execute('''
+    INSERT INTO spend_daily (branch, category, day, total, items)
+    SELECT o.branch, i.category, substr(o.createdAt, 1, 10), SUM(i.price * i.quantity), COUNT(*)
+    FROM order_items i JOIN orders o ON o.id = i.order_id
+    WHERE i.price > 0 AND i.quantity > 0
+    GROUP BY o.branch, i.category, substr(o.createdAt, 1, 10)
+    ''')
+    # Archived orders keep counting; their lines are read from the compressed blob
+    price, quantity, category = line_column('price'), line_column('quantity'), line_column('category')
+    conn.execute(f'''
+    INSERT INTO spend_daily (branch, category, day, total, items)
+    SELECT a.branch, {category}, substr(a.createdAt, 1, 10), SUM({price} * {quantity}), COUNT(*)
+    FROM {archived_lines()}
+    WHERE a.id NOT IN (SELECT id FROM orders) AND {price} > 0 AND {quantity} > 0
+    GROUP BY a.branch, {category}, substr(a.createdAt, 1, 10)
+    ON CONFLICT(branch, category, day) DO UPDATE SET
+        total = total + excluded.total,
+        items = items + excluded.items
+    ''')
+    # GET /reports/spend is cached under the orders counter; a rebuild that
+    # changes totals must not be answered with 304s for the old ones
+    next_version(conn)
+    return conn.execute("SELECT COUNT(*) FROM spend_daily").fetchone()[0]
+
+
+# Allowed group_by values for load_spend_report and their SQL expressions
+GROUP_COLUMNS = {
+    'branch': 'branch',
+    'category': 'category',
+    'day': 'day',
+    'month': 'substr(day, 1, 7)',
+}
+
+
+def load_spend_report(
+    group_by: List[str],
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    branch: Optional[List[str]] = None,
+) -> List[dict]:
+    """Totals from spend_daily grouped by `group_by`; date_from/date_to are inclusive days"""
+    clauses, params = [], []
+    if date_from:
+        clauses.append("day >= ?")
+        params.append(date_from[:10])
+    if date_to:
+        clauses.append("day <= ?")
+        params.append(date_to[:10])
+    if branch:
+        clauses.append(f"branch IN ({', '.join('?' * len(branch))})")
+        params.extend(branch)
+
+    selected = [f"{GROUP_COLUMNS[g]} AS {g}" for g in group_by]
+    sql = f"SELECT {', '.join(selected + ['SUM(total) AS total', 'SUM(items) AS items'])} FROM spend_daily"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    if group_by:
+        sql += f" GROUP BY {', '.join(group_by)} ORDER BY {', '.join(group_by)}"
+
+    with connection() as conn:
+        rows = conn.execute(sql, params).fetchall()
+    report = []
+    for row in rows:
+        entry = {g: row[g] for g in group_by}
+        entry["total"] = round(row['total'] or 0, 2)
+        entry["items"] = row['items'] or 0
+        report.append(entry)
+    return report
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] != ['rebuild']:
+        print("usage: python reports.py rebuild")
+        sys.exit(2)
+    from db import init_db
+    init_db()
+    with connection() as conn, transaction(conn):
+        count = rebuild_spend_daily(conn)
+    print(f"spend_daily rebuilt: {count} rows")
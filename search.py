@@ -0,0 +1,134 @@
+# Product search for GET /products/search
+# An in-memory trigram index over product names and categories. Names are
+# bilingual ('Творог (Tvorog / Suzma)') and Cyrillic words are also indexed
+# transliterated, so 'tvorog', 'творог' and 'moloko' all find something.
+# Matching is by prefix, then substring, then within a small edit distance
+# (typos); api.py rebuilds the index when the products change counter moves.
+
+import re
+import unicodedata
+from typing import Dict, List, Optional, Set
+
+_WORD = re.compile(r'\w+')
+# Uzbek Latin writes o‘ and g‘ with any of these; they never split a word
+_APOSTROPHES = re.compile("['‘’ʻʼ`]")
+
+_TRANSLIT = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e', 'ж': 'zh', 'з': 'z', 'и': 'i',
+    'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't',
+    'у': 'u', 'ф': 'f', 'х': 'h', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'sch', 'ъ': '', 'ы': 'y', 'ь': '',
+    'э': 'e', 'ю': 'yu', 'я': 'ya', 'ў': 'o', 'қ': 'q', 'ғ': 'g', 'ҳ': 'h',
+}
+
+# Score of a query term against a word, by kind of match
+PREFIX_SCORE = 1.0
+SUBSTRING_SCORE = 0.7
+TYPO_SCORE = 0.5
+# Names count more than categories
+CATEGORY_WEIGHT = 0.6
+
+
+def words(text: str) -> List[str]:
+    """Lowercased words without punctuation/emoji; 'ё' is folded into 'е'"""
+    text = unicodedata.normalize('NFKC', text).lower().replace('ё', 'е')
+    return _WORD.findall(_APOSTROPHES.sub('', text))
+
+
+def transliterate(word: str) -> str:
+    return ''.join(_TRANSLIT.get(ch, ch) for ch in word)
+
+
+def trigrams(word: str) -> Set[str]:
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def within_distance(a: str, b: str, limit: int) -> bool:
+    """Optimal string alignment distance(a, b) <= limit (swaps count as one edit)"""
+    if abs(len(a) - len(b)) > limit:
+        return False
+    prev2, prev = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        row = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            row[j] = min(prev[j] + 1, row[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                row[j] = min(row[j], prev2[j - 2] + 1)
+        if min(row) > limit:
+            return False
+        prev2, prev = prev, row
+    return prev[-1] <= limit
+
+
+def allowed_typos(term: str) -> int:
+    return 0 if len(term) < 4 else 1 if len(term) < 8 else 2
+
+
+class ProductIndex:
+    """Trigram index over the catalogue.
+
+    `products` are dicts as returned by api.load_products(); search() returns
+    copies of them with a "score", best first.
+    """
+
+    def __init__(self, products: list, version: Optional[int] = None):
+        self.version = version
+        self.products = products
+        self.catalogue = [(p['id'], p['name'], p['category']) for p in products]
+        # Per distinct word: postings of (product position, weight)
+        self._words: Dict[str, Dict[int, float]] = {}
+        self._trigrams: Dict[str, Set[str]] = {}
+        for position, product in enumerate(products):
+            for text, weight in ((product['name'], 1.0), (product['category'] or '', CATEGORY_WEIGHT)):
+                for word in words(text):
+                    for form in {word, transliterate(word)}:
+                        postings = self._words.setdefault(form, {})
+                        postings[position] = max(postings.get(position, 0), weight)
+        for word in self._words:
+            for gram in trigrams(word):
+                self._trigrams.setdefault(gram, set()).add(word)
+
+    def refreshed(self, products: list, version: Optional[int] = None) -> 'ProductIndex':
+        """Index for a new snapshot, reusing this one if only prices changed"""
+        if [(p['id'], p['name'], p['category']) for p in products] != self.catalogue:
+            return ProductIndex(products, version)
+        self.products, self.version = products, version
+        return self
+
+    def _term_scores(self, term: str) -> Dict[int, float]:
+        typos = allowed_typos(term)
+        candidates = set()
+        for gram in trigrams(term):
+            candidates |= self._trigrams.get(gram, set())
+        scores: Dict[int, float] = {}
+        for word in candidates:
+            if word.startswith(term):
+                # Whole-word hits rank above longer words sharing the prefix
+                score = PREFIX_SCORE + (0.1 if word == term else 0)
+            elif term in word:
+                score = SUBSTRING_SCORE
+            elif typos and (within_distance(term, word[:len(term)], typos) or within_distance(term, word, typos)):
+                score = TYPO_SCORE
+            else:
+                continue
+            for position, weight in self._words[word].items():
+                scores[position] = max(scores.get(position, 0), score * weight)
+        return scores
+
+    def search(self, query: str, limit: int = 20) -> list:
+        terms = list(dict.fromkeys(words(query)))
+        if not terms:
+            return []
+        total: Optional[Dict[int, float]] = None
+        for term in terms:
+            scores = self._term_scores(term)
+            # Every term has to match something
+            total = scores if total is None else {p: total[p] + s for p, s in scores.items() if p in total}
+            if not total:
+                return []
+        ranked = sorted(total.items(), key=lambda item: (-item[1], len(self.products[item[0]]['name'])))
+        return [
+            {**self.products[position], 'score': round(score / len(terms), 3)}
+            for position, score in ranked[:limit]
+        ]
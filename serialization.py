@@ -0,0 +1,84 @@
+# Response encodings for the large GET endpoints (/orders, /products)
+# JSON goes through orjson when it is installed; clients that send
+# `Accept: application/msgpack` get MessagePack instead (if msgpack is
+# installed), and `?layout=columnar` replaces per-line product details with a
+# shared product dictionary. See bench/serialization.py for the numbers.
+
+import json
+from typing import Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = 'application/json'
+MSGPACK = 'application/msgpack'
+_MSGPACK_TYPES = (MSGPACK, 'application/x-msgpack', 'application/vnd.msgpack')
+
+
+def negotiate(accept: Optional[str]) -> str:
+    """Media type to answer with for an Accept header (JSON unless msgpack is asked for)"""
+    if msgpack and accept:
+        for part in accept.split(','):
+            media_type, *params = [p.strip() for p in part.split(';')]
+            if media_type.lower() in _MSGPACK_TYPES and 'q=0' not in params:
+                return MSGPACK
+    return JSON
+
+
+def dumps_json(payload) -> bytes:
+    if orjson:
+        return orjson.dumps(payload)
+    # Same output as FastAPI's JSONResponse
+    return json.dumps(payload, ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode('utf-8')
+
+
+def encode(payload, media_type: str) -> bytes:
+    if media_type == MSGPACK:
+        return msgpack.packb(payload, use_bin_type=True)
+    return dumps_json(payload)
+
+
+# --- Columnar layout ---
+# Order lines become parallel arrays per order; name/category/unit/lastPrice
+# live once in a shared "products" table that lines point into by index.
+
+_PRODUCT_KEYS = ('id', 'name', 'category', 'unit', 'lastPrice')
+_LINE_KEYS = ('quantity', 'price', 'comment', 'checked', 'chefComment', 'deliveryDate')
+
+
+def columnar_products(products: list) -> dict:
+    """GET /products as one array per field"""
+    return {key: [p.get(key) for p in products] for key in _PRODUCT_KEYS}
+
+
+def columnar_orders(orders: list) -> dict:
+    """GET /orders with a shared product dictionary.
+
+    Lines reference products by index; a product id that appears with
+    different names in different orders gets one entry per variant, so the
+    transform loses nothing.
+    """
+    index = {}
+    table = {key: [] for key in _PRODUCT_KEYS}
+    result = []
+    for order in orders:
+        lines = {key: [] for key in ('product',) + _LINE_KEYS}
+        for line in order['products']:
+            ident = tuple(line.get(key) for key in _PRODUCT_KEYS)
+            position = index.get(ident)
+            if position is None:
+                position = index[ident] = len(index)
+                for key, value in zip(_PRODUCT_KEYS, ident):
+                    table[key].append(value)
+            lines['product'].append(position)
+            for key in _LINE_KEYS:
+                lines[key].append(line.get(key))
+        result.append({**{k: v for k, v in order.items() if k != 'products'}, 'lines': lines})
+    return {'products': table, 'orders': result}
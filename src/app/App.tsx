@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { X } from 'lucide-react';
 
 declare global {
@@ -16,8 +16,8 @@ import { RoleSelector } from '@/app/components/RoleSelector';
 import { BranchSelector } from '@/app/components/BranchSelector';
 import { LanguageProvider, useLanguage } from '@/app/context/LanguageContext';
 
-import { api } from '@/lib/api';
-import type { Order, Product, Status, Branch, Role } from '@/lib/api';
+import { api, diffOrder, OrderConflictError } from '@/lib/api';
+import type { Order, OrderChanges, OrderFilters, Product, Status, Branch, Role } from '@/lib/api';
 
 export { getTashkentDate };
 function getTashkentDate(): Date {
@@ -27,6 +27,57 @@ function getTashkentDate(): Date {
   return new Date(utc + (tashkentOffset * 60000));
 }
 
+// Server-side filters per role, so each screen only downloads the orders it can show
+// (read from the bot's URL params too, since the first load runs before state is set)
+function orderFiltersFor(role: Role | null): OrderFilters | undefined {
+  const urlParams = new URLSearchParams(window.location.search);
+  const urlRole = (urlParams.get('role') as Role | null) ?? role;
+  const urlBranch = urlParams.get('branch');
+  if (urlRole === 'supplier') {
+    return { status: ['sent_to_supplier', 'supplier_collecting', 'supplier_delivering'] };
+  }
+  if (urlRole === 'financier') {
+    // Completed orders come in pages, see completedFiltersFor
+    return { status: ['sent_to_financier', 'financier_checking'] };
+  }
+  if (urlRole === 'chef') {
+    // A chef opened from the bot is bound to one branch; otherwise the branch
+    // picker needs chef_checking orders from every branch
+    const status: Status[] = ['sent_to_chef', 'chef_checking'];
+    return urlBranch && urlBranch !== 'all' ? { branch: [urlBranch as Branch], status } : { status };
+  }
+  return undefined;
+}
+
+// The financier's archive tab: the newest COMPLETED_PAGE_SIZE completed orders
+// first, older pages (archived ones included) on demand
+const COMPLETED_PAGE_SIZE = 50;
+
+function completedFiltersFor(role: Role | null): OrderFilters | undefined {
+  const urlRole = (new URLSearchParams(window.location.search).get('role') as Role | null) ?? role;
+  if (urlRole !== 'financier') return undefined;
+  return { status: ['completed'], limit: COMPLETED_PAGE_SIZE, history: true, newestFirst: true };
+}
+
+// Filters for the page of completed orders older than `page`; null when the
+// server has no more
+function olderCompletedFilters(filters: OrderFilters, page: { nextCursor: string | null }): OrderFilters | null {
+  return page.nextCursor ? { ...filters, cursor: page.nextCursor } : null;
+}
+
+// Apply a delta from /orders/changes; untouched orders keep their identity,
+// so views editing them are not reset
+function mergeOrderChanges(prev: Order[], changes: OrderChanges): Order[] {
+  if (changes.orders.length === 0 && changes.deleted.length === 0) return prev;
+  const changed = new Map(changes.orders.map(o => [o.id, o]));
+  const deleted = new Set(changes.deleted);
+  const merged = prev
+    .filter(o => !deleted.has(o.id))
+    .map(o => changed.get(o.id) ?? o);
+  const known = new Set(prev.map(o => o.id));
+  return [...merged, ...changes.orders.filter(o => !known.has(o.id))];
+}
+
 export default function App() {
   const { t } = useLanguage();
   const [selectedRole, setSelectedRole] = useState<Role | null>(null);
@@ -61,11 +112,30 @@ export default function App() {
   const [orders, setOrders] = useState<Order[]>([]);
   const [masterProducts, setMasterProducts] = useState<Product[]>([]);
   const [isLoadingProducts, setIsLoadingProducts] = useState(true);
+  // Change version the loaded orders are consistent with; null until the first load
+  const ordersVersion = useRef<number | null>(null);
+  // A chef's new, not yet sent order (see below)
+  const newChefOrder = useRef<Order | null>(null);
+  // Next page of completed orders to load; null when there is none
+  const [olderCompleted, setOlderCompleted] = useState<OrderFilters | null>(null);
+
+  // The role's working set plus the first page of its completed orders
+  const fetchOrders = async () => {
+    const completedFilters = completedFiltersFor(selectedRole);
+    const [page, completedPage] = await Promise.all([
+      api.getOrdersPage(orderFiltersFor(selectedRole)),
+      completedFilters ? api.getOrdersPage(completedFilters) : null,
+    ]);
+    // Deltas are read from the older of the two versions, so nothing is missed
+    ordersVersion.current = completedPage ? Math.min(page.version, completedPage.version) : page.version;
+    setOlderCompleted(completedPage ? olderCompletedFilters(completedFilters!, completedPage) : null);
+    return completedPage ? [...page.orders, ...completedPage.orders] : page.orders;
+  };
 
   const loadInitialData = async () => {
     try {
       const [ordersData, productsData] = await Promise.all([
-        api.getOrders(),
+        fetchOrders(),
         api.getProducts()
       ]);
 
@@ -81,30 +151,80 @@ export default function App() {
 
   const loadOrders = async () => {
     try {
-      const data = await api.getOrders();
-      setOrders(data);
+      setOrders(await fetchOrders());
     } catch (error) {
       console.error('Error loading orders:', error);
     }
   };
 
+  const loadOlderCompleted = async () => {
+    if (!olderCompleted) return;
+    try {
+      const page = await api.getOrdersPage(olderCompleted);
+      setOlderCompleted(olderCompletedFilters(olderCompleted, page));
+      // Orders already present (e.g. merged from a delta) keep their newer copy
+      setOrders(prev => {
+        const known = new Set(prev.map(o => o.id));
+        return [...prev, ...page.orders.filter(o => !known.has(o.id))];
+      });
+    } catch (error) {
+      console.error('Error loading older orders:', error);
+    }
+  };
+
+  // Poll only the delta since the last seen version and merge it in place
+  // (a full reload here used to reset screens that were being edited)
+  const syncOrders = async () => {
+    // Before the first load there is nothing to merge into; since=0 would
+    // download every order, whatever the role's filters
+    const since = ordersVersion.current;
+    if (since === null) return;
+    try {
+      const changes = await api.getOrderChanges(since, orderFiltersFor(selectedRole)?.branch);
+      ordersVersion.current = changes.version;
+      setOrders(prev => mergeOrderChanges(prev, changes));
+    } catch (error) {
+      console.error('Error syncing orders:', error);
+    }
+  };
+
+  const syncOrdersRef = useRef(syncOrders);
+  syncOrdersRef.current = syncOrders;
+
   useEffect(() => {
     loadInitialData();
 
-    // Polling disabled to prevent data reset while editing
-    // const interval = setInterval(() => {
-    //   loadOrders();
-    // }, 5000);
+    // The server pushes a small event per order change; each one triggers a
+    // delta sync. Slow polling stays as a safety net while the stream is down.
+    const urlParams = new URLSearchParams(window.location.search);
+    const stream = typeof EventSource !== 'undefined'
+      ? new EventSource(api.orderStreamUrl(urlParams.get('role') as Role | null, urlParams.get('branch') as Branch | 'all' | null))
+      : null;
+    const onStreamEvent = () => syncOrdersRef.current();
+    stream?.addEventListener('order', onStreamEvent);
+    stream?.addEventListener('deleted', onStreamEvent);
+    stream?.addEventListener('resync', onStreamEvent);
+
+    const interval = setInterval(() => {
+      if (!stream || stream.readyState !== EventSource.OPEN) {
+        syncOrdersRef.current();
+      }
+    }, 5000);
 
-    // return () => {
-    //   clearInterval(interval);
-    // };
+    return () => {
+      clearInterval(interval);
+      stream?.close();
+    };
   }, []);
 
   const [selectedOrderId, setSelectedOrderId] = useState<string | null>(null);
   const [chefTab, setChefTab] = useState<'order' | 'delivery'>('order');
 
   const saveOrder = async (updatedOrder: Order) => {
+    // Known orders are saved as a PATCH carrying only what changed
+    const previous = orders.find(o => o.id === updatedOrder.id);
+    const operations = previous?.version != null ? diffOrder(previous, updatedOrder) : null;
+
     // 1. Optimistic Update (Update local state immediately)
     setOrders(prev => {
       const existing = prev.find(o => o.id === updatedOrder.id);
@@ -125,9 +245,22 @@ export default function App() {
 
     // 2. Send to local API
     try {
-      await api.upsertOrder(updatedOrder);
+      const version = operations
+        ? (operations.length ? await api.patchOrder(updatedOrder.id, operations, previous!.version) : previous!.version!)
+        : await api.upsertOrder(updatedOrder);
+      // The next edit of this order must be based on the version just written
+      setOrders(prev => prev.map(o => o.id === updatedOrder.id ? { ...o, version } : o));
       console.log('✅ Order saved successfully!');
     } catch (error: any) {
+      if (error instanceof OrderConflictError) {
+        // Someone else saved this order first: show their version instead of overwriting it
+        const current = error.current;
+        setOrders(prev => current
+          ? prev.map(o => o.id === current.id ? current : o)
+          : prev.filter(o => o.id !== updatedOrder.id));
+        alert(t('alertOrderChanged'));
+        return;
+      }
       console.error('❌ Error saving order:', error);
       alert(`Ошибка сохранения! Данные не отправлены.\nОшибка: ${error.message}`);
       loadOrders(); // Reload actual data to revert
@@ -191,6 +324,7 @@ export default function App() {
         onSelectOrder={setSelectedOrderId}
         onBackToRoles={handleBackToStart}
         onRefresh={loadOrders}
+        onLoadOlder={olderCompleted ? loadOlderCompleted : undefined}
         isFromBot={isFromBot}
       />
     );
@@ -274,21 +408,27 @@ export default function App() {
           );
         }
 
-        // Создаем новую заявку с базовым списком продуктов из БД
-        const baseProducts = masterProducts.map((p) => ({
-          ...p,
-          quantity: 0,
-          price: undefined,
-          comment: undefined
-        }));
-
-        currentOrder = {
-          id: Date.now().toString(),
-          status: 'sent_to_chef',
-          createdAt: getTashkentDate(),
-          branch: selectedBranch!,
-          products: baseProducts,
-        };
+        // Создаем новую заявку с базовым списком продуктов из БД.
+        // The same draft is kept across renders until it is sent, so the
+        // chef's unsent quantities are not reset by every orders update
+        const draft = newChefOrder.current;
+        if (!draft || draft.branch !== selectedBranch || orders.some(o => o.id === draft.id)) {
+          const baseProducts = masterProducts.map((p) => ({
+            ...p,
+            quantity: 0,
+            price: undefined,
+            comment: undefined
+          }));
+
+          newChefOrder.current = {
+            id: Date.now().toString(),
+            status: 'sent_to_chef',
+            createdAt: getTashkentDate(),
+            branch: selectedBranch!,
+            products: baseProducts,
+          };
+        }
+        currentOrder = newChefOrder.current!;
       }
     } else {
       // delivery tab
@@ -1,8 +1,9 @@
-import { useState, useEffect } from 'react';
 import { ArrowLeft, Send, ChefHat, MessageSquare, Check, Trash2, Plus, RefreshCcw, Calendar, Truck } from 'lucide-react';
 import type { Order, Branch } from '@/lib/api';
 import { StatusBadge } from '@/app/components/StatusBadge';
 import { useLanguage } from '@/app/context/LanguageContext';
+import { useOrderDraft } from '@/app/hooks/useOrderDraft';
+import { OrderConflictBanner } from '@/app/components/OrderConflictBanner';
 
 // Localized branch names handled by t() key 'branch' + id
 
@@ -19,12 +20,7 @@ type ChefViewProps = {
 
 export function ChefView({ order, onUpdateOrder, onBackToRoles, branch, onRefresh, isFromBot, chefTab, onSetChefTab }: ChefViewProps) {
   const { t } = useLanguage();
-  const [localProducts, setLocalProducts] = useState(order.products);
-
-  // Синхронизация localProducts при изменении order.products
-  useEffect(() => {
-    setLocalProducts(order.products);
-  }, [order.products]);
+  const { products: localProducts, updateProducts: setLocalProducts, conflict, reload } = useOrderDraft(order);
 
   const handleUpdateProduct = (productId: string, field: string, value: any) => {
     setLocalProducts(prev =>
@@ -35,6 +31,11 @@ export function ChefView({ order, onUpdateOrder, onBackToRoles, branch, onRefres
   };
 
   const handleSend = () => {
+    if (conflict) {
+      alert(t('alertOrderChanged'));
+      reload();
+      return;
+    }
     if (order.status === 'sent_to_chef') {
       // Валидация: проверяем, что хотя бы один продукт имеет quantity > 0
       const hasProducts = localProducts.some(p => p.quantity > 0);
@@ -127,6 +128,7 @@ export function ChefView({ order, onUpdateOrder, onBackToRoles, branch, onRefres
       </header>
 
       <main className="flex-1 overflow-y-auto p-4 -mt-2 pb-[180px]">
+        {conflict && <OrderConflictBanner onReload={reload} />}
         {isEmptyDelivery ? (
           <div className="flex flex-col items-center justify-center p-8 h-full text-center text-gray-500">
             <Truck className="w-16 h-16 mb-4 text-gray-300" />
@@ -8,6 +8,7 @@ type FinancierViewProps =
     onSelectOrder: (orderId: string) => void;
     onBackToRoles: () => void;
     onRefresh?: () => void;
+    onLoadOlder?: () => void;
     isFromBot?: boolean;
   }
   | {
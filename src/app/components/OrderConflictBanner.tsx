@@ -0,0 +1,19 @@
+import { RefreshCcw } from 'lucide-react';
+import { useLanguage } from '@/app/context/LanguageContext';
+
+// Shown over an editing screen when someone else changed the order meanwhile
+export function OrderConflictBanner({ onReload }: { onReload: () => void }) {
+  const { t } = useLanguage();
+  return (
+    <div className="mb-4 p-4 rounded-2xl bg-amber-50 border border-amber-200 flex items-center justify-between gap-3">
+      <p className="text-sm text-amber-800">{t('orderChangedElsewhere')}</p>
+      <button
+        onClick={onReload}
+        className="flex-none flex items-center gap-1 px-3 py-2 rounded-xl bg-amber-100 text-amber-900 text-xs font-bold"
+      >
+        <RefreshCcw className="w-4 h-4" />
+        {t('loadCurrentVersion')}
+      </button>
+    </div>
+  );
+}
@@ -5,6 +5,8 @@ import { saveAs } from 'file-saver';
 import type { Order, Product, Unit, Branch } from '@/lib/api';
 import { StatusBadge } from '@/app/components/StatusBadge';
 import { useLanguage } from '@/app/context/LanguageContext';
+import { useOrderDraft } from '@/app/hooks/useOrderDraft';
+import { OrderConflictBanner } from '@/app/components/OrderConflictBanner';
 
 const branchNames: Record<Branch | 'all', string> = {
     chilanzar: 'Чиланзар (Новза)',
@@ -25,7 +27,7 @@ interface FinancierDetailViewProps {
 export function FinancierDetailView({ order, onUpdateOrder, onBackToRoles, branch, onRefresh }: FinancierDetailViewProps) {
     const { t } = useLanguage();
     const [viewMode, setViewMode] = useState<'list' | 'details'>('list');
-    const [localProducts, setLocalProducts] = useState(order.products);
+    const { products: localProducts, updateProducts: setLocalProducts, conflict, reload } = useOrderDraft(order);
     const [isCompact, setIsCompact] = useState(false);
     const [editingId, setEditingId] = useState<string | null>(null);
     const [editProduct, setEditProduct] = useState<Product | null>(null);
@@ -46,11 +48,6 @@ export function FinancierDetailView({ order, onUpdateOrder, onBackToRoles, branc
         }
     }, [order.status]);
 
-    // Обновляем localProducts при изменении order
-    useEffect(() => {
-        setLocalProducts(order.products);
-    }, [order.products]);
-
     const startEditing = (product: Product) => {
         setEditingId(product.id);
         setEditProduct({ ...product });
@@ -88,6 +85,11 @@ export function FinancierDetailView({ order, onUpdateOrder, onBackToRoles, branc
     };
 
     const handleSend = () => {
+        if (conflict) {
+            alert(t('alertOrderChanged'));
+            reload();
+            return;
+        }
         if (order.status === 'sent_to_financier') {
             onUpdateOrder({
                 ...order,
@@ -310,6 +312,7 @@ export function FinancierDetailView({ order, onUpdateOrder, onBackToRoles, branc
             </header>
 
             <main className="flex-1 overflow-y-auto p-4 -mt-6 pb-[240px]">
+                {conflict && <OrderConflictBanner onReload={reload} />}
                 <div className={isCompact ? "space-y-4" : "space-y-8"}>
                     {categories.map(category => {
                         const categoryProducts = localProducts.filter(p => p.category === category && p.quantity > 0);
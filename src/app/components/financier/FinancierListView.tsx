@@ -9,10 +9,12 @@ interface FinancierListViewProps {
     onSelectOrder: (orderId: string) => void;
     onBackToRoles: () => void;
     onRefresh?: () => void;
+    // Loads the next page of older completed orders; absent when none are left
+    onLoadOlder?: () => void;
     isFromBot?: boolean;
 }
 
-export function FinancierListView({ orders, onSelectOrder, onBackToRoles, onRefresh, isFromBot }: FinancierListViewProps) {
+export function FinancierListView({ orders, onSelectOrder, onBackToRoles, onRefresh, onLoadOlder, isFromBot }: FinancierListViewProps) {
     const { t, language } = useLanguage();
     const [activeTab, setActiveTab] = useState<'active' | 'archive'>('active');
     const [branchFilter, setBranchFilter] = useState<Branch | 'all'>('all');
@@ -24,7 +26,9 @@ export function FinancierListView({ orders, onSelectOrder, onBackToRoles, onRefr
 
     const incomingOrders = filteredByBranch.filter(o => o.status === 'sent_to_financier');
     const checkingOrders = filteredByBranch.filter(o => o.status === 'financier_checking');
-    const archiveOrders = filteredByBranch.filter(o => o.status === 'completed');
+    const archiveOrders = filteredByBranch
+        .filter(o => o.status === 'completed')
+        .sort((a, b) => b.createdAt.getTime() - a.createdAt.getTime());
 
     // Функция для расчета общей суммы заявки
     const calculateTotal = (order: Order) => {
@@ -264,6 +268,14 @@ export function FinancierListView({ orders, onSelectOrder, onBackToRoles, onRefr
                                         <p className="text-gray-400">{t('noOrders')}</p>
                                     </div>
                                 )}
+                                {onLoadOlder && (
+                                    <button
+                                        onClick={onLoadOlder}
+                                        className="w-full py-3 rounded-2xl bg-white border border-gray-200 text-sm font-bold text-[#003366] active:scale-[0.99] transition-all"
+                                    >
+                                        {t('loadOlder')}
+                                    </button>
+                                )}
                             </div>
                         </div>
                     )}
@@ -1,10 +1,12 @@
-import { useState, useEffect } from 'react';
+import { useState } from 'react';
 import { ArrowLeft, Send, MessageSquare, Truck, Check, RefreshCcw, AlignJustify, LayoutGrid, Download, Calendar } from 'lucide-react';
 import * as XLSX from 'xlsx';
 import { saveAs } from 'file-saver';
 import type { Order, Branch } from '@/lib/api';
 import { StatusBadge } from '@/app/components/StatusBadge';
 import { useLanguage } from '@/app/context/LanguageContext';
+import { useOrderDraft } from '@/app/hooks/useOrderDraft';
+import { OrderConflictBanner } from '@/app/components/OrderConflictBanner';
 
 const branchNames: Record<Branch, string> = {
     chilanzar: 'Чиланзар (Новза)',
@@ -23,21 +25,16 @@ interface SupplierDetailViewProps {
 
 export function SupplierDetailView({ order, onUpdateOrder, onBackToRoles, branch }: SupplierDetailViewProps) {
     const { t } = useLanguage();
-    const [localProducts, setLocalProducts] = useState(order.products);
+    // Prices start from the last known price until the supplier enters one
+    const { products: localProducts, updateProducts: setLocalProducts, conflict, reload } = useOrderDraft(
+        order,
+        products => products.map(p => ({ ...p, price: (p.price && p.price > 0) ? p.price : (p.lastPrice || 0) }))
+    );
     const [isCompact, setIsCompact] = useState(false);
     const [estimatedDate, setEstimatedDate] = useState<string>(
         order.estimatedDeliveryDate ? order.estimatedDeliveryDate.toISOString().split('T')[0] : ''
     );
 
-    // Синхронизация localProducts при изменении order.products
-    // Синхронизация localProducts при изменении order.products
-    useEffect(() => {
-        setLocalProducts(order.products.map(p => ({
-            ...p,
-            price: (p.price && p.price > 0) ? p.price : (p.lastPrice || 0)
-        })));
-    }, [order.products]);
-
     const handleUpdateProduct = (productId: string, field: 'price' | 'comment' | 'checked' | 'deliveryDate', value: any) => {
         setLocalProducts(prev =>
             prev.map(p =>
@@ -47,6 +44,11 @@ export function SupplierDetailView({ order, onUpdateOrder, onBackToRoles, branch
     };
 
     const handleSend = () => {
+        if (conflict) {
+            alert(t('alertOrderChanged'));
+            reload();
+            return;
+        }
         // Validation: Check if all products have a price
         const missingPrice = localProducts.some(p => p.quantity > 0 && (!p.price || p.price <= 0));
 
@@ -147,6 +149,7 @@ export function SupplierDetailView({ order, onUpdateOrder, onBackToRoles, branch
             </header>
 
             <main className="flex-1 overflow-y-auto p-4 -mt-2 pb-[240px]">
+                {conflict && <OrderConflictBanner onReload={reload} />}
                 <div className={isCompact ? "space-y-4" : "space-y-8"}>
                     {categories.map(category => {
                         const categoryProducts = filteredProducts.filter(p => p.category === category);
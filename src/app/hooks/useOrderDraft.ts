@@ -0,0 +1,38 @@
+import { useEffect, useRef, useState } from 'react';
+import type { Order, Product } from '@/lib/api';
+
+// Local, unsaved copy of an order's products for the editing screens.
+// A newer copy of the same order (from a delta sync) replaces the draft only
+// while it has no edits; otherwise `conflict` is set and the edits stay until
+// the user reloads, the same way a save answered by OrderConflictError
+// shows the other user's version before anything is overwritten.
+export function useOrderDraft(order: Order, prepare: (products: Product[]) => Product[] = p => p) {
+  const [products, setProducts] = useState(() => prepare(order.products));
+  const [conflict, setConflict] = useState(false);
+  const base = useRef(order);
+  const edited = useRef(false);
+
+  const reload = () => {
+    base.current = order;
+    edited.current = false;
+    setProducts(prepare(order.products));
+    setConflict(false);
+  };
+
+  useEffect(() => {
+    if (order.id === base.current.id && order.products === base.current.products) return;
+    // A different order, no edits yet, or our own draft coming back saved
+    if (order.id !== base.current.id || !edited.current || order.products === products) {
+      reload();
+    } else {
+      setConflict(true);
+    }
+  }, [order.id, order.products]);
+
+  const updateProducts = (update: (prev: Product[]) => Product[]) => {
+    edited.current = true;
+    setProducts(update);
+  };
+
+  return { products, updateProducts, conflict, reload };
+}
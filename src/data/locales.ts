@@ -32,6 +32,7 @@ export const translations = {
         sum: 'сум',
         readOnly: 'Только чтение',
         noOrders: 'Нет заявок',
+        loadOlder: 'Показать более ранние',
 
         // Branches
         branchChilanzar: 'Чиланзар (Новза)',
@@ -99,6 +100,9 @@ export const translations = {
         // Alerts - friendly versions
         alertListSent: 'Готово! Список улетел к финансисту 🚀',
         alertCheckComplete: 'Супер! Отправлено финансисту на финальную проверку ✅',
+        alertOrderChanged: 'Заказ уже изменил другой пользователь. Загружена актуальная версия — повторите изменения.',
+        orderChangedElsewhere: 'Заказ изменил другой пользователь. Ваши изменения ещё не сохранены.',
+        loadCurrentVersion: 'Загрузить',
         alertApproved: 'Отлично! Список одобрен и отправлен поставщику 📦',
         alertOrderComplete: 'Ура! Заказ успешно завершён! 🎉',
         alertSentToChef: 'Готово! Заявка отправлена шеф-повару на проверку 👨‍🍳',
@@ -137,6 +141,7 @@ export const translations = {
         sum: 'so\'m',
         readOnly: 'Faqat o\'qish',
         noOrders: 'Buyurtmalar yo\'q',
+        loadOlder: 'Oldingilarini ko\'rsatish',
 
         // Branches
         branchChilanzar: 'Chilonzor (Novza)',
@@ -204,6 +209,9 @@ export const translations = {
         // Alerts - friendly versions
         alertListSent: 'Tayyor! Ro\'yxat moliyachiga yuborildi 🚀',
         alertCheckComplete: 'Zo\'r! Yakuniy tekshiruv uchun moliyachiga yuborildi ✅',
+        alertOrderChanged: 'Buyurtmani boshqa foydalanuvchi o\'zgartirdi. Joriy versiya yuklandi — o\'zgarishlarni qaytadan kiriting.',
+        orderChangedElsewhere: 'Buyurtmani boshqa foydalanuvchi o\'zgartirdi. Sizning o\'zgarishlaringiz hali saqlanmagan.',
+        loadCurrentVersion: 'Yuklash',
         alertApproved: 'A\'lo! Ro\'yxat tasdiqlandi va yetkazuvchiga yuborildi 📦',
         alertOrderComplete: 'Ura! Buyurtma muvaffaqiyatli yakunlandi! 🎉',
         alertSentToChef: 'Tayyor! Buyurtma oshpazga tekshiruv uchun yuborildi 👨‍🍳',
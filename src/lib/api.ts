@@ -42,8 +42,137 @@ export type Order = {
     deliveredAt?: Date;
     estimatedDeliveryDate?: Date;
     branch: Branch;
+    version?: number;
 };
 
+export type OrderChanges = {
+    version: number;
+    orders: Order[];
+    deleted: string[];
+};
+
+export type OrderFilters = {
+    branch?: Branch[];
+    status?: Status[];
+    createdAfter?: Date;
+    createdBefore?: Date;
+    limit?: number;
+    cursor?: string;
+    // Also return archived (long completed) orders
+    history?: boolean;
+    // Page newest first; nextCursor then leads to older orders
+    newestFirst?: boolean;
+};
+
+const parseOrder = (o: any): Order => ({
+    ...o,
+    createdAt: new Date(o.createdAt),
+    deliveredAt: o.deliveredAt ? new Date(o.deliveredAt) : undefined,
+    estimatedDeliveryDate: o.estimatedDeliveryDate ? new Date(o.estimatedDeliveryDate) : undefined,
+});
+
+const orderQuery = (filters: OrderFilters = {}): string => {
+    const params = new URLSearchParams();
+    filters.branch?.forEach(b => params.append('branch', b));
+    filters.status?.forEach(s => params.append('status', s));
+    if (filters.createdAfter) params.set('created_after', filters.createdAfter.toISOString());
+    if (filters.createdBefore) params.set('created_before', filters.createdBefore.toISOString());
+    if (filters.limit) params.set('limit', String(filters.limit));
+    if (filters.cursor) params.set('cursor', filters.cursor);
+    if (filters.history) params.set('history', 'true');
+    if (filters.newestFirst) params.set('order', 'desc');
+    const query = params.toString();
+    return query ? `?${query}` : '';
+};
+
+export type PriceWindow = {
+    days: number;
+    min: number | null;
+    avg: number | null;
+    max: number | null;
+    count: number;
+};
+
+export type ProductPriceStats = {
+    productId: string;
+    name: string;
+    unit: string;
+    branch: Branch | null;
+    lastPrice: number | null;
+    windows: PriceWindow[];
+};
+
+export type SpendGroup = 'branch' | 'category' | 'day' | 'month';
+
+export type SpendRow = {
+    branch?: Branch;
+    category?: string;
+    day?: string;
+    month?: string;
+    total: number;
+    items: number;
+};
+
+const ITEM_FIELDS = ['quantity', 'price', 'comment', 'checked', 'chefComment', 'deliveryDate'] as const;
+
+type ItemChanges = Partial<Pick<Product, typeof ITEM_FIELDS[number]>>;
+
+export type OrderOperation =
+    | { op: 'set_status'; status: Status }
+    | { op: 'set_delivery'; estimatedDeliveryDate?: string | null; deliveredAt?: string | null }
+    | { op: 'set_item'; productId: string; changes: ItemChanges }
+    | { op: 'add_item'; product: Product }
+    | { op: 'remove_item'; productId: string };
+
+const sameValue = (a: unknown, b: unknown) => (a ?? null) === (b ?? null);
+const isoDate = (d?: Date) => d ? d.toISOString() : null;
+
+// Operations turning `prev` into `next` for PATCH /orders/{id}; null when the
+// edit touches something PATCH can't express (then send the whole order)
+export const diffOrder = (prev: Order, next: Order): OrderOperation[] | null => {
+    if (prev.id !== next.id || prev.branch !== next.branch || prev.createdAt.getTime() !== next.createdAt.getTime()) {
+        return null;
+    }
+    const ops: OrderOperation[] = [];
+    if (prev.status !== next.status) ops.push({ op: 'set_status', status: next.status });
+    const delivery: { estimatedDeliveryDate?: string | null; deliveredAt?: string | null } = {};
+    if (!sameValue(isoDate(prev.estimatedDeliveryDate), isoDate(next.estimatedDeliveryDate))) {
+        delivery.estimatedDeliveryDate = isoDate(next.estimatedDeliveryDate);
+    }
+    if (!sameValue(isoDate(prev.deliveredAt), isoDate(next.deliveredAt))) {
+        delivery.deliveredAt = isoDate(next.deliveredAt);
+    }
+    if (Object.keys(delivery).length) ops.push({ op: 'set_delivery', ...delivery });
+
+    const before = new Map(prev.products.map(p => [p.id, p]));
+    const after = new Set(next.products.map(p => p.id));
+    for (const product of next.products) {
+        const old = before.get(product.id);
+        if (!old) {
+            ops.push({ op: 'add_item', product });
+            continue;
+        }
+        if (old.name !== product.name || old.category !== product.category || old.unit !== product.unit) return null;
+        const changes: Record<string, unknown> = {};
+        for (const field of ITEM_FIELDS) {
+            if (!sameValue(old[field], product[field])) changes[field] = product[field] ?? null;
+        }
+        if (Object.keys(changes).length) ops.push({ op: 'set_item', productId: product.id, changes: changes as ItemChanges });
+    }
+    for (const product of prev.products) {
+        if (!after.has(product.id)) ops.push({ op: 'remove_item', productId: product.id });
+    }
+    return ops;
+};
+
+// Thrown by upsertOrder when the order changed on the server since it was
+// loaded; `current` is the server's copy (null if it was deleted)
+export class OrderConflictError extends Error {
+    constructor(public current: Order | null) {
+        super('Order was changed by someone else');
+    }
+}
+
 export const api = {
     API_URL,
     getProducts: async (): Promise<Product[]> => {
@@ -52,30 +181,119 @@ export const api = {
         return response.json();
     },
 
-    getOrders: async (): Promise<Order[]> => {
-        const response = await fetch(`${API_URL}/orders`);
+    // Ranked matches for a (possibly misspelt, Cyrillic or Latin) query
+    searchProducts: async (q: string, limit = 20, signal?: AbortSignal): Promise<(Product & { score: number })[]> => {
+        const params = new URLSearchParams({ q, limit: String(limit) });
+        const response = await fetch(`${API_URL}/products/search?${params}`, { signal });
+        if (!response.ok) throw new Error('Failed to search products');
+        return response.json();
+    },
+
+    // Rolling min/avg/max of recorded prices (7/30/90/365 days)
+    getProductPrices: async (productId: string, branch?: Branch): Promise<ProductPriceStats> => {
+        const query = branch ? `?branch=${encodeURIComponent(branch)}` : '';
+        const response = await fetch(`${API_URL}/products/${encodeURIComponent(productId)}/prices${query}`);
+        if (!response.ok) throw new Error('Failed to fetch product prices');
+        return response.json();
+    },
+
+    // Spend totals from the pre-aggregated spend_daily table; from/to are YYYY-MM-DD
+    getSpendReport: async (groupBy: SpendGroup[], from?: string, to?: string, branch?: Branch): Promise<SpendRow[]> => {
+        const params = new URLSearchParams();
+        groupBy.forEach(group => params.append('group_by', group));
+        if (from) params.set('from', from);
+        if (to) params.set('to', to);
+        if (branch) params.set('branch', branch);
+        const response = await fetch(`${API_URL}/reports/spend?${params}`);
+        if (!response.ok) throw new Error('Failed to fetch spend report');
+        return response.json();
+    },
+
+    // Link target for downloading order lines; the server streams the file
+    exportOrdersUrl: (format: 'csv' | 'xlsx', filters: Omit<OrderFilters, 'limit' | 'cursor'> = {}): string => {
+        const query = orderQuery(filters);
+        return `${API_URL}/orders/export?format=${format}${query ? '&' + query.slice(1) : ''}`;
+    },
+
+    getOrders: async (filters?: OrderFilters): Promise<Order[]> => {
+        const response = await fetch(`${API_URL}/orders${orderQuery(filters)}`);
+        if (!response.ok) throw new Error('Failed to fetch orders');
+        const data = await response.json();
+        return data.map(parseOrder);
+    },
+
+    // One page of orders; nextCursor is null on the last page, version is the
+    // change version to pass to getOrderChanges
+    getOrdersPage: async (filters: OrderFilters = {}): Promise<{ orders: Order[]; nextCursor: string | null; version: number }> => {
+        const response = await fetch(`${API_URL}/orders${orderQuery(filters)}`);
         if (!response.ok) throw new Error('Failed to fetch orders');
         const data = await response.json();
-        return data.map((o: any) => ({
-            ...o,
-            createdAt: new Date(o.createdAt),
-            deliveredAt: o.deliveredAt ? new Date(o.deliveredAt) : undefined,
-            estimatedDeliveryDate: o.estimatedDeliveryDate ? new Date(o.estimatedDeliveryDate) : undefined,
-        }));
+        return {
+            orders: data.map(parseOrder),
+            nextCursor: response.headers.get('X-Next-Cursor'),
+            version: Number(response.headers.get('X-Orders-Version') ?? 0),
+        };
+    },
+
+    // Orders changed (and ids deleted) since the given change version
+    getOrderChanges: async (since: number, branch?: Branch[]): Promise<OrderChanges> => {
+        const params = new URLSearchParams({ since: String(since) });
+        branch?.forEach(b => params.append('branch', b));
+        const response = await fetch(`${API_URL}/orders/changes?${params.toString()}`);
+        if (!response.ok) throw new Error('Failed to fetch order changes');
+        const data = await response.json();
+        return { version: data.version, orders: data.orders.map(parseOrder), deleted: data.deleted };
     },
 
-    upsertOrder: async (order: Order): Promise<void> => {
+    // Server-Sent Events URL announcing order changes ("order", "deleted", "resync")
+    orderStreamUrl: (role?: Role | null, branch?: Branch | 'all' | null): string => {
+        const params = new URLSearchParams();
+        if (role) params.set('role', role);
+        if (branch) params.set('branch', branch);
+        const query = params.toString();
+        return `${API_URL}/orders/stream${query ? `?${query}` : ''}`;
+    },
+
+    // Applies only the given operations; same If-Match/409 rules as upsertOrder
+    patchOrder: async (orderId: string, operations: OrderOperation[], version?: number): Promise<number> => {
+        const headers: Record<string, string> = { 'Content-Type': 'application/json' };
+        if (version != null) headers['If-Match'] = `"${version}"`;
+        const response = await fetch(`${API_URL}/orders/${encodeURIComponent(orderId)}`, {
+            method: 'PATCH',
+            headers,
+            body: JSON.stringify({ operations }),
+        });
+        if (response.status === 409) {
+            const conflict = await response.json();
+            throw new OrderConflictError(conflict.order ? parseOrder(conflict.order) : null);
+        }
+        if (!response.ok) throw new Error('Failed to update order');
+        const data = await response.json();
+        return data.version;
+    },
+
+    // Saves only if the server still has order.version (new orders have none);
+    // resolves to the order's new version
+    upsertOrder: async (order: Order): Promise<number> => {
         const payload = {
             ...order,
             createdAt: order.createdAt.toISOString(),
             deliveredAt: order.deliveredAt ? order.deliveredAt.toISOString() : undefined,
             estimatedDeliveryDate: order.estimatedDeliveryDate ? order.estimatedDeliveryDate.toISOString() : undefined,
         };
+        const headers: Record<string, string> = { 'Content-Type': 'application/json' };
+        if (order.version != null) headers['If-Match'] = `"${order.version}"`;
         const response = await fetch(`${API_URL}/orders/upsert`, {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
+            headers,
             body: JSON.stringify(payload),
         });
+        if (response.status === 409) {
+            const conflict = await response.json();
+            throw new OrderConflictError(conflict.order ? parseOrder(conflict.order) : null);
+        }
         if (!response.ok) throw new Error('Failed to upsert order');
+        const data = await response.json();
+        return data.version;
     }
 };
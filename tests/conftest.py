@@ -0,0 +1,37 @@
+# Tests run against a scratch database: DB_PATH must be set before db.py
+# is imported, and the schema is created once per session.
+
+import os
+import tempfile
+
+import pytest
+
+_workdir = tempfile.mkdtemp(prefix='canteen-tests-')
+os.environ['DB_PATH'] = os.path.join(_workdir, 'test.db')
+os.environ.setdefault('RESPONSE_CACHE_ENABLED', '0')
+
+from db import prepare_db  # noqa: E402
+
+prepare_db()
+
+
+def make_order(order_id: str, status: str = 'sent_to_financier', branch: str = 'uchtepa',
+               created_at: str = '2026-06-01T10:00:00.000Z'):
+    import api
+    return api.Order(
+        id=order_id, status=status, branch=branch, createdAt=created_at,
+        products=[{'id': '1', 'name': 'Молоко', 'category': 'Dairy', 'quantity': 2, 'unit': 'л', 'price': 1000}],
+    )
+
+
+@pytest.fixture
+def order_factory():
+    return make_order
+
+
+@pytest.fixture
+def client():
+    """API client without the lifespan tasks (relay, archiver)"""
+    from fastapi.testclient import TestClient
+    import api
+    return TestClient(api.app)
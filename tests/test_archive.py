@@ -0,0 +1,23 @@
+from datetime import datetime, timedelta, timezone
+
+import api
+import archive
+from events import load_events
+
+
+def test_archived_orders_are_deleted_for_delta_readers(order_factory):
+    api.save_orders([order_factory(f'archived-{n}', status='completed') for n in range(3)])
+    since = api.load_changes(0)['version']
+    moved = archive.archive_orders(30, now=datetime.now(timezone.utc) + timedelta(days=31))
+    assert moved >= 3
+
+    changes = api.load_changes(since)
+    assert {'archived-0', 'archived-1', 'archived-2'} <= set(changes['deleted'])
+    _, events, _ = load_events(since)
+    assert {event['id'] for _, event in events if event['type'] == 'deleted'} >= set(changes['deleted'])
+
+    # Restored on its own, the order reaches delta readers again
+    assert archive.restore_order('archived-0')
+    changes = api.load_changes(changes['version'])
+    assert [order['id'] for order in changes['orders']] == ['archived-0']
+    assert 'archived-0' not in api.load_changes(since)['deleted']
@@ -0,0 +1,47 @@
+import asyncio
+from datetime import datetime
+
+from telegram import Chat, Message, Update
+
+import main
+
+
+def chat_update(update_id: int, chat_id: int) -> Update:
+    chat = Chat(id=chat_id, type='private')
+    return Update(update_id=update_id, message=Message(message_id=update_id, date=datetime.now(), chat=chat))
+
+
+def test_busy_chat_does_not_take_every_slot():
+    async def run():
+        processor = main.PerChatUpdateProcessor(2)
+        assert processor.max_concurrent_updates == 2
+        release = asyncio.Event()
+        done = []
+
+        async def handle(name, wait):
+            if wait:
+                await release.wait()
+            done.append(name)
+
+        # Five queued updates from one chat, then one from another chat
+        busy = [asyncio.create_task(processor.process_update(chat_update(n, 1), handle(n, True)))
+                for n in range(5)]
+        await asyncio.sleep(0)
+        other = asyncio.create_task(processor.process_update(chat_update(10, 2), handle('other', False)))
+        await asyncio.wait_for(other, 1)
+        assert done == ['other']
+        release.set()
+        await asyncio.gather(*busy)
+        assert done[1:] == [0, 1, 2, 3, 4]
+
+    asyncio.run(run())
+
+
+def test_handler_counts_db_calls_made_on_the_executor():
+    async def lookup_user(update, context):
+        await main.run_db(main.get_user_by_telegram_id, update.effective_chat.id)
+
+    handler = main.metrics.instrument_handler(lookup_user)
+    asyncio.run(handler(chat_update(20, 3), None))
+    counts, total = main.metrics.bot_db_calls.values()[('lookup_user',)]
+    assert sum(counts) == 1 and total > 0
@@ -0,0 +1,23 @@
+import asyncio
+
+import api
+
+
+def test_stale_read_does_not_replace_newer_counters(order_factory, monkeypatch):
+    api.invalidate_caches()
+    old = api.load_table_versions()
+    api.save_order(order_factory('versions-1'))
+    new = api.load_table_versions(old)
+    assert new[0] > old[0] and new[2]['orders'] > old[2]['orders']
+
+    # The newer read is cached first; the older one finishing later is ignored
+    api._table_versions = new
+    monkeypatch.setattr(api, 'load_table_versions', lambda known=None: old)
+    asyncio.run(api.table_versions())
+    assert api._table_versions is new
+
+
+def test_unchanged_database_reuses_counters():
+    api.invalidate_caches()
+    first = api.load_table_versions()
+    assert api.load_table_versions(first) is first
@@ -0,0 +1,22 @@
+import events
+
+
+def test_load_events_reports_pruned_events(order_factory, monkeypatch):
+    import api
+    monkeypatch.setattr(events, 'EVENT_BACKLOG', 2)
+    start, _, complete = events.load_events(None)
+    assert complete
+    # Each save stores its event and prunes all but the last two versions
+    changes = [api.save_order(order_factory(f'event-{n}')) for n in range(4)]
+
+    _, recent, complete = events.load_events(changes[-2]['version'])
+    assert complete and [version for version, _ in recent] == [changes[-1]['version']]
+    latest, _, complete = events.load_events(start)
+    assert not complete and latest == changes[-1]['version']
+
+
+def test_hub_knows_its_own_events():
+    hub = events.OrderEventHub()
+    hub.publish({'type': 'order', 'version': 7})
+    hub.publish({'type': 'order', 'version': 8}, relayed=True)
+    assert hub.seen(7) and not hub.seen(8)
@@ -0,0 +1,37 @@
+import csv
+import io
+import re
+import zipfile
+
+import api
+from export import EXPORT_COLUMNS
+
+HEADERS = [name for name, _ in EXPORT_COLUMNS]
+
+
+def save_export_orders(order_factory):
+    api.save_orders([order_factory(f'export-{n}', branch='chilanzar') for n in range(3)])
+
+
+def test_csv_export_has_a_row_per_line(order_factory, client):
+    save_export_orders(order_factory)
+    response = client.get('/orders/export', params={'format': 'csv', 'branch': 'chilanzar'})
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/csv')
+    assert 'attachment; filename="orders-' in response.headers['content-disposition']
+
+    rows = list(csv.reader(io.StringIO(response.content.decode('utf-8-sig'))))
+    assert rows[0] == HEADERS
+    assert sorted(row[0] for row in rows[1:]) == ['export-0', 'export-1', 'export-2']
+    assert {row[HEADERS.index('total')] for row in rows[1:]} == {'2000.0'}
+
+
+def test_xlsx_export_has_a_row_per_line(order_factory, client):
+    save_export_orders(order_factory)
+    response = client.get('/orders/export', params={'format': 'xlsx', 'branch': 'chilanzar'})
+    assert response.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(response.content)) as workbook:
+        sheet = workbook.read('xl/worksheets/sheet1.xml').decode()
+    rows = re.findall(r'<row\b.*?</row>', sheet)
+    assert len(rows) == 4
+    assert re.findall(r'<t[^>]*>(.*?)</t>', rows[0]) == HEADERS
@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+import metrics
+
+
+def test_metric_requires_samples():
+    with pytest.raises(TypeError):
+        metrics.Metric('incomplete_metric', 'A metric without samples')
+
+
+def test_streaming_routes_are_counted_not_timed():
+    class Route:
+        path = '/orders/stream'
+
+    async def app(scope, receive, send):
+        scope['route'] = Route()
+        await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b'data: {}\n\n'})
+
+    async def send(message):
+        pass
+
+    labels = ('GET', '/orders/stream')
+    middleware = metrics.MetricsMiddleware(app, streaming=['/orders/stream'])
+    asyncio.run(middleware({'type': 'http', 'method': 'GET', 'headers': []}, None, send))
+    assert metrics.http_requests.values()[(*labels, '200')] == 1
+    assert labels not in metrics.http_request_seconds.values()
+    assert labels not in metrics.http_response_bytes.values()
+
+
+def test_cache_lookups_are_exported():
+    from cache import TTLCache
+
+    cache = TTLCache(max_entries=4)
+    metrics.watch_cache('test', cache)
+    cache.put('a', 1)
+    cache.get('a')
+    cache.get('b')
+    text = metrics.render()
+    assert 'cache_entries{cache="test"} 1' in text
+    assert 'cache_hits{cache="test"} 1' in text
+    assert 'cache_misses{cache="test"} 1' in text
@@ -0,0 +1,12 @@
+import api
+from notifier import _load_pending
+
+
+def test_in_flight_backlog_does_not_hide_other_orders(order_factory):
+    statuses = ['sent_to_chef', 'sent_to_financier']
+    for n in range(1001):
+        api.save_order(order_factory('busy', status=statuses[n % 2]))
+    api.save_order(order_factory('quiet', status='sent_to_supplier'))
+
+    pending = [job['order_id'] for job in _load_pending({'busy'}, coalesce=0)]
+    assert 'quiet' in pending and 'busy' not in pending
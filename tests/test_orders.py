@@ -0,0 +1,78 @@
+import api
+from db import connection
+
+
+def query_plan(sql: str, params: list) -> list:
+    with connection() as conn:
+        return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def test_changes_query_uses_version_index(order_factory):
+    api.save_orders([order_factory(f'plan-{n}', branch=['uchtepa', 'olmazar'][n % 2]) for n in range(50)])
+    for branch in (None, ['uchtepa']):
+        sql, params = api.orders_query(branch=branch, changed_since=10)
+        plan = query_plan(sql, params)
+        assert any('idx_orders_version' in step for step in plan), plan
+
+
+def test_changes_return_orders_written_since(order_factory):
+    since = api.load_changes(0)['version']
+    api.save_order(order_factory('changed-1'))
+    changes = api.load_changes(since)
+    assert [order['id'] for order in changes['orders']] == ['changed-1']
+    assert changes['version'] > since
+
+
+def test_bulk_upsert_rejects_oversized_batch(order_factory, client, monkeypatch):
+    saved = []
+    monkeypatch.setattr(api, 'save_orders', saved.append)
+    body = [order_factory(f'bulk-{n}').model_dump() for n in range(api.MAX_BULK_ORDERS + 1)]
+    response = client.post('/orders/bulk-upsert', json=body)
+    assert response.status_code == 422
+    assert saved == []
+
+
+def test_descending_pages_start_with_newest_orders(order_factory):
+    api.save_orders([order_factory(f'newest-{n}', status='supplier_collecting', created_at=f'2026-07-0{n + 1}T10:00:00.000Z')
+                     for n in range(5)])
+    seen, after = [], None
+    while True:
+        orders, cursor, _ = api.load_order_history(status=['supplier_collecting'], limit=2, after=after, descending=True)
+        seen += [order['id'] for order in orders]
+        if cursor is None:
+            break
+        after = api.decode_cursor(cursor)
+    assert seen == [f'newest-{n}' for n in reversed(range(5))]
+
+
+def test_patch_items_round_trip(order_factory, client):
+    api.save_order(order_factory('patched-1'))
+    extra = {'id': '2', 'name': 'Сметана', 'category': 'Dairy', 'quantity': 1, 'unit': 'кг', 'price': 500}
+    response = client.patch('/orders/patched-1', json={'operations': [
+        {'op': 'add_item', 'product': extra},
+        {'op': 'set_item', 'productId': '1', 'changes': {'quantity': 5, 'comment': 'свежее'}},
+    ]})
+    assert response.status_code == 200
+    version = response.json()['version']
+    assert response.headers['ETag'] == f'"{version}"'
+
+    order = api.load_order('patched-1')
+    assert order['version'] == version
+    assert [(p['id'], p['quantity']) for p in order['products']] == [('1', 5), ('2', 1)]
+    assert order['products'][0]['comment'] == 'свежее'
+
+    response = client.patch('/orders/patched-1', json={'operations': [{'op': 'remove_item', 'productId': '2'}]},
+                            headers={'If-Match': f'"{version}"'})
+    assert response.status_code == 200
+    assert [p['id'] for p in api.load_order('patched-1')['products']] == ['1']
+
+
+def test_patch_rejects_missing_orders_and_items(order_factory, client):
+    api.save_order(order_factory('patched-2'))
+    remove_missing = {'operations': [{'op': 'remove_item', 'productId': 'nope'}]}
+    assert client.patch('/orders/no-such-order', json=remove_missing).status_code == 404
+    response = client.patch('/orders/patched-2', json=remove_missing)
+    assert response.status_code == 422
+    assert 'nope' in response.json()['detail']
+    # A failed PATCH writes nothing
+    assert [p['id'] for p in api.load_order('patched-2')['products']] == ['1']
@@ -0,0 +1,21 @@
+import api
+
+
+def test_price_stats_after_two_priced_orders(order_factory, client):
+    first = order_factory('priced-1', branch='shayzantaur')
+    second = order_factory('priced-2', branch='shayzantaur')
+    second.products[0].price = 1500
+    api.save_order(first)
+    api.save_order(second)
+
+    response = client.get('/products/1/prices', params={'branch': 'shayzantaur'})
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats['productId'] == '1' and stats['branch'] == 'shayzantaur'
+    assert stats['lastPrice'] == 1500
+    week = stats['windows'][0]
+    assert week == {'days': 7, 'min': 1000, 'avg': 1250, 'max': 1500, 'count': 2}
+
+
+def test_price_stats_for_unknown_product(client):
+    assert client.get('/products/no-such-product/prices').status_code == 404
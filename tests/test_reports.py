@@ -0,0 +1,32 @@
+import api
+from db import connection, current_version, transaction
+from reports import rebuild_spend_daily
+
+
+def test_rebuild_moves_the_spend_report_version():
+    with connection() as conn:
+        before = current_version(conn)
+    with connection() as conn, transaction(conn):
+        rebuild_spend_daily(conn)
+    with connection() as conn:
+        assert current_version(conn) > before
+
+
+def test_spend_totals_follow_a_delete(order_factory, client):
+    api.save_orders([order_factory(f'spend-{n}', branch='olmazar', created_at='2026-03-15T09:00:00.000Z')
+                     for n in range(2)])
+    params = {'group_by': ['branch', 'day'], 'from': '2026-03-15', 'to': '2026-03-15', 'branch': 'olmazar'}
+
+    response = client.get('/reports/spend', params=params)
+    assert response.status_code == 200
+    assert response.json() == [{'branch': 'olmazar', 'day': '2026-03-15', 'total': 4000, 'items': 2}]
+
+    assert client.delete('/orders/spend-0').status_code == 200
+    # The old ETag no longer matches, so the new totals are sent
+    response = client.get('/reports/spend', params=params, headers={'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 200
+    assert response.json() == [{'branch': 'olmazar', 'day': '2026-03-15', 'total': 2000, 'items': 1}]
+
+
+def test_spend_report_rejects_unknown_grouping(client):
+    assert client.get('/reports/spend', params={'group_by': 'week'}).status_code == 400